@@ -1,5 +1,6 @@
 import sys
 import atexit
+import multiprocessing
 
 from PyQt5.QtWidgets import QApplication, QMessageBox
 from PyQt5.QtCore import Qt
@@ -78,7 +79,8 @@ def run() -> None:
     user_role = login.user_role
     username = login.username
     
-    repo = CodeRepository()
+    # Escritura diferida: las ediciones rápidas se confirman en lotes desde un hilo aparte
+    repo = CodeRepository(write_behind=True)
     
     # Recalcular estados automáticamente basándose en stock al iniciar
     repo.recalculate_all_statuses()
@@ -93,7 +95,12 @@ def run() -> None:
     
     win.theme_change_callback = on_theme
     win.show()
-    sys.exit(app.exec_())
+    exit_code = app.exec_()
+    repo.close()  # Confirma las escrituras pendientes antes de salir
+    sys.exit(exit_code)
 
 if __name__ == "__main__":
+    # La importación lee archivos grandes con un pool de procesos (spawn); en el
+    # ejecutable de PyInstaller los procesos hijos arrancan por aquí
+    multiprocessing.freeze_support()
     run()
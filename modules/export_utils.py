@@ -1,62 +1,198 @@
+"""Exportación a CSV leyendo la base por lotes, en segundo plano.
+
+run_export() recorre CodeRepository.iter_codes con los filtros de la tabla y
+escribe cada lote apenas se lee: la memoria no depende de la cantidad de filas.
+El archivo se escribe primero como '<nombre>.part' y se renombra al terminar;
+si se cancela o hay un error se borra y no queda un CSV a medias. Con la
+extensión '.gz' la salida se comprime con gzip.
+"""
 import csv
-from pathlib import Path
+import gzip
+import os
+import threading
+import time
 from datetime import datetime
-from PyQt5.QtWidgets import QFileDialog, QMessageBox
+from pathlib import Path
+from typing import Callable, Dict, NamedTuple, Optional
 
-def export_to_csv(parent, data, status_labels):
-    """
-    Exporta la lista de códigos y sus estados a un archivo CSV.
-    Formato: Código;Descripción;Stock_Caja;Stock_Cajas;Stock_Restante;Estado;Usado;Imagen;Fecha
-    
-    Args:
-        parent: El widget padre para los diálogos.
-        data: Lista de diccionarios con los datos de los códigos.
-        status_labels: Diccionario que mapea códigos de estado a etiquetas legibles.
-    """
-    if not data:
-        QMessageBox.warning(parent, "Exportar CSV", "No hay datos para exportar.")
-        return
-    
+from PyQt5.QtWidgets import QFileDialog
+from repository.db_querys import CodeRepository, utc_from_epoch_ms, ITER_BATCH_ROWS
+
+# Cabecera compatible con importación
+EXPORT_HEADER = ["Código", "Descripción", "Stock_Caja", "Stock_Cajas", "Stock_Restante", "Estado", "Usado", "Imagen", "Fecha"]
+# Nivel de gzip: 6 comprime casi como 9 en bastante menos tiempo
+GZIP_LEVEL = 6
+
+
+def ask_export_path(parent) -> Optional[Path]:
+    """Pide el archivo de destino (por defecto en saved/ con la fecha). None si se cancela."""
     # Crear carpeta saved si no existe
     saved_dir = Path.cwd() / "saved"
     saved_dir.mkdir(exist_ok=True)
-    
+
     # Nombre de archivo por defecto con fecha
     default_name = f"codes_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
-    default_path = str(saved_dir / default_name)
-
-    file_path, _ = QFileDialog.getSaveFileName(
-        parent, 
-        "Exportar códigos", 
-        default_path, 
-        "CSV Files (*.csv);;All Files (*)"
+    file_path, selected = QFileDialog.getSaveFileName(
+        parent,
+        "Exportar códigos",
+        str(saved_dir / default_name),
+        "CSV Files (*.csv);;CSV comprimido (*.csv.gz);;All Files (*)"
     )
+    if not file_path:
+        return None
+    if selected.startswith("CSV comprimido") and not file_path.endswith('.gz'):
+        file_path = (file_path if file_path.endswith('.csv') else file_path + '.csv') + '.gz'
+    elif not file_path.endswith(('.csv', '.csv.gz')):
+        file_path += '.csv'
+    return Path(file_path)
+
+
+def export_row(row, status_labels: Dict[str, str]) -> list:
+    """Campos de una fila de codes en el orden de EXPORT_HEADER."""
+    created_at = row['created_at']
+    return [
+        row['code'],
+        row['description'] or '',
+        row['stock_per_box'] or '',
+        row['stock_boxes'] or '',
+        row['stock_remaining'] or '',
+        status_labels.get(row['status'] or 'disponible', "Disponible"),
+        "Sí" if row['annotated'] else "No",
+        row['image_path'] or '',
+        # created_at en epoch ms: se exporta como antes de la migración 8 (ISO en UTC)
+        utc_from_epoch_ms(created_at).isoformat() if created_at is not None else '',
+    ]
+
+
+class ExportProgress(NamedTuple):
+    rows: int = 0
+    total: int = 0               # filas esperadas (las de la tabla al empezar)
+    elapsed_s: float = 0.0
+
+    @property
+    def percent(self) -> int:
+        return min(100, int(self.rows * 100 / self.total)) if self.total else 0
+
+
+class ExportResult(NamedTuple):
+    rows: int
+    path: Path
+    cancelled: bool
+    duration_ms: float
 
-    if file_path:
-        if not file_path.endswith('.csv'):
-            file_path += '.csv'
-            
+
+def run_export(repo: CodeRepository, path: Path, filters: dict, status_labels: Dict[str, str], total: int = 0,
+               progress: Optional[Callable[[ExportProgress], None]] = None,
+               is_cancelled: Optional[Callable[[], bool]] = None,
+               batch_rows: int = ITER_BATCH_ROWS) -> ExportResult:
+    """Exporta a `path` los códigos que cumplen `filters` (parámetros de list_codes).
+
+    Se comprime con gzip si `path` termina en '.gz'. Si `is_cancelled()` pasa a
+    True no queda ningún archivo y se retorna con cancelled=True; ante un error se
+    borra el archivo parcial y se propaga la excepción.
+    """
+    start = time.perf_counter()
+    path = Path(path)
+    part = path.with_name(path.name + '.part')
+    rows = 0
+    if path.suffix == '.gz':
+        file = gzip.open(part, 'wt', compresslevel=GZIP_LEVEL, encoding='utf-8-sig', newline='')
+    else:
+        file = open(part, 'w', encoding='utf-8-sig', newline='')
+    try:
+        with file:
+            writer = csv.writer(file, delimiter=';')
+            writer.writerow(EXPORT_HEADER)
+            batches = repo.iter_codes(batch_rows=batch_rows, **filters)
+            try:
+                for batch in batches:
+                    if is_cancelled is not None and is_cancelled():
+                        break
+                    writer.writerows(export_row(row, status_labels) for row in batch)
+                    rows += len(batch)
+                    if progress is not None:
+                        progress(ExportProgress(rows, total, time.perf_counter() - start))
+            finally:
+                # Suelta la conexión de lectura aunque no se haya llegado al final
+                batches.close()
+        if is_cancelled is not None and is_cancelled():
+            part.unlink()
+            return ExportResult(rows, path, True, (time.perf_counter() - start) * 1000)
+        os.replace(part, path)
+    except BaseException:
+        if part.exists():
+            part.unlink()
+        raise
+    return ExportResult(rows, path, False, (time.perf_counter() - start) * 1000)
+
+
+class ExportJob:
+    """Corre run_export() en un hilo aparte (mismo esquema que ImportJob).
+
+    start() lanza la exportación; progress() retorna el último ExportProgress;
+    cancel() la detiene al terminar el lote en curso. Al terminar, last_result o
+    last_error tienen el resultado.
+    """
+
+    def __init__(self, repo: CodeRepository, status_labels: Dict[str, str], batch_rows: int = ITER_BATCH_ROWS) -> None:
+        self.repo = repo
+        self.status_labels = status_labels
+        self.batch_rows = batch_rows
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._cancel = threading.Event()
+        self._progress = ExportProgress()
+        self.path: Optional[Path] = None
+        self.last_result: Optional[ExportResult] = None
+        self.last_error: Optional[str] = None
+
+    def start(self, path: Path, filters: dict, total: int = 0) -> bool:
+        """Retorna False si ya hay una exportación en curso."""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return False
+            self.path = Path(path)
+            self._progress = ExportProgress(total=total)
+            self._cancel.clear()
+            self.last_result = None
+            self.last_error = None
+            self._thread = threading.Thread(target=self._run_in_thread, args=(dict(filters), total),
+                                            name="CodeTraceExport", daemon=True)
+            self._thread.start()
+        return True
+
+    def _run_in_thread(self, filters: dict, total: int) -> None:
         try:
-            with open(file_path, mode='w', newline='', encoding='utf-8-sig') as file:
-                writer = csv.writer(file, delimiter=';')
-                
-                # Cabecera compatible con importación
-                writer.writerow(["Código", "Descripción", "Stock_Caja", "Stock_Cajas", "Stock_Restante", "Estado", "Usado", "Imagen", "Fecha"])
-                
-                for item in data:
-                    code = item.get('code', '')
-                    description = item.get('description') or ''
-                    stock_per_box = item.get('stock_per_box') or ''
-                    stock_boxes = item.get('stock_boxes') or ''
-                    stock_remaining = item.get('stock_remaining') or ''
-                    status_id = item.get('status', 'disponible')
-                    status_text = status_labels.get(status_id, "Disponible")
-                    used = "Sí" if item.get('annotated') else "No"
-                    image_path = item.get('image_path') or ''
-                    fecha = item.get('created_at', '')
-                    
-                    writer.writerow([code, description, stock_per_box, stock_boxes, stock_remaining, status_text, used, image_path, fecha])
-                    
-            QMessageBox.information(parent, "Exportación exitosa", f"Exportados {len(data)} códigos a:\n{file_path}")
+            result = run_export(self.repo, self.path, filters, self.status_labels, total, self._on_progress,
+                                self._cancel.is_set, self.batch_rows)
+            with self._lock:
+                self.last_result = result
         except Exception as e:
-            QMessageBox.critical(parent, "Error", f"No se pudo exportar:\n{str(e)}")
+            with self._lock:
+                self.last_error = str(e)
+
+    def _on_progress(self, progress: ExportProgress) -> None:
+        with self._lock:
+            self._progress = progress
+
+    def cancel(self) -> None:
+        self._cancel.set()
+
+    def cancelled(self) -> bool:
+        return self._cancel.is_set()
+
+    def running(self) -> bool:
+        with self._lock:
+            return self._thread is not None and self._thread.is_alive()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Espera la exportación en curso. Retorna False si se agotó el timeout."""
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+            return not thread.is_alive()
+        return True
+
+    def progress(self) -> ExportProgress:
+        with self._lock:
+            return self._progress
@@ -0,0 +1,236 @@
+"""Miniaturas de las imágenes de producto para la vista previa.
+
+Las fotos se decodifican ya reducidas (QImageReader.setScaledSize) en un hilo de
+un QThreadPool, nunca en el hilo de la interfaz. Hay dos niveles de caché:
+
+- en memoria: QPixmapCache (LRU por tamaño en KiB)
+- en disco: ThumbnailCache, un PNG por (ruta, fecha de modificación, tamaño
+  del archivo, tamaño pedido); si la foto cambia, cambia la clave
+
+ThumbnailLoader.request() retorna el pixmap si ya está en memoria; si no, lo
+carga en segundo plano y emite `ready` al terminar. prefetch() hace lo mismo
+para las filas vecinas, sin emitir nada.
+"""
+import hashlib
+import os
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+from PyQt5.QtCore import QObject, QRunnable, QSize, Qt, QThreadPool, pyqtSignal
+from PyQt5.QtGui import QImage, QImageReader, QPixmap, QPixmapCache
+
+# Tamaño de la caché de pixmaps en memoria (KiB); QPixmapCache es global a la aplicación
+MEMORY_CACHE_KB = 32 * 1024
+# Tamaño máximo de la carpeta de miniaturas; al superarlo se borran las más antiguas
+DISK_CACHE_BYTES = 128 * 1024 * 1024
+
+
+def scaled_size(original: QSize, bounds: QSize) -> QSize:
+    """Tamaño de `original` reducido para entrar en `bounds` (sin agrandar)."""
+    if not original.isValid() or (original.width() <= bounds.width() and original.height() <= bounds.height()):
+        return original
+    return original.scaled(bounds, Qt.KeepAspectRatio)
+
+
+def read_scaled(path: str, bounds: QSize) -> QImage:
+    """Decodifica la imagen directamente al tamaño final. Retorna un QImage nulo
+    si el archivo no existe o no se puede leer."""
+    reader = QImageReader(path)
+    reader.setAutoTransform(True)
+    size = reader.size()
+    if size.isValid():
+        reader.setScaledSize(scaled_size(size, bounds))
+    image = reader.read()
+    if not image.isNull() and (image.width() > bounds.width() or image.height() > bounds.height()):
+        # Formatos que no informan el tamaño antes de decodificar
+        image = image.scaled(bounds, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+    return image
+
+
+class ThumbnailCache:
+    """Miniaturas en disco. Seguro desde varios hilos: cada miniatura se escribe en un
+    temporal y se renombra, así un lector nunca ve un archivo a medio escribir."""
+
+    def __init__(self, directory: Path, max_bytes: int = DISK_CACHE_BYTES) -> None:
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+
+    def key(self, path: str, bounds: QSize) -> Optional[str]:
+        """Clave de la miniatura, o None si la imagen original no existe."""
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        raw = f"{os.path.abspath(path)}|{stat.st_mtime_ns}|{stat.st_size}|{bounds.width()}x{bounds.height()}"
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    def _file(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}.png"
+
+    def load(self, key: str) -> QImage:
+        file = self._file(key)
+        if not file.exists():
+            return QImage()
+        image = QImage(str(file))
+        if not image.isNull():
+            try:
+                os.utime(file)  # la antigüedad para prune() es la del último uso
+            except OSError:
+                pass
+        return image
+
+    def store(self, key: str, image: QImage) -> None:
+        file = self._file(key)
+        tmp = file.with_name(f".{file.name}.{os.getpid()}.{id(image)}.tmp")
+        try:
+            file.parent.mkdir(parents=True, exist_ok=True)
+            if image.save(str(tmp), "PNG"):
+                os.replace(tmp, file)
+        except OSError:
+            pass
+        finally:
+            tmp.unlink(missing_ok=True)
+
+    def prune(self) -> int:
+        """Borra las miniaturas menos usadas hasta quedar bajo max_bytes. Retorna cuántas borró."""
+        if not self.directory.is_dir():
+            return 0
+        files: List[Tuple[float, int, Path]] = []
+        for file in self.directory.glob("*/*.png"):
+            try:
+                stat = file.stat()
+            except OSError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, file))
+        total = sum(size for _, size, _ in files)
+        removed = 0
+        for _, size, file in sorted(files):
+            if total <= self.max_bytes:
+                break
+            file.unlink(missing_ok=True)
+            total -= size
+            removed += 1
+        return removed
+
+
+class _ThumbnailSignals(QObject):
+    # clave de memoria, ruta, imagen (nula si no se pudo leer)
+    finished = pyqtSignal(str, str, QImage)
+
+
+class _ThumbnailTask(QRunnable):
+    """Busca la miniatura en disco o la genera desde la imagen original."""
+
+    def __init__(self, path: str, bounds: QSize, memory_key: str, disk: Optional[ThumbnailCache],
+                 signals: _ThumbnailSignals) -> None:
+        super().__init__()
+        self.path = path
+        self.bounds = bounds
+        self.memory_key = memory_key
+        self.disk = disk
+        self.signals = signals
+
+    def run(self) -> None:
+        key = self.disk.key(self.path, self.bounds) if self.disk is not None else None
+        image = self.disk.load(key) if key is not None else QImage()
+        if image.isNull():
+            image = read_scaled(self.path, self.bounds)
+            if key is not None and not image.isNull():
+                self.disk.store(key, image)
+        self.signals.finished.emit(self.memory_key, self.path, image)
+
+
+class _PruneTask(QRunnable):
+    def __init__(self, disk: ThumbnailCache) -> None:
+        super().__init__()
+        self.disk = disk
+
+    def run(self) -> None:
+        self.disk.prune()
+
+
+class ThumbnailLoader(QObject):
+    """Carga miniaturas en segundo plano para la vista previa.
+
+    request(path, bounds, ratio) retorna el QPixmap si ya está en memoria; si no,
+    retorna None y emite ready(path, pixmap) cuando termina (pixmap nulo si la
+    imagen no existe o no se puede leer). Las imágenes que no se pudieron leer se
+    recuerdan para no reintentarlas en cada selección.
+    """
+
+    ready = pyqtSignal(str, QPixmap)
+
+    # Prioridades en el pool: lo pedido por la selección pasa delante de la precarga
+    PRIORITY_REQUEST = 1
+    PRIORITY_PREFETCH = 0
+
+    def __init__(self, disk_directory: Optional[Path] = None, parent=None, max_threads: int = 2) -> None:
+        super().__init__(parent)
+        if QPixmapCache.cacheLimit() < MEMORY_CACHE_KB:
+            QPixmapCache.setCacheLimit(MEMORY_CACHE_KB)
+        self.disk = ThumbnailCache(disk_directory) if disk_directory is not None else None
+        self._pool = QThreadPool(self)
+        self._pool.setMaxThreadCount(max_threads)
+        self._signals = _ThumbnailSignals(self)
+        self._signals.finished.connect(self._on_finished)
+        # clave de memoria -> True si fue pedida (emite ready) o False si es solo precarga
+        self._pending: Dict[str, bool] = {}
+        self._failed: Set[str] = set()
+        if self.disk is not None:
+            self._pool.start(_PruneTask(self.disk), self.PRIORITY_PREFETCH)
+
+    @staticmethod
+    def _memory_key(path: str, bounds: QSize, ratio: float) -> str:
+        return f"thumb|{path}|{bounds.width()}x{bounds.height()}@{ratio:g}"
+
+    @staticmethod
+    def _pixel_bounds(bounds: QSize, ratio: float) -> QSize:
+        return QSize(round(bounds.width() * ratio), round(bounds.height() * ratio))
+
+    def request(self, path: str, bounds: QSize, ratio: float = 1.0) -> Optional[QPixmap]:
+        key = self._memory_key(path, bounds, ratio)
+        pixmap = QPixmapCache.find(key)
+        if pixmap is not None and not pixmap.isNull():
+            return pixmap
+        if key in self._failed:
+            return QPixmap()
+        if key in self._pending:
+            self._pending[key] = True
+            return None
+        self._pending[key] = True
+        self._pool.start(_ThumbnailTask(path, self._pixel_bounds(bounds, ratio), key, self.disk, self._signals),
+                         self.PRIORITY_REQUEST)
+        return None
+
+    def prefetch(self, paths: List[str], bounds: QSize, ratio: float = 1.0) -> None:
+        for path in paths:
+            key = self._memory_key(path, bounds, ratio)
+            if key in self._pending or key in self._failed or QPixmapCache.find(key) is not None:
+                continue
+            self._pending[key] = False
+            self._pool.start(_ThumbnailTask(path, self._pixel_bounds(bounds, ratio), key, self.disk, self._signals),
+                             self.PRIORITY_PREFETCH)
+
+    def forget(self, path: str, bounds: QSize, ratio: float = 1.0) -> None:
+        """Descarta la miniatura en memoria y el fallo recordado de `path`, p. ej. tras
+        reemplazar el archivo (la caché en disco ya cambia de clave con la fecha)."""
+        key = self._memory_key(path, bounds, ratio)
+        QPixmapCache.remove(key)
+        self._failed.discard(key)
+
+    def wait(self, msecs: int = -1) -> bool:
+        return self._pool.waitForDone(msecs)
+
+    def _on_finished(self, key: str, path: str, image: QImage) -> None:
+        wanted = self._pending.pop(key, False)
+        if image.isNull():
+            self._failed.add(key)
+            pixmap = QPixmap()
+        else:
+            # QPixmap solo se crea en el hilo de la interfaz
+            pixmap = QPixmap.fromImage(image)
+            ratio = float(key.rsplit("@", 1)[1])
+            pixmap.setDevicePixelRatio(ratio)
+            QPixmapCache.insert(key, pixmap)
+        if wanted:
+            self.ready.emit(path, pixmap)
@@ -0,0 +1,553 @@
+"""Importación de códigos desde archivos TXT o CSV, por tramos y fuera del hilo de la interfaz.
+
+El archivo se lee en tramos de IMPORT_CHUNK_ROWS filas: la cabecera se resuelve
+una sola vez, la existencia de cada tramo se consulta con una sola llamada a
+codes_exist y las rutas de imagen se verifican agrupadas por carpeta
+(ImagePathChecker). Cada tramo se carga en una tabla temporal sin tomar la
+conexión de escritura, y al final un solo INSERT ... SELECT publica todo en una
+transacción (CodeRepository.import_codes). Si la importación se cancela o falla
+no se publica nada y la base queda como estaba.
+
+Los archivos grandes se leen en paralelo: se dividen en rangos de bytes que
+terminan en un fin de fila (split_ranges), cada rango se interpreta en un proceso
+de un ProcessPoolExecutor y los resultados se entregan en el orden del archivo a
+la misma carga por tramos. La cabecera y el delimitador se resuelven una sola
+vez (read_csv_layout) para ambas lecturas.
+
+run_merge() es la importación con actualización: carga el archivo en una tabla
+temporal y agrega los códigos nuevos y el stock de los existentes en una sola
+transacción (ver repository/merge.py); con dry_run solo calcula el resumen.
+
+ImportJob corre una u otra en un hilo aparte; la interfaz consulta el avance con
+progress() (un QTimer, como con los respaldos).
+"""
+import csv
+import io
+import multiprocessing
+import os
+import re
+import threading
+import time
+from collections import deque
+from contextlib import closing
+from concurrent.futures import Future, ProcessPoolExecutor
+from pathlib import Path
+from typing import Callable, Deque, Dict, Iterator, List, NamedTuple, Optional, Set, Tuple
+
+from repository.db_querys import (CodeRepository, STATUS_DISPONIBLE, STATUS_PENDIENTE, STATUS_PEDIDO, STATUS_PERDIDO,
+                                  STATUS_NO_HAY_MAS, STATUS_ULTIMO)
+from repository.merge import MergePlan
+
+# Regex general para códigos (2-5 letras + 3-9 dígitos)
+CODE_REGEX = re.compile(r"^[A-Z]{2,5}\d{3,9}$")
+
+# Filas por tramo: una consulta de existencia y una transacción por tramo
+IMPORT_CHUNK_ROWS = 2000
+# Lectura en paralelo (procesos) para archivos grandes: tamaño mínimo del archivo,
+# tamaño de cada rango y máximo de procesos
+PARALLEL_MIN_BYTES = 8 * 1024 * 1024
+PARALLEL_RANGE_BYTES = 2 * 1024 * 1024
+PARALLEL_MAX_WORKERS = 8
+# Bloque de lectura al buscar los cortes entre rangos
+SPLIT_BLOCK_BYTES = 1024 * 1024
+# Rutas de una misma carpeta (en un tramo) a partir de las cuales conviene listarla
+# completa en vez de consultar cada archivo
+SCAN_DIR_MIN_PATHS = 8
+# Códigos ya existentes que se informan al terminar
+EXISTING_SAMPLE = 10
+
+# Modos de ImportJob
+MODE_INSERT = 'insert'      # solo códigos nuevos, por tramos (run_import)
+MODE_PREVIEW = 'preview'    # resumen de la importación con actualización, sin modificar la base
+MODE_UPSERT = 'upsert'      # códigos nuevos + stock de los existentes (run_merge)
+
+LABEL_TO_STATUS = {
+    'disponible': STATUS_DISPONIBLE,
+    'pendiente': STATUS_PENDIENTE,
+    'pedido': STATUS_PEDIDO,
+    'perdido': STATUS_PERDIDO,
+    'no hay más': STATUS_NO_HAY_MAS,
+    'no hay mas': STATUS_NO_HAY_MAS,
+    'último': STATUS_ULTIMO,
+    'ultimo': STATUS_ULTIMO
+}
+
+# Tupla de add_codes: (code, annotated, created_at, status, image_path, description, stock_per_box, stock_boxes, stock_remaining)
+ImportItem = Tuple
+
+
+class ImportColumns(NamedTuple):
+    """Índice de cada columna del CSV (None si no está)."""
+    code: int = 0
+    description: Optional[int] = None
+    stock_per_box: Optional[int] = None
+    stock_boxes: Optional[int] = None
+    stock_remaining: Optional[int] = None
+    status: Optional[int] = None
+    used: Optional[int] = None
+    image: Optional[int] = None
+
+
+def _find_column(header: List[str], names: Tuple[str, ...]) -> Optional[int]:
+    for i, h in enumerate(header):
+        if any(name in h for name in names):
+            return i
+    return None
+
+
+def resolve_columns(header: List[str]) -> ImportColumns:
+    """Ubica las columnas por nombre (Código, Descripción, Stock_Caja, Stock_Cajas,
+    Stock_Restante, Estado, Usado, Imagen); sin columna de código se usa la primera."""
+    header_lower = [h.strip().lower() for h in header]
+    code = _find_column(header_lower, ('código', 'codigo', 'code'))
+    return ImportColumns(
+        code=0 if code is None else code,
+        description=_find_column(header_lower, ('descripción', 'descripcion', 'description')),
+        stock_per_box=_find_column(header_lower, ('stock_caja', 'stock_per_box', 'cantidad_caja')),
+        stock_boxes=_find_column(header_lower, ('stock_cajas', 'stock_boxes', 'cajas')),
+        stock_remaining=_find_column(header_lower, ('stock_restante', 'stock_remaining', 'restante')),
+        status=_find_column(header_lower, ('estado', 'status')),
+        used=_find_column(header_lower, ('usado', 'editado')),
+        image=_find_column(header_lower, ('imagen', 'image', 'img', 'image_path')),
+    )
+
+
+def detect_delimiter(sample: str) -> str:
+    """Coma o punto y coma, el que más aparezca en la muestra."""
+    return ',' if sample.count(',') > sample.count(';') else ';'
+
+
+def _cell(row: List[str], index: Optional[int]) -> str:
+    return row[index].strip() if index is not None and len(row) > index else ''
+
+
+def _int_cell(row: List[str], index: Optional[int]) -> Optional[int]:
+    value = _cell(row, index)
+    if not value:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        return None
+
+
+def parse_csv_row(row: List[str], columns: ImportColumns) -> Optional[ImportItem]:
+    """Convierte una fila del CSV en la tupla de add_codes, o None si no tiene un código
+    válido. La ruta de imagen queda sin verificar (ver ImagePathChecker) y created_at
+    en None (add_codes usa la hora de la inserción)."""
+    if not row or len(row) <= columns.code:
+        return None
+    code = row[columns.code].strip().upper()
+    if not code or not CODE_REGEX.match(code):
+        return None
+    status = LABEL_TO_STATUS.get(_cell(row, columns.status).lower(), STATUS_DISPONIBLE)
+    used = _cell(row, columns.used).lower() in ('sí', 'si', 'yes', '1', 'true')
+    return (code, used, None, status, _cell(row, columns.image) or None,
+            _cell(row, columns.description) or None, _int_cell(row, columns.stock_per_box),
+            _int_cell(row, columns.stock_boxes), _int_cell(row, columns.stock_remaining))
+
+
+def parse_txt_line(line: str) -> Optional[ImportItem]:
+    """Un código por línea."""
+    code = line.strip().upper()
+    if not code or not CODE_REGEX.match(code):
+        return None
+    return (code, False, None, STATUS_DISPONIBLE)
+
+
+class CsvLayout(NamedTuple):
+    delimiter: str
+    columns: ImportColumns
+    data_start: int  # byte donde empieza la primera fila de datos
+
+
+def read_csv_layout(path: Path) -> Optional[CsvLayout]:
+    """Delimitador y columnas del CSV a partir de la cabecera; None si no tiene cabecera.
+    Lo usan tanto la lectura secuencial como la paralela."""
+    with open(path, 'rb') as f:
+        head = f.read(4096)
+        f.seek(0)
+        header_line = f.readline()
+    delimiter = detect_delimiter(head.decode('utf-8-sig', errors='ignore')[:1024])
+    header = next(csv.reader([header_line.decode('utf-8-sig')], delimiter=delimiter), None)
+    if not header:
+        return None
+    return CsvLayout(delimiter, resolve_columns(header), len(header_line))
+
+
+class ImportChunk(NamedTuple):
+    items: List[ImportItem]
+    rows: int        # filas leídas del archivo (válidas o no)
+    position: int    # bytes leídos hasta el final del tramo (aproximado: lectura con búfer)
+
+
+def default_workers() -> int:
+    """Procesos para leer en paralelo: uno menos que los núcleos (queda uno para la
+    interfaz y la inserción), hasta PARALLEL_MAX_WORKERS."""
+    return max(1, min(PARALLEL_MAX_WORKERS, (os.cpu_count() or 1) - 1))
+
+
+def iter_import_chunks(path: Path, chunk_rows: int = IMPORT_CHUNK_ROWS,
+                       workers: Optional[int] = None) -> Iterator[ImportChunk]:
+    """Lee el archivo (.csv o cualquier otro como TXT) en tramos de `chunk_rows` filas.
+
+    Los archivos de PARALLEL_MIN_BYTES o más se leen con `workers` procesos (por
+    defecto default_workers()); los tramos se entregan en el orden del archivo.
+    """
+    path = Path(path)
+    layout = None
+    if path.suffix.lower() == '.csv':
+        layout = read_csv_layout(path)
+        if layout is None:
+            return
+    workers = default_workers() if workers is None else workers
+    data_start = layout.data_start if layout is not None else 0
+    if workers > 1 and path.stat().st_size - data_start >= PARALLEL_MIN_BYTES:
+        yield from _iter_parallel(path, layout, chunk_rows, workers)
+    else:
+        yield from _iter_sequential(path, layout, chunk_rows)
+
+
+def _iter_sequential(path: Path, layout: Optional[CsvLayout], chunk_rows: int) -> Iterator[ImportChunk]:
+    with open(path, 'rb') as raw:
+        if layout is not None:
+            raw.seek(layout.data_start)
+            f = io.TextIOWrapper(raw, encoding='utf-8', newline='')
+            reader = csv.reader(f, delimiter=layout.delimiter)
+            parse = lambda row: parse_csv_row(row, layout.columns)  # noqa: E731
+            rows = reader
+        else:
+            f = io.TextIOWrapper(raw, encoding='utf-8-sig', errors='ignore')
+            parse, rows = parse_txt_line, f
+        items: List[ImportItem] = []
+        count = 0
+        for row in rows:
+            count += 1
+            item = parse(row)
+            if item is not None:
+                items.append(item)
+            if count == chunk_rows:
+                yield ImportChunk(items, count, raw.tell())
+                items, count = [], 0
+        if count:
+            yield ImportChunk(items, count, raw.tell())
+
+
+def split_ranges(path: Path, start: int, target_bytes: int) -> List[Tuple[int, int]]:
+    """Divide el archivo desde `start` en rangos de unos `target_bytes` que terminan en
+    un salto de línea. Un salto dentro de un campo entre comillas no es fin de fila:
+    solo se corta donde la cantidad de comillas anteriores es par."""
+    end = Path(path).stat().st_size
+    cuts = [start]
+    want = start + target_bytes
+    odd = False  # paridad de comillas en (pos + offset)
+    with open(path, 'rb') as f:
+        f.seek(start)
+        pos = start
+        while want < end:
+            block = f.read(SPLIT_BLOCK_BYTES)
+            if not block:
+                break
+            offset = 0
+            while want < pos + len(block):
+                newline = block.find(b'\n', max(want - pos, offset))
+                if newline < 0:
+                    break
+                odd ^= block.count(b'"', offset, newline) % 2 == 1
+                offset = newline + 1
+                if not odd:
+                    cuts.append(pos + offset)
+                    want = pos + offset + target_bytes
+            odd ^= block.count(b'"', offset) % 2 == 1
+            pos += len(block)
+    if cuts[-1] < end:
+        cuts.append(end)
+    return list(zip(cuts, cuts[1:]))
+
+
+def _parse_range(task: Tuple[str, int, int, Optional[CsvLayout]]) -> Tuple[List[ImportItem], int]:
+    """Proceso del pool: (ítems válidos, filas leídas) de un rango del archivo."""
+    path, start, end, layout = task
+    with open(path, 'rb') as f:
+        f.seek(start)
+        data = f.read(end - start)
+    if layout is None:
+        lines = data.decode('utf-8-sig' if start == 0 else 'utf-8', errors='ignore').split('\n')
+        if lines and not lines[-1]:
+            lines.pop()
+        return [item for item in map(parse_txt_line, lines) if item is not None], len(lines)
+    columns = layout.columns
+    rows = 0
+    items: List[ImportItem] = []
+    for row in csv.reader(io.StringIO(data.decode('utf-8'), newline=''), delimiter=layout.delimiter):
+        rows += 1
+        item = parse_csv_row(row, columns)
+        if item is not None:
+            items.append(item)
+    return items, rows
+
+
+def _iter_parallel(path: Path, layout: Optional[CsvLayout], chunk_rows: int, workers: int) -> Iterator[ImportChunk]:
+    ranges = split_ranges(path, layout.data_start if layout is not None else 0, PARALLEL_RANGE_BYTES)
+    # spawn en todas las plataformas: el hilo de importación no debe hacer fork de un proceso con Qt
+    executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+    pending: Deque[Tuple[int, Future]] = deque()
+    try:
+        next_range = iter(ranges)
+        while True:
+            # Pocos rangos en vuelo: la memoria no crece si la inserción va más lenta
+            while len(pending) < workers * 2:
+                rng = next(next_range, None)
+                if rng is None:
+                    break
+                pending.append((rng[1], executor.submit(_parse_range, (str(path), rng[0], rng[1], layout))))
+            if not pending:
+                break
+            end, future = pending.popleft()
+            items, rows = future.result()
+            for i in range(0, max(len(items), 1), chunk_rows):
+                last = i + chunk_rows >= len(items)
+                yield ImportChunk(items[i:i + chunk_rows], rows if last else 0, end)
+    finally:
+        # Cancelada o con error: los rangos que no empezaron se descartan
+        for _, future in pending:
+            future.cancel()
+        executor.shutdown(wait=True)
+
+
+class ImagePathChecker:
+    """Verifica la existencia de las rutas de imagen por lotes.
+
+    Las carpetas con muchas rutas en un tramo se listan una sola vez (os.scandir)
+    en lugar de consultar cada archivo: en carpetas de red cada consulta es un
+    viaje al servidor. Los resultados se recuerdan durante toda la importación.
+    """
+
+    def __init__(self, scan_min_paths: int = SCAN_DIR_MIN_PATHS) -> None:
+        self.scan_min_paths = scan_min_paths
+        self._listings: Dict[str, Optional[Set[str]]] = {}
+        self._known: Dict[str, bool] = {}
+        self.stats = {"scans": 0, "stats": 0}
+
+    def existing(self, paths: List[str]) -> Set[str]:
+        """Las rutas de `paths` que existen (como Path.exists: relativas al directorio actual)."""
+        by_dir: Dict[str, List[str]] = {}
+        for path in set(paths):
+            if path not in self._known:
+                by_dir.setdefault(os.path.dirname(os.path.abspath(path)), []).append(path)
+        for directory, pending in by_dir.items():
+            listing = self._listings.get(directory)
+            if listing is None and directory not in self._listings and len(pending) >= self.scan_min_paths:
+                listing = self._listings[directory] = self._scan(directory)
+            if directory in self._listings:
+                for path in pending:
+                    self._known[path] = listing is not None and os.path.normcase(os.path.basename(path)) in listing
+            else:
+                for path in pending:
+                    self.stats["stats"] += 1
+                    self._known[path] = os.path.exists(path)
+        return {path for path in paths if self._known[path]}
+
+    def _scan(self, directory: str) -> Optional[Set[str]]:
+        self.stats["scans"] += 1
+        try:
+            with os.scandir(directory) as entries:
+                return {os.path.normcase(entry.name) for entry in entries}
+        except OSError:
+            return None  # carpeta inexistente o sin permiso: ninguna imagen
+
+
+class ImportProgress(NamedTuple):
+    rows: int = 0
+    imported: int = 0
+    position: int = 0
+    total_bytes: int = 0
+    elapsed_s: float = 0.0
+
+    @property
+    def percent(self) -> int:
+        return min(100, int(self.position * 100 / self.total_bytes)) if self.total_bytes else 0
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.elapsed_s if self.elapsed_s > 0 else 0.0
+
+
+class ImportResult(NamedTuple):
+    imported: int
+    rows: int
+    existing: List[str]          # primeros EXISTING_SAMPLE códigos que ya existían
+    existing_count: int
+    missing_images: int          # rutas de imagen que no existen (se importan sin imagen)
+    cancelled: bool
+    duration_ms: float
+
+
+class ImportCancelled(Exception):
+    pass
+
+
+def run_import(repo: CodeRepository, path: Path, progress: Optional[Callable[[ImportProgress], None]] = None,
+               is_cancelled: Optional[Callable[[], bool]] = None, chunk_rows: int = IMPORT_CHUNK_ROWS,
+               workers: Optional[int] = None) -> ImportResult:
+    """Importa los códigos de `path` que no existan todavía.
+
+    Los códigos repetidos dentro del mismo archivo se importan todos (quedan
+    marcados como duplicados), como con add_codes. Los tramos se cargan en una tabla
+    temporal y se publican juntos al final (CodeRepository.import_codes): si
+    `is_cancelled()` pasa a True no se importa nada y se retorna con cancelled=True;
+    ante un error tampoco, y se propaga la excepción.
+    """
+    start = time.perf_counter()
+    total_bytes = Path(path).stat().st_size
+    images = ImagePathChecker()
+    existing: List[str] = []
+    existing_count = rows = staged = missing_images = 0
+
+    def chunks(source: Iterator[ImportChunk]) -> Iterator[List[ImportItem]]:
+        nonlocal existing_count, rows, staged, missing_images
+        for chunk in source:
+            if is_cancelled is not None and is_cancelled():
+                raise ImportCancelled()
+            rows += chunk.rows
+            if chunk.items:
+                found = set(repo.codes_exist([item[0] for item in chunk.items]))
+                items = [item for item in chunk.items if item[0] not in found]
+                existing_count += len(found)
+                existing.extend(sorted(found)[:max(0, EXISTING_SAMPLE - len(existing))])
+                with_image = [item[4] for item in items if len(item) > 4 and item[4]]
+                if with_image:
+                    present = images.existing(with_image)
+                    missing_images += sum(1 for p in with_image if p not in present)
+                    items = [item[:4] + (item[4] if item[4] in present else None,) + item[5:] if len(item) > 4 else item
+                             for item in items]
+                if items:
+                    staged += len(items)
+                    yield items
+            if progress is not None:
+                progress(ImportProgress(rows, staged, chunk.position, total_bytes, time.perf_counter() - start))
+        if is_cancelled is not None and is_cancelled():
+            raise ImportCancelled()
+
+    # closing: al cancelar, la lectura en paralelo descarta los rangos pendientes enseguida
+    with closing(iter_import_chunks(path, chunk_rows, workers)) as source:
+        try:
+            imported = repo.import_codes(chunks(source))
+        except ImportCancelled:
+            return ImportResult(0, rows, existing, existing_count, missing_images, True, (time.perf_counter() - start) * 1000)
+    return ImportResult(imported, rows, existing, existing_count, missing_images, False,
+                        (time.perf_counter() - start) * 1000)
+
+
+class MergeResult(NamedTuple):
+    plan: Optional[MergePlan]    # None si se canceló
+    rows: int
+    cancelled: bool
+    duration_ms: float
+
+
+def run_merge(repo: CodeRepository, path: Path, dry_run: bool = False,
+              progress: Optional[Callable[[ImportProgress], None]] = None,
+              is_cancelled: Optional[Callable[[], bool]] = None, chunk_rows: int = IMPORT_CHUNK_ROWS,
+              workers: Optional[int] = None) -> MergeResult:
+    """Importación con actualización (CodeRepository.merge_codes). Se puede cancelar
+    mientras se lee el archivo; después se aplica todo junto o nada."""
+    start = time.perf_counter()
+    total_bytes = Path(path).stat().st_size
+    rows = 0
+
+    def chunks(source: Iterator[ImportChunk]) -> Iterator[List[ImportItem]]:
+        nonlocal rows
+        for chunk in source:
+            if is_cancelled is not None and is_cancelled():
+                raise ImportCancelled()
+            rows += chunk.rows
+            yield chunk.items
+            if progress is not None:
+                progress(ImportProgress(rows, 0, chunk.position, total_bytes, time.perf_counter() - start))
+
+    with closing(iter_import_chunks(path, chunk_rows, workers)) as source:
+        try:
+            plan = repo.merge_codes(chunks(source), dry_run, None if dry_run else ImagePathChecker().existing)
+        except ImportCancelled:
+            return MergeResult(None, rows, True, (time.perf_counter() - start) * 1000)
+    return MergeResult(plan, rows, False, (time.perf_counter() - start) * 1000)
+
+
+class ImportJob:
+    """Corre run_import() o run_merge() en un hilo aparte (ver BackupService para el
+    mismo esquema).
+
+    start(path, mode) lanza la importación; progress() retorna el último
+    ImportProgress; cancel() pide cancelarla (al terminar el tramo en curso, sin
+    importar nada). Al terminar, last_result (ImportResult en MODE_INSERT, MergeResult en
+    los demás) o last_error tienen el resultado.
+    """
+
+    def __init__(self, repo: CodeRepository, chunk_rows: int = IMPORT_CHUNK_ROWS, workers: Optional[int] = None) -> None:
+        self.repo = repo
+        self.chunk_rows = chunk_rows
+        self.workers = workers
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._cancel = threading.Event()
+        self._progress = ImportProgress()
+        self.path: Optional[Path] = None
+        self.mode = MODE_INSERT
+        self.last_result = None
+        self.last_error: Optional[str] = None
+
+    def start(self, path: Path, mode: str = MODE_INSERT) -> bool:
+        """Retorna False si ya hay una importación en curso."""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return False
+            self.path = Path(path)
+            self.mode = mode
+            self._progress = ImportProgress(total_bytes=self.path.stat().st_size)
+            self._cancel.clear()
+            self.last_result = None
+            self.last_error = None
+            self._thread = threading.Thread(target=self._run_in_thread, name="CodeTraceImport", daemon=True)
+            self._thread.start()
+        return True
+
+    def _run_in_thread(self) -> None:
+        try:
+            if self.mode == MODE_INSERT:
+                result = run_import(self.repo, self.path, self._on_progress, self._cancel.is_set, self.chunk_rows,
+                                    self.workers)
+            else:
+                result = run_merge(self.repo, self.path, self.mode == MODE_PREVIEW, self._on_progress,
+                                   self._cancel.is_set, self.chunk_rows, self.workers)
+            with self._lock:
+                self.last_result = result
+        except Exception as e:
+            with self._lock:
+                self.last_error = str(e)
+
+    def _on_progress(self, progress: ImportProgress) -> None:
+        with self._lock:
+            self._progress = progress
+
+    def cancel(self) -> None:
+        self._cancel.set()
+
+    def cancelled(self) -> bool:
+        return self._cancel.is_set()
+
+    def running(self) -> bool:
+        with self._lock:
+            return self._thread is not None and self._thread.is_alive()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Espera la importación en curso. Retorna False si se agotó el timeout."""
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+            return not thread.is_alive()
+        return True
+
+    def progress(self) -> ImportProgress:
+        with self._lock:
+            return self._progress
@@ -0,0 +1,415 @@
+"""Visor con zoom progresivo por mosaicos para fotos de producto grandes.
+
+Primero se decodifica una versión reducida de toda la imagen (QImageReader con
+setScaledSize, rápido incluso con fotos de 50 MP) y se muestra ajustada a la
+ventana. Al acercar, la parte visible se pide en mosaicos de TILE_SIZE píxeles al
+nivel de resolución que corresponde al zoom (cada nivel es la mitad del
+anterior); cada mosaico se decodifica en un hilo del pool con setClipRect +
+setScaledSize, así nunca se carga la foto completa en memoria. Mientras un
+mosaico no llega se ve la versión reducida. Los mosaicos se guardan en una caché
+LRU limitada en bytes; los pedidos que dejan de verse antes de empezar se descartan.
+
+Las fotos con orientación EXIF (rotadas por la cámara) no se pueden recortar en
+su orientación visible: se muestran sin mosaicos, con a lo sumo SINGLE_MAX_SIDE
+píxeles de lado.
+"""
+import math
+from collections import OrderedDict
+from typing import Optional, Set, Tuple
+
+from PyQt5.QtCore import QObject, QPointF, QRect, QRectF, QRunnable, QSize, Qt, QThreadPool, pyqtSignal
+from PyQt5.QtGui import QColor, QImage, QImageIOHandler, QImageReader, QPainter, QPixmap
+from PyQt5.QtWidgets import QWidget
+
+# Lado de cada mosaico, en píxeles del nivel
+TILE_SIZE = 512
+# Memoria máxima de los mosaicos decodificados
+TILE_CACHE_BYTES = 96 * 1024 * 1024
+# Lado mayor de la versión reducida inicial
+PREVIEW_MAX_SIDE = 1600
+# Lado mayor cuando la imagen no se puede recortar por mosaicos
+SINGLE_MAX_SIDE = 4096
+# Zoom máximo (píxeles de pantalla por píxel de la imagen)
+MAX_ZOOM = 4.0
+
+# (nivel, columna, fila)
+TileKey = Tuple[int, int, int]
+
+
+def fit_size(size: QSize, max_side: int) -> QSize:
+    """`size` reducido para que su lado mayor no pase de `max_side`."""
+    if max(size.width(), size.height()) <= max_side:
+        return QSize(size)
+    return size.scaled(QSize(max_side, max_side), Qt.KeepAspectRatio)
+
+
+def _pixmap_bytes(pixmap: QPixmap) -> int:
+    return pixmap.width() * pixmap.height() * pixmap.depth() // 8
+
+
+class _ViewerSignals(QObject):
+    # generación, imagen reducida (nula si falló)
+    preview = pyqtSignal(int, QImage)
+    # generación, nivel, columna, fila, imagen
+    tile = pyqtSignal(int, int, int, int, QImage)
+
+
+class _PreviewTask(QRunnable):
+    def __init__(self, path: str, max_side: int, auto_transform: bool, generation: int, signals: _ViewerSignals) -> None:
+        super().__init__()
+        self.path = path
+        self.max_side = max_side
+        self.auto_transform = auto_transform
+        self.generation = generation
+        self.signals = signals
+
+    def run(self) -> None:
+        reader = QImageReader(self.path)
+        reader.setAutoTransform(self.auto_transform)
+        size = reader.size()
+        if size.isValid():
+            reader.setScaledSize(fit_size(size, self.max_side))
+        self.signals.preview.emit(self.generation, reader.read())
+
+
+class _TileTask(QRunnable):
+    def __init__(self, path: str, key: TileKey, source: QRect, target: QSize, generation: int,
+                 is_wanted, signals: _ViewerSignals) -> None:
+        super().__init__()
+        self.path = path
+        self.key = key
+        self.source = source
+        self.target = target
+        self.generation = generation
+        self.is_wanted = is_wanted
+        self.signals = signals
+
+    def run(self) -> None:
+        level, col, row = self.key
+        # El usuario pudo haber seguido de largo mientras el pedido esperaba en la cola
+        if not self.is_wanted(self.generation, self.key):
+            self.signals.tile.emit(self.generation, level, col, row, QImage())
+            return
+        reader = QImageReader(self.path)
+        reader.setAutoTransform(False)
+        # Qt aplica primero el recorte y después la escala
+        reader.setClipRect(self.source)
+        reader.setScaledSize(self.target)
+        self.signals.tile.emit(self.generation, level, col, row, reader.read())
+
+
+class TiledImageView(QWidget):
+    """Muestra una imagen con zoom (rueda, +/-) y desplazamiento (arrastrar, flechas).
+    Doble clic o 0 vuelven a ajustar la imagen a la ventana."""
+
+    # zoom actual en porcentaje (100 = un píxel de la imagen por píxel lógico)
+    zoomChanged = pyqtSignal(int)
+    # mensaje de error al abrir la imagen
+    failed = pyqtSignal(str)
+
+    def __init__(self, parent=None, max_threads: int = 3) -> None:
+        super().__init__(parent)
+        self.setFocusPolicy(Qt.StrongFocus)
+        self.setMinimumSize(200, 150)
+        self._pool = QThreadPool(self)
+        self._pool.setMaxThreadCount(max_threads)
+        self._signals = _ViewerSignals(self)
+        self._signals.preview.connect(self._on_preview)
+        self._signals.tile.connect(self._on_tile)
+        self._generation = 0
+        self._path: Optional[str] = None
+        self._size = QSize()
+        self._tiled = False
+        self._preview: Optional[QPixmap] = None
+        self._preview_scale = 0.0
+        self._tiles: "OrderedDict[TileKey, QPixmap]" = OrderedDict()
+        self._tile_bytes = 0
+        self._pending: Set[TileKey] = set()
+        self._wanted: Set[TileKey] = set()
+        self._zoom = 1.0
+        self._fit = True
+        self._center = QPointF()
+        self._drag_from: Optional[QPointF] = None
+        self._message = ''
+
+    # ------------------------------------------------------------------ imagen
+
+    def open(self, path: str) -> bool:
+        """Abre la imagen y lanza la decodificación de la versión reducida.
+        Retorna False (y emite failed) si no se puede leer."""
+        self._reset()
+        reader = QImageReader(path)
+        size = reader.size()
+        if not reader.canRead() or not size.isValid():
+            self._message = 'Error al cargar imagen'
+            self.failed.emit(reader.errorString())
+            self.update()
+            return False
+        self._path = path
+        transformation = reader.transformation()
+        # Sin recorte nativo (p. ej. PNG) cada mosaico decodificaría la foto entera
+        self._tiled = (transformation == QImageIOHandler.TransformationNone
+                       and reader.supportsOption(QImageIOHandler.ClipRect))
+        if transformation & QImageIOHandler.TransformationRotate90:
+            size = size.transposed()
+        self._size = size
+        self._center = QPointF(size.width() / 2, size.height() / 2)
+        self._message = 'Cargando imagen...'
+        max_side = PREVIEW_MAX_SIDE if self._tiled else SINGLE_MAX_SIDE
+        # Resolución de la versión reducida, conocida antes de decodificarla
+        self._preview_scale = fit_size(size, max_side).width() / size.width()
+        self._pool.start(_PreviewTask(path, max_side, not self._tiled, self._generation, self._signals))
+        self._apply_fit()
+        return True
+
+    def image_size(self) -> QSize:
+        return QSize(self._size)
+
+    def shutdown(self) -> None:
+        """Descarta los pedidos en cola y espera los que están en curso (al cerrar)."""
+        self._generation += 1
+        self._pool.clear()
+        self._pool.waitForDone()
+
+    def _reset(self) -> None:
+        self.shutdown()
+        self._path = None
+        self._size = QSize()
+        self._preview = None
+        self._preview_scale = 0.0
+        self._tiles.clear()
+        self._tile_bytes = 0
+        self._pending.clear()
+        self._wanted.clear()
+        self._fit = True
+
+    def _on_preview(self, generation: int, image: QImage) -> None:
+        if generation != self._generation:
+            return
+        if image.isNull():
+            self._message = 'Error al cargar imagen'
+            self.failed.emit('No se pudo decodificar la imagen')
+        else:
+            self._message = ''
+            self._preview = QPixmap.fromImage(image)
+        self.update()
+
+    # --------------------------------------------------------------- mosaicos
+
+    def _is_wanted(self, generation: int, key: TileKey) -> bool:
+        # Se llama desde los hilos del pool: solo lecturas atómicas de conjuntos y enteros
+        return generation == self._generation and key in self._wanted
+
+    def _level_for_zoom(self) -> int:
+        """Nivel de resolución con al menos un píxel por píxel de pantalla."""
+        needed = self._zoom * self.devicePixelRatioF()
+        if needed >= 1.0:
+            return 0
+        return max(0, int(math.floor(math.log2(1.0 / needed))))
+
+    def _visible_rect(self) -> QRectF:
+        """Parte de la imagen visible, en píxeles de la imagen."""
+        width, height = self.width() / self._zoom, self.height() / self._zoom
+        return QRectF(self._center.x() - width / 2, self._center.y() - height / 2, width, height)
+
+    def _tile_source(self, key: TileKey) -> QRect:
+        level, col, row = key
+        span = TILE_SIZE << level
+        return QRect(col * span, row * span, span, span).intersected(QRect(0, 0, self._size.width(), self._size.height()))
+
+    def _visible_tiles(self, level: int):
+        span = TILE_SIZE << level
+        visible = self._visible_rect().intersected(QRectF(0, 0, self._size.width(), self._size.height()))
+        if visible.isEmpty():
+            return []
+        cols = range(int(visible.left()) // span, int(math.ceil(visible.right())) // span + 1)
+        rows = range(int(visible.top()) // span, int(math.ceil(visible.bottom())) // span + 1)
+        return [(level, c, r) for r in rows for c in cols]
+
+    def _request_tiles(self) -> None:
+        if not self._tiled or self._path is None:
+            return
+        level = self._level_for_zoom()
+        # Si la versión reducida ya alcanza para este zoom no hacen falta mosaicos
+        if self._preview_scale >= 1.0 / (1 << level):
+            self._wanted = set()
+            return
+        keys = self._visible_tiles(level)
+        self._wanted = set(keys)
+        for key in keys:
+            if key in self._tiles or key in self._pending:
+                continue
+            source = self._tile_source(key)
+            if source.isEmpty():
+                continue
+            target = QSize(max(1, source.width() >> key[0]), max(1, source.height() >> key[0]))
+            self._pending.add(key)
+            self._pool.start(_TileTask(self._path, key, source, target, self._generation, self._is_wanted, self._signals))
+
+    def _on_tile(self, generation: int, level: int, col: int, row: int, image: QImage) -> None:
+        if generation != self._generation:
+            return
+        key = (level, col, row)
+        # Imagen nula: el pedido se descartó por no verse (o falló); se vuelve a pedir si hace falta
+        self._pending.discard(key)
+        if image.isNull():
+            return
+        pixmap = QPixmap.fromImage(image)
+        self._tiles[key] = pixmap
+        self._tile_bytes += _pixmap_bytes(pixmap)
+        self._evict()
+        if key in self._wanted:
+            self.update()
+
+    def _evict(self) -> None:
+        """Borra los mosaicos usados hace más tiempo hasta quedar bajo TILE_CACHE_BYTES;
+        los visibles se conservan."""
+        for key in list(self._tiles):
+            if self._tile_bytes <= TILE_CACHE_BYTES:
+                break
+            if key in self._wanted:
+                continue
+            self._tile_bytes -= _pixmap_bytes(self._tiles.pop(key))
+
+    def cached_tiles(self) -> int:
+        return len(self._tiles)
+
+    def cached_bytes(self) -> int:
+        return self._tile_bytes
+
+    # ------------------------------------------------------------------- zoom
+
+    def zoom(self) -> float:
+        return self._zoom
+
+    def _fit_zoom(self) -> float:
+        if not self._size.isValid() or self.width() <= 0 or self.height() <= 0:
+            return 1.0
+        return min(self.width() / self._size.width(), self.height() / self._size.height(), 1.0)
+
+    def _apply_fit(self) -> None:
+        self._fit = True
+        self._zoom = self._fit_zoom()
+        if self._size.isValid():
+            self._center = QPointF(self._size.width() / 2, self._size.height() / 2)
+        self._changed()
+
+    def fit(self) -> None:
+        self._apply_fit()
+
+    def set_zoom(self, zoom: float, anchor: Optional[QPointF] = None) -> None:
+        """Cambia el zoom manteniendo fijo el punto `anchor` (coordenadas del widget)."""
+        if not self._size.isValid():
+            return
+        zoom = max(self._fit_zoom(), min(MAX_ZOOM, zoom))
+        if anchor is None:
+            anchor = QPointF(self.width() / 2, self.height() / 2)
+        image_point = self._to_image(anchor)
+        self._zoom = zoom
+        self._fit = False
+        # El punto de la imagen bajo el cursor queda bajo el cursor
+        self._center = QPointF(image_point.x() - (anchor.x() - self.width() / 2) / zoom,
+                               image_point.y() - (anchor.y() - self.height() / 2) / zoom)
+        self._changed()
+
+    def pan(self, dx: float, dy: float) -> None:
+        """Desplaza la vista `dx`, `dy` píxeles de pantalla."""
+        self._center = QPointF(self._center.x() - dx / self._zoom, self._center.y() - dy / self._zoom)
+        self._changed()
+
+    def _to_image(self, point: QPointF) -> QPointF:
+        return QPointF(self._center.x() + (point.x() - self.width() / 2) / self._zoom,
+                       self._center.y() + (point.y() - self.height() / 2) / self._zoom)
+
+    def _clamp_center(self) -> None:
+        # Si la imagen entra en la ventana queda centrada; si no, no se puede salir de ella
+        half_w, half_h = self.width() / 2 / self._zoom, self.height() / 2 / self._zoom
+        w, h = self._size.width(), self._size.height()
+        x = w / 2 if 2 * half_w >= w else min(max(self._center.x(), half_w), w - half_w)
+        y = h / 2 if 2 * half_h >= h else min(max(self._center.y(), half_h), h - half_h)
+        self._center = QPointF(x, y)
+
+    def _changed(self) -> None:
+        if self._size.isValid():
+            self._clamp_center()
+            self._request_tiles()
+        self.zoomChanged.emit(round(self._zoom * 100))
+        self.update()
+
+    # ----------------------------------------------------------------- dibujo
+
+    def paintEvent(self, event) -> None:
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), self.palette().window())
+        if self._preview is None:
+            painter.setPen(QColor('#94a3b8'))
+            painter.drawText(self.rect(), Qt.AlignCenter, self._message)
+            return
+        painter.setRenderHint(QPainter.SmoothPixmapTransform)
+        origin = QPointF(self.width() / 2 - self._center.x() * self._zoom, self.height() / 2 - self._center.y() * self._zoom)
+        target = QRectF(origin.x(), origin.y(), self._size.width() * self._zoom, self._size.height() * self._zoom)
+        painter.drawPixmap(target, self._preview, QRectF(self._preview.rect()))
+        for key in self._wanted:
+            pixmap = self._tiles.get(key)
+            if pixmap is None:
+                continue
+            self._tiles.move_to_end(key)
+            source = self._tile_source(key)
+            painter.drawPixmap(QRectF(origin.x() + source.x() * self._zoom, origin.y() + source.y() * self._zoom,
+                                      source.width() * self._zoom, source.height() * self._zoom),
+                               pixmap, QRectF(pixmap.rect()))
+
+    # ------------------------------------------------------------------ eventos
+
+    def resizeEvent(self, event) -> None:
+        super().resizeEvent(event)
+        if self._fit:
+            self._apply_fit()
+        else:
+            self._changed()
+
+    def wheelEvent(self, event) -> None:
+        steps = event.angleDelta().y() / 120
+        if steps:
+            self.set_zoom(self._zoom * (1.25 ** steps), QPointF(event.pos()))
+        event.accept()
+
+    def mousePressEvent(self, event) -> None:
+        if event.button() == Qt.LeftButton:
+            self._drag_from = QPointF(event.pos())
+            self.setCursor(Qt.ClosedHandCursor)
+        super().mousePressEvent(event)
+
+    def mouseMoveEvent(self, event) -> None:
+        if self._drag_from is not None:
+            delta = QPointF(event.pos()) - self._drag_from
+            self._drag_from = QPointF(event.pos())
+            self.pan(delta.x(), delta.y())
+        super().mouseMoveEvent(event)
+
+    def mouseReleaseEvent(self, event) -> None:
+        self._drag_from = None
+        self.unsetCursor()
+        super().mouseReleaseEvent(event)
+
+    def mouseDoubleClickEvent(self, event) -> None:
+        if self._fit:
+            self.set_zoom(1.0, QPointF(event.pos()))
+        else:
+            self.fit()
+
+    def keyPressEvent(self, event) -> None:
+        key = event.key()
+        if key in (Qt.Key_Plus, Qt.Key_Equal):
+            self.set_zoom(self._zoom * 1.25)
+        elif key == Qt.Key_Minus:
+            self.set_zoom(self._zoom / 1.25)
+        elif key == Qt.Key_0:
+            self.fit()
+        elif key in (Qt.Key_Left, Qt.Key_Right, Qt.Key_Up, Qt.Key_Down):
+            step = 80
+            dx = step if key == Qt.Key_Left else -step if key == Qt.Key_Right else 0
+            dy = step if key == Qt.Key_Up else -step if key == Qt.Key_Down else 0
+            self.pan(dx, dy)
+        else:
+            super().keyPressEvent(event)
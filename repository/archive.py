@@ -0,0 +1,78 @@
+"""Archivado de códigos fríos en un hilo aparte.
+
+CodeRepository.archive_cold_codes mueve filas a codes_archive en lotes cortos (una
+transacción por lote) y recalcula la marca duplicate una sola vez al final, solo
+para los códigos movidos. ArchiveJob lo corre fuera del hilo de la interfaz, con el
+mismo esquema que BackupService y ExportJob: la interfaz sondea running() con un
+QTimer y al terminar lee last_result o last_error.
+"""
+import threading
+import time
+from typing import NamedTuple, Optional
+
+from repository.db_querys import CodeRepository, ArchivePolicy, DEFAULT_ARCHIVE_POLICY
+
+
+class ArchiveResult(NamedTuple):
+    moved: int
+    cancelled: bool
+    duration_ms: float
+
+
+class ArchiveJob:
+    """Corre archive_cold_codes() en un hilo aparte.
+
+    start() lanza el archivado (a lo sumo max_batches lotes); cancel() lo detiene
+    al terminar el lote en curso.
+    """
+
+    def __init__(self, repo: CodeRepository, policy: ArchivePolicy = DEFAULT_ARCHIVE_POLICY,
+                 max_batches: Optional[int] = None) -> None:
+        self.repo = repo
+        self.policy = policy
+        self.max_batches = max_batches
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._cancel = threading.Event()
+        self.last_result: Optional[ArchiveResult] = None
+        self.last_error: Optional[str] = None
+
+    def start(self) -> bool:
+        """Retorna False si ya hay un archivado en curso."""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return False
+            self._cancel.clear()
+            self.last_result = None
+            self.last_error = None
+            self._thread = threading.Thread(target=self._run_in_thread, name="CodeTraceArchive", daemon=True)
+            self._thread.start()
+        return True
+
+    def _run_in_thread(self) -> None:
+        start = time.perf_counter()
+        try:
+            moved = self.repo.archive_cold_codes(self.policy, self.max_batches, self._cancel.is_set)
+            with self._lock:
+                self.last_result = ArchiveResult(moved, self._cancel.is_set(), (time.perf_counter() - start) * 1000)
+        except Exception as e:
+            with self._lock:
+                self.last_error = str(e)
+
+    def cancel(self) -> None:
+        self._cancel.set()
+
+    def cancelled(self) -> bool:
+        return self._cancel.is_set()
+
+    def running(self) -> bool:
+        with self._lock:
+            return self._thread is not None and self._thread.is_alive()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Espera el archivado en curso. Retorna False si se agotó el timeout."""
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+            return not thread.is_alive()
+        return True
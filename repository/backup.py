@@ -0,0 +1,237 @@
+import gzip
+import os
+import re
+import shutil
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable, List, NamedTuple, Optional, Tuple
+
+# progress(páginas copiadas, páginas totales)
+ProgressCallback = Callable[[int, int], None]
+
+# Reinicios tolerados antes de copiar en un solo paso (ver copy_database)
+MAX_RESTARTS = 3
+
+
+class BackupPolicy(NamedTuple):
+    """Parámetros de los respaldos en línea.
+
+    - directory: carpeta de los respaldos (None: db/backups junto a la base)
+    - keep: cantidad de respaldos que se conservan (los más antiguos se borran)
+    - compress: guardar como .db.gz
+    - pages_per_step / step_sleep_ms: tamaño de cada paso de la copia y pausa entre
+      pasos; en la pausa la conexión de escritura de la aplicación puede confirmar
+    - interval_hours: antigüedad a partir de la cual due() pide un nuevo respaldo
+    """
+    directory: Optional[Path] = None
+    keep: int = 7
+    compress: bool = True
+    pages_per_step: int = 1024
+    step_sleep_ms: int = 10
+    interval_hours: float = 24.0
+
+
+DEFAULT_BACKUP_POLICY = BackupPolicy()
+
+
+class BackupResult(NamedTuple):
+    path: Path
+    pages: int
+    size_bytes: int
+    duration_ms: float
+    restarts: int
+
+
+class _TooManyRestarts(Exception):
+    pass
+
+
+def copy_database(source: sqlite3.Connection, dest: sqlite3.Connection, pages_per_step: int = 1024, step_sleep_ms: int = 10,
+                  progress: Optional[ProgressCallback] = None) -> Tuple[int, int]:
+    """Copia la base de `source` sobre `dest` con la API de backup, por pasos.
+    Retorna (páginas copiadas, reinicios).
+
+    Si otra conexión escribe en la base entre dos pasos, SQLite reinicia la copia.
+    Tras MAX_RESTARTS reinicios se copia en un solo paso: en WAL es una transacción
+    de lectura, no bloquea a la conexión de escritura.
+    """
+    state = {"remaining": None, "total": 0, "restarts": 0}
+
+    def on_step(status: int, remaining: int, total: int) -> None:
+        if state["remaining"] is not None and remaining > state["remaining"]:
+            state["restarts"] += 1
+            if state["restarts"] > MAX_RESTARTS:
+                raise _TooManyRestarts()
+        state["remaining"] = remaining
+        state["total"] = total
+        if progress is not None:
+            progress(total - remaining, total)
+
+    try:
+        source.backup(dest, pages=pages_per_step, progress=on_step, sleep=step_sleep_ms / 1000)
+    except _TooManyRestarts:
+        source.backup(dest, pages=-1)
+        state["total"] = dest.execute("PRAGMA page_count").fetchone()[0]
+        if progress is not None:
+            progress(state["total"], state["total"])
+    return state["total"], state["restarts"]
+
+
+def verify_database(path: Path) -> None:
+    """Ejecuta PRAGMA integrity_check sobre `path`; lanza sqlite3.DatabaseError si falla."""
+    conn = sqlite3.connect(f"{Path(path).resolve().as_uri()}?mode=ro", uri=True)
+    try:
+        messages = [row[0] for row in conn.execute("PRAGMA integrity_check")]
+    finally:
+        conn.close()
+    if messages != ["ok"]:
+        raise sqlite3.DatabaseError(f"Respaldo dañado ({path.name}): {'; '.join(messages[:5])}")
+
+
+def prepare_restore(backup_path: Path, workdir: Path) -> Path:
+    """Copia (descomprimiendo si es .gz) el respaldo a un archivo temporal en
+    `workdir` y lo verifica. Retorna la ruta del archivo verificado."""
+    backup_path = Path(backup_path)
+    target = Path(workdir) / f".restore-{os.getpid()}-{backup_path.name}.tmp"
+    opener = gzip.open if backup_path.suffix == ".gz" else open
+    try:
+        with opener(backup_path, "rb") as src, open(target, "wb") as dst:
+            shutil.copyfileobj(src, dst, 1024 * 1024)
+        verify_database(target)
+    except Exception:
+        target.unlink(missing_ok=True)
+        raise
+    return target
+
+
+class BackupService:
+    """Respaldos en línea de una base SQLite, con rotación y compresión opcional.
+
+    run() respalda en el hilo actual; start() lo hace en un hilo aparte y el
+    avance se consulta con progress() (la interfaz lo sondea con un QTimer).
+    Cada respaldo se escribe como <base>-AAAAMMDD-HHMMSS.db[.gz] y se renombra
+    recién al terminar, así la rotación nunca ve un archivo a medio escribir.
+    """
+
+    def __init__(self, db_path: Path, policy: BackupPolicy = DEFAULT_BACKUP_POLICY,
+                 before_backup: Optional[Callable[[], object]] = None) -> None:
+        self.db_path = Path(db_path)
+        self.policy = policy
+        self.directory = Path(policy.directory) if policy.directory else self.db_path.parent / "backups"
+        self.before_backup = before_backup
+        self._name = re.compile(rf"^{re.escape(self.db_path.stem)}-\d{{8}}-\d{{6}}\.db(\.gz)?$")
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._progress = (0, 0)
+        self.last_result: Optional[BackupResult] = None
+        self.last_error: Optional[str] = None
+
+    # ---------------------------------------------------------------- respaldo
+
+    def run(self, progress: Optional[ProgressCallback] = None) -> BackupResult:
+        """Respalda la base, comprime si corresponde y aplica la retención."""
+        if self.before_backup is not None:
+            self.before_backup()  # confirma la escritura diferida pendiente
+        self.directory.mkdir(parents=True, exist_ok=True)
+        start = time.perf_counter()
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        final = self.directory / f"{self.db_path.stem}-{stamp}.db{'.gz' if self.policy.compress else ''}"
+        partial = self.directory / f".{self.db_path.stem}-{stamp}.db.partial"
+
+        def on_progress(done: int, total: int) -> None:
+            with self._lock:
+                self._progress = (done, total)
+            if progress is not None:
+                progress(done, total)
+
+        source = sqlite3.connect(f"{self.db_path.resolve().as_uri()}?mode=ro", uri=True)
+        dest = sqlite3.connect(str(partial))
+        try:
+            pages, restarts = copy_database(source, dest, self.policy.pages_per_step,
+                                            self.policy.step_sleep_ms, on_progress)
+        except Exception:
+            dest.close()
+            partial.unlink(missing_ok=True)
+            raise
+        finally:
+            source.close()
+        dest.close()
+        try:
+            if self.policy.compress:
+                with open(partial, "rb") as src, gzip.open(f"{partial}.gz", "wb", compresslevel=6) as dst:
+                    shutil.copyfileobj(src, dst, 1024 * 1024)
+                partial.unlink()
+                os.replace(f"{partial}.gz", final)
+            else:
+                os.replace(partial, final)
+        except Exception:
+            partial.unlink(missing_ok=True)
+            Path(f"{partial}.gz").unlink(missing_ok=True)
+            raise
+        self.rotate()
+        result = BackupResult(final, pages, final.stat().st_size, (time.perf_counter() - start) * 1000, restarts)
+        with self._lock:
+            self.last_result = result
+            self.last_error = None
+        return result
+
+    def start(self) -> bool:
+        """Lanza run() en un hilo aparte. Retorna False si ya hay un respaldo en curso."""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return False
+            self._progress = (0, 0)
+            self._thread = threading.Thread(target=self._run_in_thread, name="CodeTraceBackup", daemon=True)
+            self._thread.start()
+        return True
+
+    def _run_in_thread(self) -> None:
+        try:
+            self.run()
+        except Exception as e:
+            with self._lock:
+                self.last_error = str(e)
+
+    def running(self) -> bool:
+        with self._lock:
+            return self._thread is not None and self._thread.is_alive()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Espera el respaldo en curso. Retorna False si se agotó el timeout."""
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+            return not thread.is_alive()
+        return True
+
+    def progress(self) -> Tuple[int, int]:
+        """(páginas copiadas, páginas totales) del respaldo en curso o del último."""
+        with self._lock:
+            return self._progress
+
+    # --------------------------------------------------------------- retención
+
+    def list_backups(self) -> List[Path]:
+        """Respaldos de esta base, del más antiguo al más reciente."""
+        if not self.directory.is_dir():
+            return []
+        return sorted(p for p in self.directory.iterdir() if self._name.match(p.name))
+
+    def rotate(self) -> List[Path]:
+        """Borra los respaldos que exceden policy.keep. Retorna los borrados."""
+        backups = self.list_backups()
+        removed = backups[:max(0, len(backups) - self.policy.keep)]
+        for path in removed:
+            path.unlink(missing_ok=True)
+        return removed
+
+    def due(self) -> bool:
+        """True si no hay respaldos o el último es más antiguo que policy.interval_hours."""
+        backups = self.list_backups()
+        if not backups:
+            return True
+        last = datetime.fromtimestamp(backups[-1].stat().st_mtime)
+        return datetime.now() - last >= timedelta(hours=self.policy.interval_hours)
@@ -0,0 +1,203 @@
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from repository.sqlite_profile import SQLiteProfile, DEFAULT_PROFILE, apply_profile
+
+
+class ConnectionManager:
+    """Una conexión de escritura compartida y un pool de conexiones de solo lectura.
+
+    - writer(): conexión de escritura protegida por un lock (un escritor a la vez,
+      desde cualquier hilo)
+    - reader(): conexión de solo lectura (`mode=ro`) del pool, asignada al hilo que
+      la pide mientras dure el bloque; las llamadas anidadas del mismo hilo (también
+      dentro de writer()) reutilizan la conexión activa. En WAL los lectores no
+      bloquean al escritor ni entre sí.
+
+    Con pool_size=0 (o una base en memoria) reader() entrega la conexión de escritura
+    bajo su lock, es decir, el comportamiento de una sola conexión.
+    """
+
+    def __init__(self, db_path: Path, writer: sqlite3.Connection, profile: SQLiteProfile = DEFAULT_PROFILE,
+                 pool_size: int = 4) -> None:
+        self.db_path = Path(db_path)
+        self.profile = profile
+        self.pool_size = 0 if str(db_path) == ":memory:" else pool_size
+        self._writer = writer
+        self._writer_lock = threading.RLock()
+        self._cond = threading.Condition()
+        self._idle: List[sqlite3.Connection] = []
+        self._all: List[sqlite3.Connection] = []
+        self._local = threading.local()
+        self._trace: Optional[Callable[[str], None]] = None
+        # Conexión propia para data_version(): no compite con el escritor ni con el pool
+        self._version_conn: Optional[sqlite3.Connection] = None
+        self._version_lock = threading.Lock()
+        self._closed = False
+        self._metrics = {
+            "reader_acquires": 0,
+            "reader_waits": 0,
+            "reader_wait_ms": 0.0,
+            "reader_max_wait_ms": 0.0,
+            "writer_acquires": 0,
+            "writer_waits": 0,
+            "writer_wait_ms": 0.0,
+            "writer_max_wait_ms": 0.0,
+        }
+
+    # ---------------------------------------------------------------- escritura
+
+    @contextmanager
+    def writer(self) -> Iterator[sqlite3.Connection]:
+        start = time.perf_counter()
+        contended = not self._writer_lock.acquire(blocking=False)
+        if contended:
+            self._writer_lock.acquire()
+        # Las lecturas anidadas dentro de una escritura usan la misma conexión (ven lo no confirmado)
+        outer = getattr(self._local, "conn", None)
+        self._local.conn = self._writer
+        try:
+            self._record("writer", contended, start)
+            yield self._writer
+        finally:
+            self._local.conn = outer
+            self._writer_lock.release()
+
+    # ------------------------------------------------------------------ lectura
+
+    @contextmanager
+    def reader(self) -> Iterator[sqlite3.Connection]:
+        current = getattr(self._local, "conn", None)
+        if current is not None:
+            yield current  # bloque anidado del mismo hilo
+            return
+        if self.pool_size <= 0:
+            with self.writer() as conn:
+                yield conn
+            return
+        conn = self._acquire()
+        self._local.conn = conn
+        try:
+            yield conn
+        finally:
+            self._local.conn = None
+            self._release(conn)
+
+    def _acquire(self) -> sqlite3.Connection:
+        start = time.perf_counter()
+        contended = False
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise sqlite3.ProgrammingError("El pool de conexiones está cerrado")
+                if self._idle:
+                    conn = self._idle.pop()
+                    break
+                if len(self._all) < self.pool_size:
+                    conn = None
+                    self._all.append(None)  # reserva el lugar mientras se conecta
+                    break
+                contended = True
+                self._cond.wait()
+            self._record("reader", contended, start)
+        if conn is None:
+            try:
+                conn = self._open_reader()
+            except Exception:
+                with self._cond:
+                    self._all.remove(None)
+                    self._cond.notify()
+                raise
+            with self._cond:
+                self._all[self._all.index(None)] = conn
+        return conn
+
+    def _release(self, conn: sqlite3.Connection) -> None:
+        if conn.in_transaction:
+            conn.rollback()
+        with self._cond:
+            if self._closed:
+                conn.close()
+                return
+            self._idle.append(conn)
+            self._cond.notify()
+
+    def _open_reader(self) -> sqlite3.Connection:
+        uri = f"{self.db_path.resolve().as_uri()}?mode=ro"
+        conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        apply_profile(conn, self.profile, read_only=True)
+        if self._trace is not None:
+            conn.set_trace_callback(self._trace)
+        return conn
+
+    def data_version(self) -> int:
+        """PRAGMA data_version leído sin tomar el lock de escritura.
+
+        Se lee en una conexión de solo lectura dedicada, para la que toda
+        confirmación (de la conexión de escritura, de otros hilos u otras
+        estaciones) es de "otra conexión": el valor cambia con cada commit.
+        """
+        if self.pool_size <= 0:
+            with self.writer() as conn:
+                return conn.execute("PRAGMA data_version").fetchone()[0]
+        with self._version_lock:
+            if self._version_conn is None:
+                if self._closed:
+                    raise sqlite3.ProgrammingError("El pool de conexiones está cerrado")
+                self._version_conn = self._open_reader()
+            return self._version_conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def active(self) -> sqlite3.Connection:
+        """Conexión asignada al hilo actual (dentro de reader()/writer()), o la de escritura."""
+        conn = getattr(self._local, "conn", None)
+        return conn if conn is not None else self._writer
+
+    # ---------------------------------------------------------------- general
+
+    def set_trace_callback(self, callback: Optional[Callable[[str], None]]) -> None:
+        """Instala el callback de trazas en todas las conexiones (actuales y futuras)."""
+        self._trace = callback
+        with self._writer_lock:
+            self._writer.set_trace_callback(callback)
+        with self._cond:
+            for conn in self._all:
+                if conn is not None:
+                    conn.set_trace_callback(callback)
+        with self._version_lock:
+            if self._version_conn is not None:
+                self._version_conn.set_trace_callback(callback)
+
+    def _record(self, kind: str, contended: bool, start: float) -> None:
+        waited = (time.perf_counter() - start) * 1000
+        m = self._metrics
+        m[f"{kind}_acquires"] += 1
+        if contended:
+            m[f"{kind}_waits"] += 1
+            m[f"{kind}_wait_ms"] += waited
+            m[f"{kind}_max_wait_ms"] = max(m[f"{kind}_max_wait_ms"], waited)
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._cond:
+            data = dict(self._metrics)
+            data["pool_size"] = self.pool_size
+            data["readers_open"] = sum(1 for c in self._all if c is not None)
+            data["readers_idle"] = len(self._idle)
+        return data
+
+    def close(self) -> None:
+        """Cierra las conexiones de lectura libres; las que están en uso se cierran al devolverse."""
+        with self._cond:
+            self._closed = True
+            for conn in self._idle:
+                conn.close()
+            self._idle.clear()
+            self._cond.notify_all()
+        with self._version_lock:
+            if self._version_conn is not None:
+                self._version_conn.close()
+                self._version_conn = None
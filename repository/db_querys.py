@@ -1,7 +1,21 @@
+import functools
+import re
 import sqlite3
+import threading
+import time
 from pathlib import Path
-from typing import List, Optional, Tuple, Dict, Any
-from datetime import datetime
+from typing import Callable, Iterable, Iterator, List, NamedTuple, Optional, Set, Tuple, Dict, Any
+from datetime import date, datetime, timedelta, timezone
+
+from repository.migrations import migrate, table_exists, create_description_fts
+from repository.sqlite_profile import SQLiteProfile, DEFAULT_PROFILE, apply_profile, read_pragmas
+from repository.write_behind import WriteBehindQueue, WriteBehindTimeout, DELETED
+from repository.query_cache import QueryCache, MISS, estimate_bytes
+from repository.connections import ConnectionManager
+from repository.maintenance import MaintenancePolicy, MaintenanceScheduler, DEFAULT_MAINTENANCE_POLICY
+from repository.backup import BackupPolicy, BackupResult, BackupService, DEFAULT_BACKUP_POLICY, ProgressCallback, copy_database, prepare_restore
+from repository.merge import (MergePlan, NEW_CODE_COLUMNS, apply_merge, create_new_staging, create_staging, drop_staging,
+                              plan_merge, publish_new_rows, stage_items, stage_new_rows)
 
 DB_NAME = "codes.db"
 FULL_DB_PATH = Path.joinpath(Path.cwd(), "db", DB_NAME)
@@ -69,6 +83,262 @@ def should_auto_update_status(is_annotated: bool, current_status: Optional[str],
         return False
     
     return True
+
+
+def merged_status(annotated: int, status: Optional[str], stock_per_box: Optional[int], stock_boxes: Optional[int],
+                  stock_remaining: Optional[int]) -> str:
+    """Estado tras cargar un stock: el calculado si corresponde (ver should_auto_update_status),
+    si no el actual. Se registra como función SQL para la importación con actualización."""
+    new_status = calculate_status_from_stock(stock_per_box, stock_boxes, stock_remaining)
+    if should_auto_update_status(bool(annotated), status, new_status):
+        return new_status
+    return status or STATUS_DISPONIBLE
+
+
+def refresh_duplicates(conn: sqlite3.Connection, codes: Optional[Iterable[str]] = None) -> None:
+    """Recalcula la marca duplicate (sin commit).
+    Solo escribe las filas cuya marca cambia, así el registro de cambios no se llena.
+    Con `codes` solo revisa esos códigos (por el índice de code) en lugar de toda la tabla."""
+    if codes is not None:
+        values = list(dict.fromkeys(code for code in codes if code is not None))
+        if len(values) <= DUPLICATES_TARGETED_MAX:
+            for start in range(0, len(values), LOOKUP_CHUNK_SIZE):
+                chunk = values[start:start + LOOKUP_CHUNK_SIZE]
+                conn.execute(
+                    f"""
+                    UPDATE codes
+                    SET duplicate = 1 - duplicate
+                    WHERE code IN ({','.join('?' * len(chunk))})
+                      AND duplicate != ((SELECT COUNT(*) FROM codes AS c WHERE c.code = codes.code) > 1)
+                    """,
+                    chunk,
+                )
+            return
+    conn.execute(
+        """
+        UPDATE codes
+        SET duplicate = 0
+        WHERE duplicate = 1 AND code NOT IN (
+            SELECT code FROM codes GROUP BY code HAVING COUNT(*) > 1
+        )
+        """
+    )
+    conn.execute(
+        """
+        UPDATE codes
+        SET duplicate = 1
+        WHERE duplicate = 0 AND code IN (
+            SELECT code FROM codes GROUP BY code HAVING COUNT(*) > 1
+        )
+        """
+    )
+
+
+# Con más códigos que esto refresh_duplicates recorre la tabla entera (una pasada
+# completa sale más barata que una búsqueda por índice por código)
+DUPLICATES_TARGETED_MAX = 20000
+
+# Búsquedas masivas por clave (bulk_select)
+LOOKUP_CHUNK_SIZE = 500          # parámetros por sentencia (SQLite < 3.32 admite 999)
+LOOKUP_TEMP_TABLE_MIN = 5000     # desde aquí conviene cargar las claves en una tabla temporal
+
+# Filas por lote de iter_codes (exportación)
+ITER_BATCH_ROWS = 5000
+# Espera máxima de una barrera sobre la cola de escritura diferida (la cola descarta
+# un lote tras varios fallos, así que solo se agota con la base bloqueada mucho tiempo)
+BARRIER_TIMEOUT_S = 15.0
+
+
+def bulk_select(conn: sqlite3.Connection, select: str, column: str, values: List[Any],
+                strategy: Optional[str] = None) -> List[sqlite3.Row]:
+    """Ejecuta `{select} WHERE {column} IN (...)` para cualquier cantidad de valores.
+
+    - 'in': una sola sentencia con un parámetro por valor (pocos valores)
+    - 'chunks': sentencias de LOOKUP_CHUNK_SIZE parámetros
+    - 'temp': carga los valores en una tabla temporal y usa `IN (SELECT ...)`,
+      que SQLite resuelve con una búsqueda por índice por cada valor
+
+    Sin `strategy` se elige según la cantidad. Los valores se deduplican; el orden
+    del resultado no está definido.
+    """
+    values = list(dict.fromkeys(values))
+    if strategy is None:
+        if len(values) <= LOOKUP_CHUNK_SIZE:
+            strategy = "in"
+        elif len(values) < LOOKUP_TEMP_TABLE_MIN:
+            strategy = "chunks"
+        else:
+            strategy = "temp"
+    cur = conn.cursor()
+    if strategy == "temp":
+        cur.execute("CREATE TEMP TABLE IF NOT EXISTS bulk_keys (value PRIMARY KEY) WITHOUT ROWID")
+        try:
+            # En orden: la inserción en el B-tree es secuencial y las búsquedas en el índice tienen mejor localidad
+            cur.executemany("INSERT INTO temp.bulk_keys(value) VALUES (?)", ((v,) for v in sorted(values)))
+            cur.execute(f"{select} WHERE {column} IN (SELECT value FROM temp.bulk_keys)")
+            return cur.fetchall()
+        finally:
+            cur.execute("DELETE FROM temp.bulk_keys")
+            conn.commit()
+    size = len(values) if strategy == "in" else LOOKUP_CHUNK_SIZE
+    rows = []
+    for start in range(0, len(values), max(size, 1)):
+        chunk = values[start:start + size]
+        cur.execute(f"{select} WHERE {column} IN ({','.join('?' * len(chunk))})", chunk)
+        rows.extend(cur.fetchall())
+    return rows
+
+
+_ASCII_LOWER = str.maketrans("ABCDEFGHIJKLMNOPQRSTUVWXYZ", "abcdefghijklmnopqrstuvwxyz")
+
+
+def like_contains(value: Optional[str], term: str) -> bool:
+    """Equivalente a `value LIKE '%term%'` de SQLite (solo ignora mayúsculas ASCII)."""
+    return value is not None and term.translate(_ASCII_LOWER) in value.translate(_ASCII_LOWER)
+
+
+_CODE_PARTS = re.compile(r"^(.*?)([0-9]*)$", re.S)
+_CODE_RANGE = re.compile(r"^\s*([A-Z]+)\s*([0-9]+)\s*[-–]\s*([0-9]+)\s*$")
+_MAX_INT64 = 2 ** 63 - 1
+
+
+def split_code(code: str) -> Tuple[str, Optional[int]]:
+    """Separa un código en (prefijo, número): 'CQ1234' -> ('CQ', 1234).
+    Mismo criterio que las columnas prefix/number (ver migración 4)."""
+    prefix, digits = _CODE_PARTS.match(code).groups()
+    return prefix, min(int(digits), _MAX_INT64) if digits else None
+
+
+def natural_code_key(code: Optional[str]) -> Tuple[str, int, str]:
+    """Clave de orden natural (prefix, number, code), como ORDER BY de list_codes."""
+    if code is None:
+        return ("", -1, "")
+    prefix, number = split_code(code)
+    return (prefix, -1 if number is None else number, code)
+
+
+def parse_code_range(search: Optional[str]) -> Optional[Tuple[str, int, int]]:
+    """Interpreta búsquedas de rango numérico como 'CQ 1000-2000' -> ('CQ', 1000, 2000)."""
+    match = _CODE_RANGE.match(search.upper()) if search else None
+    if match is None:
+        return None
+    low, high = sorted((int(match.group(2)), int(match.group(3))))
+    return match.group(1), low, high
+
+
+def code_in_range(code: Optional[str], code_range: Tuple[str, int, int]) -> bool:
+    if code is None:
+        return False
+    prefix, number = split_code(code)
+    return prefix == code_range[0] and number is not None and code_range[1] <= number <= code_range[2]
+
+
+def prefix_upper_bound(prefix: str) -> str:
+    """Menor cadena mayor que todas las que empiezan con `prefix` (rango code >= p AND code < cota)."""
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1) if prefix else "\U0010ffff"
+
+
+def fts_phrase(term: str) -> str:
+    """Término de búsqueda como frase literal de FTS5 (sin operadores)."""
+    return '"' + term.replace('"', '""') + '"'
+
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def to_epoch_ms(value: Any) -> int:
+    """Fecha -> milisegundos desde 1970 (formato de created_at). Acepta datetime o texto
+    ISO; sin zona horaria se toma como UTC, igual que datetime.utcnow()."""
+    if isinstance(value, int):
+        return value
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return (value - _EPOCH) // timedelta(milliseconds=1)
+
+
+def from_epoch_ms(ms: int) -> datetime:
+    """Milisegundos desde 1970 -> datetime en hora local (para mostrar)."""
+    return datetime.fromtimestamp(ms / 1000)
+
+
+def utc_from_epoch_ms(ms: int) -> datetime:
+    """Milisegundos desde 1970 -> datetime UTC sin zona horaria, el inverso exacto de
+    to_epoch_ms (como lo escribía datetime.utcnow())."""
+    return _EPOCH + timedelta(milliseconds=ms)
+
+
+def local_days_ms(first: date, last: date) -> Tuple[int, int]:
+    """Días locales [first, last] como rango semiabierto [desde, hasta) en epoch ms,
+    para los filtros created_from/created_to de list_codes."""
+    start = datetime(first.year, first.month, first.day).astimezone()
+    end = (datetime(last.year, last.month, last.day) + timedelta(days=1)).astimezone()
+    return to_epoch_ms(start), to_epoch_ms(end)
+
+
+def row_matches_filters(row, annotated: Optional[bool] = None, duplicates_only: Optional[bool] = None,
+                        search: Optional[str] = None, status: Optional[str] = None,
+                        created_from: Optional[int] = None, created_to: Optional[int] = None) -> bool:
+    """Evalúa en Python los mismos filtros que CodeRepository.list_codes."""
+    if annotated is not None and bool(row["annotated"]) != annotated:
+        return False
+    if duplicates_only and not row["duplicate"]:
+        return False
+    code_range = parse_code_range(search)
+    if code_range is not None:
+        if not code_in_range(row["code"], code_range):
+            return False
+    elif search and not (like_contains(row["code"], search.upper()) or like_contains(row["description"], search)):
+        return False
+    if status and row["status"] != status:
+        return False
+    if created_from is not None and row["created_at"] < created_from:
+        return False
+    if created_to is not None and row["created_at"] >= created_to:
+        return False
+    return True
+
+
+def new_code_values(item: Tuple, auto_calc_status: bool = True) -> Tuple:
+    """Valores de NEW_CODE_COLUMNS para una tupla de add_codes (code, annotated, created_at,
+    status, image_path, description, stock_per_box, stock_boxes, stock_remaining).
+    prefix/number se calculan aquí: el trigger de la migración 4 solo los completa si faltan."""
+    padded = tuple(item) + (None,) * (9 - len(item))
+    code, annotated, created_at, status, image_path, description, per_box, boxes, remaining = padded
+    if len(item) <= 3:
+        status = STATUS_DISPONIBLE
+    # Auto-calcular status basado en stock
+    if auto_calc_status:
+        calculated_status = calculate_status_from_stock(per_box, boxes, remaining)
+        if should_auto_update_status(annotated, status, calculated_status):
+            status = calculated_status
+    prefix, number = split_code(code)
+    return (code, prefix, number, to_epoch_ms(created_at or datetime.utcnow()), int(annotated), 0,
+            status or STATUS_DISPONIBLE, image_path, description, per_box, boxes, remaining)
+
+
+class ArchivePolicy(NamedTuple):
+    """Qué códigos se consideran fríos y se mueven a codes_archive.
+
+    - statuses: estados terminales que se archivan
+    - older_than_days: antigüedad mínima (según created_at)
+    - batch_size: filas por transacción (transacciones cortas, no bloquean a la interfaz)
+    """
+    statuses: Tuple[str, ...] = (STATUS_NO_HAY_MAS, STATUS_PERDIDO)
+    older_than_days: int = 90
+    batch_size: int = 500
+
+
+DEFAULT_ARCHIVE_POLICY = ArchivePolicy()
+
+# Columnas por las que list_codes/iter_codes permiten ordenar
+_LIST_ORDER_COLUMNS = {"created_at", "code", "annotated", "duplicate", "status"}
+
+# Columnas comunes a codes y codes_archive
+_ROW_COLUMNS = "id, code, created_at, annotated, duplicate, status, image_path, description, stock_per_box, stock_boxes, stock_remaining"
+
+
 STATUS_LABELS = {
     STATUS_DISPONIBLE: "Disponible",
     STATUS_PENDIENTE: "Pendiente",
@@ -78,112 +348,337 @@ STATUS_LABELS = {
     STATUS_NO_HAY_MAS: "No hay más",
 }
 
+def _reads(method):
+    """Ejecuta el método con una conexión de lectura del pool (ver ConnectionManager)."""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._connections.reader():
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+def _writes(method):
+    """Ejecuta el método con la conexión de escritura (un escritor a la vez)."""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._connections.writer():
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
 class CodeRepository:
-    def __init__(self, db_path: Optional[Path] = None) -> None:
+    def __init__(self, db_path: Optional[Path] = None, profile: SQLiteProfile = DEFAULT_PROFILE, write_behind: bool = False,
+                 cache_entries: int = 64, read_pool_size: int = 4) -> None:
         self.db_path = Path(db_path) if db_path else Path(FULL_DB_PATH)
+        self.profile = profile
+        self._writer: Optional[WriteBehindQueue] = None
+        # Caché de list_codes/stats/search_codes_prefix/count_by_prefix (0 = desactivada)
+        self._cache: Optional[QueryCache] = QueryCache(max_entries=cache_entries) if cache_entries > 0 else None
+        self._write_version = 0
+        self._write_version_lock = threading.Lock()
         try:
-            if Path.exists(FULL_DB_PATH):
-                self.db_path = Path(db_path) if db_path else Path(FULL_DB_PATH)
-                self.conn = sqlite3.connect(str(self.db_path))
-                self.conn.row_factory = sqlite3.Row
-                self._init_db()
-            else:
-                Path.mkdir(FULL_DB_PATH.parent, parents=True, exist_ok=True)
-                self.conn = sqlite3.connect(str(self.db_path))
-                self.conn.row_factory = sqlite3.Row
-                self._init_db()
-                self.db_path = Path(db_path) if db_path else Path(FULL_DB_PATH)        
+            Path.mkdir(self.db_path.parent, parents=True, exist_ok=True)
+            # Conexión de escritura; se comparte entre hilos bajo el lock de ConnectionManager
+            self.conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+            self.conn.row_factory = sqlite3.Row
+            apply_profile(self.conn, self.profile)
+            self._init_db()
+            self._connections = ConnectionManager(self.db_path, self.conn, self.profile, pool_size=read_pool_size)
         except Exception as e:
             print(f"Error al conectar o inicializar la base de datos: {e}")
             raise
+        if write_behind:
+            self.enable_write_behind()
     
     def _init_db(self) -> None:
-        cur = self.conn.cursor()
-        cur.execute(
-            """
-            CREATE TABLE IF NOT EXISTS codes (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                code TEXT NOT NULL,
-                created_at TEXT NOT NULL,
-                annotated INTEGER NOT NULL DEFAULT 0,
-                duplicate INTEGER NOT NULL DEFAULT 0,
-                status TEXT NOT NULL DEFAULT 'disponible',
-                image_path TEXT DEFAULT NULL,
-                description TEXT DEFAULT NULL,
-                stock_per_box INTEGER DEFAULT NULL,
-                stock_boxes INTEGER DEFAULT NULL,
-                stock_remaining INTEGER DEFAULT NULL
-            )
-            """
-        )
-        cur.execute("CREATE INDEX IF NOT EXISTS idx_codes_code ON codes(code)")
-        # Migrar tablas existentes agregando columnas si no existen
-        try:
-            cur.execute("ALTER TABLE codes ADD COLUMN status TEXT NOT NULL DEFAULT 'disponible'")
-        except sqlite3.OperationalError:
-            pass  # La columna ya existe
-        try:
-            cur.execute("ALTER TABLE codes ADD COLUMN image_path TEXT DEFAULT NULL")
-        except sqlite3.OperationalError:
-            pass  # La columna ya existe
-        try:
-            cur.execute("ALTER TABLE codes ADD COLUMN description TEXT DEFAULT NULL")
-        except sqlite3.OperationalError:
-            pass  # La columna ya existe
-        try:
-            cur.execute("ALTER TABLE codes ADD COLUMN stock_per_box INTEGER DEFAULT NULL")
-        except sqlite3.OperationalError:
-            pass  # La columna ya existe
-        try:
-            cur.execute("ALTER TABLE codes ADD COLUMN stock_boxes INTEGER DEFAULT NULL")
-        except sqlite3.OperationalError:
-            pass  # La columna ya existe
+        """Lleva el esquema a la última versión (ver repository/migrations.py)."""
+        migrate(self.conn)
+        self.description_fts = table_exists(self.conn, "codes_fts")
+        if not self.description_fts:
+            # La migración 5 pudo correr con un SQLite sin FTS5 trigram
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                self.description_fts = create_description_fts(self.conn)
+                self.conn.commit()
+            except Exception:
+                self.conn.rollback()
+                raise
+
+    def diagnostics(self) -> Dict[str, Any]:
+        """Retorna el perfil configurado, los PRAGMA efectivos y el tamaño de los archivos."""
+        with self._connections.writer() as conn:
+            pragmas = read_pragmas(conn)
+        files = {}
+        for suffix in ("", "-wal", "-shm"):
+            path = Path(f"{self.db_path}{suffix}")
+            files[path.name] = path.stat().st_size if path.exists() else 0
+        return {
+            "db_path": str(self.db_path),
+            "sqlite_version": sqlite3.sqlite_version,
+            "profile": self.profile._asdict(),
+            "pragmas": pragmas,
+            "files": files,
+            "query_cache": self.cache_metrics(),
+            "connections": self.connection_metrics(),
+        }
+
+    def close(self) -> None:
+        """Confirma las escrituras pendientes, deja el WAL en cero bytes y cierra la conexión."""
+        self.disable_write_behind()
+        self._connections.close()
         try:
-            cur.execute("ALTER TABLE codes ADD COLUMN stock_remaining INTEGER DEFAULT NULL")
-        except sqlite3.OperationalError:
-            pass  # La columna ya existe
-        self.conn.commit()
+            # El mantenimiento en tiempo ocioso solo hace checkpoints PASSIVE
+            self.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchone()
+        except sqlite3.Error:
+            pass  # base en memoria u otra estación escribiendo: queda para el próximo cierre
+        self.conn.close()
+
+    # =========================================================================
+    # CONEXIONES (ver repository/connections.py)
+    # =========================================================================
+
+    @property
+    def _db(self) -> sqlite3.Connection:
+        """Conexión activa del hilo: la asignada por @_reads/@_writes."""
+        return self._connections.active()
+
+    def reader(self):
+        """Context manager con una conexión de solo lectura, para consultas fuera de la API
+        (p. ej. CodesSnapshot). Seguro desde cualquier hilo."""
+        return self._connections.reader()
+
+    def writer(self):
+        """Context manager con la conexión de escritura bajo su lock (p. ej. para
+        MaintenanceScheduler). Las escrituras de la API esperan mientras dure el bloque."""
+        return self._connections.writer()
+
+    def connection_metrics(self) -> Dict[str, Any]:
+        """Uso del pool y tiempos de espera de lectores y escritor."""
+        return self._connections.metrics()
+
+    # =========================================================================
+    # CACHÉ DE CONSULTAS (ver repository/query_cache.py)
+    # =========================================================================
+
+    def _mark_write(self) -> None:
+        """Toda mutación de esta conexión invalida la caché de consultas."""
+        with self._write_version_lock:
+            self._write_version += 1
+
+    def _cache_version(self) -> Tuple[int, int]:
+        # _write_version se lee sin lock (leer un int es atómico); data_version cambia con
+        # cada commit y se lee en su propia conexión: una lectura cacheada no espera a las escrituras
+        return self._write_version, self._connections.data_version()
+
+    def _cached(self, key: Tuple, compute):
+        """Resultado de compute() reutilizado mientras no cambie la versión de los datos.
+        Guarda datos confirmados: los cambios pendientes de la cola se superponen después
+        (ver _overlay_pending); encolar o confirmar cambia la versión."""
+        if self._cache is None:
+            return compute()
+        version = self._cache_version()
+        value = self._cache.get(key, version)
+        if value is MISS:
+            value = compute()
+            rows = len(value) if isinstance(value, (list, dict)) else 1
+            self._cache.put(key, version, value, rows, estimate_bytes(value))
+        return value
+
+    def cache_metrics(self) -> Dict[str, Any]:
+        """Contadores de la caché: hits, misses, evictions, invalidations, tamaño (vacío si está desactivada)."""
+        return self._cache.metrics() if self._cache is not None else {}
+
+    def clear_cache(self) -> None:
+        if self._cache is not None:
+            self._cache.clear()
+
+    # =========================================================================
+    # ESCRITURA DIFERIDA (ver repository/write_behind.py)
+    # =========================================================================
+
+    def enable_write_behind(self, flush_interval_ms: int = 200, max_batch_ops: int = 50) -> None:
+        """Activa la cola de escritura diferida para update_status, update_annotated,
+        update_image_path, update_stock y delete_code.
+
+        Las lecturas no esperan a la cola: las de filas (get_code_by_id, get_code_by_code,
+        get_codes_by_ids, list_codes) superponen los cambios pendientes y los conteos
+        (stats, count_by_prefix) ven lo confirmado. Pasan por la barrera (_barrier) las
+        escrituras síncronas, la exportación (iter_codes), la importación, el archivado y
+        los respaldos.
+        """
+        if self._writer is not None:
+            return
+        if str(self.db_path) == ":memory:":
+            raise ValueError("La escritura diferida necesita una base de datos en archivo")
+        self._writer = WriteBehindQueue(self.db_path, self.profile, flush_interval_ms, max_batch_ops,
+                                        after_batch=self._after_write_batch)
+
+    def disable_write_behind(self) -> None:
+        if self._writer is None:
+            return
+        writer, self._writer = self._writer, None
+        writer.close()
+
+    def flush_writes(self, timeout: Optional[float] = None) -> bool:
+        """Barrera: espera a que las escrituras encoladas estén confirmadas."""
+        if self._writer is None:
+            return True
+        return self._writer.flush(timeout)
+
+    def write_metrics(self) -> Dict[str, Any]:
+        """Métricas de durabilidad de la cola (vacío si está desactivada); dropped_rows y
+        last_error informan los cambios descartados tras fallar varias veces."""
+        return self._writer.metrics() if self._writer is not None else {}
+
+    def pending_ids(self) -> Set[int]:
+        """Ids con cambios encolados aún sin confirmar (vacío sin escritura diferida).
+        changes_since no los incluye hasta el commit."""
+        return self._writer.pending_ids() if self._writer is not None else set()
 
-    def add_codes(self, codes: List[Tuple], auto_calc_status: bool = True) -> None:
-        """Agrega códigos a la base de datos.
+    def _barrier(self) -> None:
+        """Espera a que la cola esté confirmada; WriteBehindTimeout (un sqlite3.Error)
+        si no lo logra en BARRIER_TIMEOUT_S."""
+        if self._writer is not None and self._writer.has_pending():
+            if not self._writer.flush(BARRIER_TIMEOUT_S):
+                raise WriteBehindTimeout(f"La cola de escritura no confirmó los cambios en {BARRIER_TIMEOUT_S:.0f} s "
+                                         "(¿base bloqueada por otra estación?)")
+
+    @staticmethod
+    def _after_write_batch(conn: sqlite3.Connection, batch: Dict[int, Any], deleted_codes: List[str]) -> None:
+        if deleted_codes:
+            refresh_duplicates(conn, deleted_codes)
+
+    def _with_pending(self, row: Optional[sqlite3.Row]) -> Optional[Any]:
+        """Aplica sobre una fila leída los cambios aún no confirmados."""
+        if row is None or self._writer is None:
+            return row
+        change = self._writer.pending(row["id"])
+        if change is None:
+            return row
+        if change is DELETED:
+            return None
+        merged = dict(row)
+        merged.update(change)
+        return merged
+
+    def _overlay_pending(self, rows: List[Any], filters: Optional[Dict[str, Any]] = None) -> List[Any]:
+        """_with_pending sobre filas de codes leídas sin barrera: las borradas y las que con
+        los cambios ya no cumplen `filters` (parámetros de row_matches_filters) se quitan.
+        El orden es el de lo confirmado; las filas que pasan a cumplir los filtros
+        aparecen cuando la cola confirma (changes_since)."""
+        pending = self.pending_ids()
+        if not pending:
+            return rows
+        result = []
+        for row in rows:
+            if row["id"] in pending and not ("archived" in row.keys() and row["archived"]):
+                row = self._with_pending(row)
+                if row is None or (filters and not row_matches_filters(row, **filters)):
+                    continue
+            result.append(row)
+        return result
+
+    @_writes
+    def add_codes(self, codes: List[Tuple], auto_calc_status: bool = True, refresh_duplicates: bool = True) -> List[int]:
+        """Agrega códigos a la base de datos, en una sola transacción. Retorna los ids nuevos.
         Cada tupla: (code, annotated, created_at, status, image_path, description, stock_per_box, stock_boxes, stock_remaining)
         
         Si auto_calc_status es True, calcula el estado automáticamente basado en stock
         para códigos no editados (o siempre para NO_HAY_MAS).
+        Con refresh_duplicates=False la marca duplicate no se recalcula (cargas por
+        tramos: se llama a refresh_duplicates() al final).
         """
-        cur = self.conn.cursor()
-        for item in codes:
-            code = item[0]
-            annotated = item[1]
-            created_at = item[2] if len(item) > 2 else None
-            status = item[3] if len(item) > 3 else STATUS_DISPONIBLE
-            image_path = item[4] if len(item) > 4 else None
-            description = item[5] if len(item) > 5 else None
-            stock_per_box = item[6] if len(item) > 6 else None
-            stock_boxes = item[7] if len(item) > 7 else None
-            stock_remaining = item[8] if len(item) > 8 else None
-            
-            # Auto-calcular status basado en stock
-            if auto_calc_status:
-                calculated_status = calculate_status_from_stock(stock_per_box, stock_boxes, stock_remaining)
-                if should_auto_update_status(annotated, status, calculated_status):
-                    status = calculated_status
-            
-            cur.execute(
-                "INSERT INTO codes(code, created_at, annotated, duplicate, status, image_path, description, stock_per_box, stock_boxes, stock_remaining) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
-                (code, (created_at or datetime.utcnow()).isoformat(), int(annotated), 0, status or STATUS_DISPONIBLE, image_path, description, stock_per_box, stock_boxes, stock_remaining),
-            )
-        self.conn.commit()
-        self._refresh_duplicates()
+        self._mark_write()
+        self._barrier()
+        cur = self._db.cursor()
+        ids = []
+        try:
+            for item in codes:
+                cur.execute(f"INSERT INTO codes({NEW_CODE_COLUMNS}) VALUES ({', '.join('?' * 12)})",
+                            new_code_values(item, auto_calc_status))
+                ids.append(cur.lastrowid)
+            self._db.commit()
+        except BaseException:
+            self._db.rollback()
+            raise
+        if refresh_duplicates:
+            self._refresh_duplicates([item[0] for item in codes])
+        return ids
 
+    @_reads
     def list_codes(self,
                    annotated: Optional[bool] = None,
                    duplicates_only: Optional[bool] = None,
                    search: Optional[str] = None,
                    status: Optional[str] = None,
                    order_by: str = "created_at",
-                   order_dir: str = "DESC") -> List[sqlite3.Row]:
-        query = "SELECT id, code, created_at, annotated, duplicate, status, image_path, description, stock_per_box, stock_boxes, stock_remaining FROM codes"
+                   order_dir: str = "DESC",
+                   include_archived: bool = False,
+                   created_from: Optional[int] = None,
+                   created_to: Optional[int] = None) -> List[sqlite3.Row]:
+        """Lista códigos filtrados y ordenados. Con include_archived se consultan también
+        los códigos archivados; las filas traen además prefix, number y archived (0/1).
+        created_from/created_to: rango semiabierto de created_at en epoch ms (ver local_days_ms).
+        No espera a la cola de escritura diferida: superpone sus cambios pendientes."""
+        if order_by not in _LIST_ORDER_COLUMNS:
+            order_by = "created_at"
+        order_dir = "ASC" if order_dir.upper() == "ASC" else "DESC"
+        key = ("list_codes", None if annotated is None else bool(annotated), bool(duplicates_only),
+               search or None, status or None, order_by, order_dir, bool(include_archived), created_from, created_to)
+        rows = list(self._cached(key, lambda: self._list_codes(annotated, duplicates_only, search, status, order_by,
+                                                               order_dir, include_archived, created_from, created_to)))
+        return self._overlay_pending(rows, dict(annotated=annotated, duplicates_only=duplicates_only, search=search,
+                                                status=status, created_from=created_from, created_to=created_to))
+
+    def iter_codes(self,
+                   annotated: Optional[bool] = None,
+                   duplicates_only: Optional[bool] = None,
+                   search: Optional[str] = None,
+                   status: Optional[str] = None,
+                   order_by: str = "created_at",
+                   order_dir: str = "DESC",
+                   include_archived: bool = False,
+                   created_from: Optional[int] = None,
+                   created_to: Optional[int] = None,
+                   batch_rows: int = ITER_BATCH_ROWS) -> Iterator[List[sqlite3.Row]]:
+        """Como list_codes, pero entrega las filas en lotes de `batch_rows` leídos del
+        cursor, sin armar la lista completa ni pasar por la caché (exportación).
+
+        El generador retiene una conexión de lectura hasta agotarse o cerrarse: todos
+        los lotes ven la misma versión de la base. Debe consumirse en un solo hilo."""
+        query, params = self._list_query(annotated, duplicates_only, search, status, order_by, order_dir,
+                                         include_archived, created_from, created_to)
+        # No @_reads: el decorador soltaría la conexión antes del primer lote
+        with self._connections.reader():
+            self._barrier()
+            cur = self._db.cursor()
+            try:
+                cur.execute(query, params)
+                while True:
+                    batch = cur.fetchmany(batch_rows)
+                    if not batch:
+                        return
+                    yield batch
+            finally:
+                cur.close()
+
+    def _list_codes(self, annotated: Optional[bool], duplicates_only: Optional[bool], search: Optional[str],
+                    status: Optional[str], order_by: str, order_dir: str, include_archived: bool = False,
+                    created_from: Optional[int] = None, created_to: Optional[int] = None) -> List[sqlite3.Row]:
+        query, params = self._list_query(annotated, duplicates_only, search, status, order_by, order_dir,
+                                         include_archived, created_from, created_to)
+        cur = self._db.cursor()
+        cur.execute(query, params)
+        return cur.fetchall()
+
+    @staticmethod
+    def _list_query(annotated: Optional[bool], duplicates_only: Optional[bool], search: Optional[str],
+                    status: Optional[str], order_by: str, order_dir: str, include_archived: bool = False,
+                    created_from: Optional[int] = None, created_to: Optional[int] = None) -> Tuple[str, List[Any]]:
+        """Consulta y parámetros de list_codes/iter_codes."""
+        if order_by not in _LIST_ORDER_COLUMNS:
+            order_by = "created_at"
+        order_dir = "ASC" if order_dir.upper() == "ASC" else "DESC"
         conditions = []
         params: List[Any] = []
 
@@ -192,7 +687,12 @@ class CodeRepository:
             params.append(1 if annotated else 0)
         if duplicates_only:
             conditions.append("duplicate = 1")
-        if search:
+        code_range = parse_code_range(search)
+        if code_range is not None:
+            # 'CQ 1000-2000': rango numérico dentro de un prefijo (índice prefix, number)
+            conditions.append("prefix = ? AND number BETWEEN ? AND ?")
+            params.extend(code_range)
+        elif search:
             # Buscar en código O en descripción
             conditions.append("(code LIKE ? OR description LIKE ?)")
             params.append(f"%{search.upper()}%")
@@ -200,31 +700,110 @@ class CodeRepository:
         if status:
             conditions.append("status = ?")
             params.append(status)
-        if conditions:
-            query += " WHERE " + " AND ".join(conditions)
+        if created_from is not None:
+            conditions.append("created_at >= ?")
+            params.append(int(created_from))
+        if created_to is not None:
+            conditions.append("created_at < ?")
+            params.append(int(created_to))
+        where = " WHERE " + " AND ".join(conditions) if conditions else ""
+        if include_archived:
+            # Camino unificado: las dos tablas con los mismos filtros, mezcladas por el ORDER BY
+            query = (f"SELECT {_ROW_COLUMNS}, prefix, number, 0 AS archived FROM codes{where} UNION ALL "
+                     f"SELECT {_ROW_COLUMNS}, prefix, number, 1 AS archived FROM codes_archive{where}")
+            params = params + params
+        else:
+            query = f"SELECT {_ROW_COLUMNS} FROM codes{where}"
 
-        allowed_order = {"created_at", "code", "annotated", "duplicate", "status"}
-        if order_by not in allowed_order:
-            order_by = "created_at"
-        order_dir = "ASC" if order_dir.upper() == "ASC" else "DESC"
-        query += f" ORDER BY {order_by} {order_dir}"
+        # A igual clave desempata el id (como CodesTableModel._sort_key): los índices
+        # terminan en rowid, así que el desempate no agrega un ordenamiento
+        if order_by == "code":
+            # Orden natural: CQ2000 antes que CQ10000
+            query += f" ORDER BY prefix {order_dir}, number {order_dir}, code {order_dir}, id {order_dir}"
+        else:
+            query += f" ORDER BY {order_by} {order_dir}, id {order_dir}"
+        return query, params
 
-        cur = self.conn.cursor()
-        cur.execute(query, params)
+    @_reads
+    def get_codes_by_ids(self, code_ids: List[int]) -> Dict[int, Any]:
+        """Retorna {id: fila} para los ids que existen (con cambios pendientes aplicados)."""
+        if not code_ids:
+            return {}
+        rows = bulk_select(
+            self._db,
+            "SELECT id, code, created_at, annotated, duplicate, status, image_path, description, stock_per_box, stock_boxes, stock_remaining FROM codes",
+            "id", code_ids,
+        )
+        return {row["id"]: row for row in self._overlay_pending(rows)}
+
+    # =========================================================================
+    # REGISTRO DE CAMBIOS (CDC): tabla codes_changes alimentada por triggers
+    # =========================================================================
+
+    @_reads
+    def change_version(self) -> int:
+        """Versión actual de la tabla codes; crece con cada alta, modificación o baja confirmada.
+        Es una lectura de una fila: apta para sondeo frecuente desde otras estaciones."""
+        cur = self._db.cursor()
+        cur.execute("SELECT version FROM codes_version WHERE id = 1")
+        row = cur.fetchone()
+        return row["version"] if row else 0
+
+    @_reads
+    def changes_since(self, version: int) -> Optional[List[sqlite3.Row]]:
+        """Cambios posteriores a `version` como filas (row_id, op, version), en orden.
+
+        Solo se conserva la última operación por fila: 'I' o 'U' significan que la fila
+        existe y debe releerse, 'D' que fue borrada. Retorna None si el registro ya fue
+        podado más allá de `version`; en ese caso hay que recargar todo. Solo trae lo
+        confirmado: lo que sigue en la cola de escritura está en pending_ids().
+        """
+        cur = self._db.cursor()
+        cur.execute("SELECT pruned_before FROM codes_version WHERE id = 1")
+        row = cur.fetchone()
+        if row is None or version < row["pruned_before"]:
+            return None
+        cur.execute("SELECT row_id, op, version FROM codes_changes WHERE version > ? ORDER BY version", (version,))
         return cur.fetchall()
 
+    @_writes
+    def prune_changes(self, before_version: int) -> int:
+        """Elimina las bajas registradas antes de `before_version` (las altas y
+        modificaciones ocupan una fila por código y no crecen). Retorna filas borradas."""
+        self._mark_write()
+        self._barrier()
+        cur = self._db.cursor()
+        cur.execute("DELETE FROM codes_changes WHERE op = 'D' AND version < ?", (before_version,))
+        deleted = cur.rowcount
+        cur.execute("UPDATE codes_version SET pruned_before = MAX(pruned_before, ?) WHERE id = 1", (before_version,))
+        self._db.commit()
+        return deleted
+
+    @_writes
     def update_annotated(self, code_id: int, annotated: bool) -> None:
-        cur = self.conn.cursor()
+        self._mark_write()
+        if self._writer is not None:
+            self._writer.enqueue_update(code_id, {"annotated": int(annotated)})
+            return
+        cur = self._db.cursor()
         cur.execute("UPDATE codes SET annotated = ? WHERE id = ?", (int(annotated), code_id))
-        self.conn.commit()
+        self._db.commit()
 
+    @_writes
     def update_status(self, code_id: int, status: str) -> None:
-        cur = self.conn.cursor()
+        self._mark_write()
+        if self._writer is not None:
+            self._writer.enqueue_update(code_id, {"status": status})
+            return
+        cur = self._db.cursor()
         cur.execute("UPDATE codes SET status = ? WHERE id = ?", (status, code_id))
-        self.conn.commit()
+        self._db.commit()
 
+    @_writes
     def update_code(self, code_id: int, code: str, annotated: Optional[bool] = None, status: Optional[str] = None, image_path: Optional[str] = None) -> None:
-        cur = self.conn.cursor()
+        self._mark_write()
+        self._barrier()
+        cur = self._db.cursor()
         fields = ["code = ?"]
         params = [code]
         if annotated is not None:
@@ -237,35 +816,69 @@ class CodeRepository:
             fields.append("image_path = ?")
             params.append(image_path if image_path else None)
         params.append(code_id)
+        previous = cur.execute("SELECT code FROM codes WHERE id = ?", (code_id,)).fetchone()
         cur.execute(f"UPDATE codes SET {', '.join(fields)} WHERE id = ?", params)
-        self.conn.commit()
-        self._refresh_duplicates()
+        self._db.commit()
+        self._refresh_duplicates([code] + ([previous["code"]] if previous is not None else []))
     
+    @_writes
     def update_image_path(self, code_id: int, image_path: Optional[str]) -> None:
         """Actualiza solo la ruta de imagen de un código."""
-        cur = self.conn.cursor()
+        self._mark_write()
+        if self._writer is not None:
+            self._writer.enqueue_update(code_id, {"image_path": image_path})
+            return
+        cur = self._db.cursor()
         cur.execute("UPDATE codes SET image_path = ? WHERE id = ?", (image_path, code_id))
-        self.conn.commit()
+        self._db.commit()
     
+    @_reads
     def get_code_by_id(self, code_id: int) -> Optional[sqlite3.Row]:
         """Obtiene un código por su ID."""
-        cur = self.conn.cursor()
+        cur = self._db.cursor()
         cur.execute("SELECT id, code, created_at, annotated, duplicate, status, image_path, description, stock_per_box, stock_boxes, stock_remaining FROM codes WHERE id = ?", (code_id,))
-        return cur.fetchone()
+        return self._with_pending(cur.fetchone())
     
-    def get_code_by_code(self, code: str) -> Optional[sqlite3.Row]:
-        """Obtiene un código por su valor de código."""
-        cur = self.conn.cursor()
+    @_reads
+    def get_code_by_code(self, code: str, include_archived: bool = False) -> Optional[sqlite3.Row]:
+        """Obtiene un código por su valor de código (con include_archived, también del archivo)."""
+        cur = self._db.cursor()
         cur.execute("SELECT id, code, created_at, annotated, duplicate, status, image_path, description, stock_per_box, stock_boxes, stock_remaining FROM codes WHERE code = ?", (code.upper(),))
-        return cur.fetchone()
+        if self._writer is None:
+            row = cur.fetchone()
+            if row is not None:
+                return row
+        else:
+            # Con escritura diferida: primera fila del código que no esté pendiente de borrado
+            for row in cur.fetchall():
+                row = self._with_pending(row)
+                if row is not None:
+                    return row
+        if include_archived:
+            cur.execute(f"SELECT {_ROW_COLUMNS} FROM codes_archive WHERE code = ? ORDER BY created_at DESC LIMIT 1", (code.upper(),))
+            return cur.fetchone()
+        return None
     
+    @_writes
     def update_stock(self, code_id: int, stock_per_box: Optional[int], stock_boxes: Optional[int], stock_remaining: Optional[int], auto_update_status: bool = True) -> None:
         """Actualiza los datos de stock de un código.
         
         Si auto_update_status es True, también actualiza el estado automáticamente
         basándose en los niveles de stock (respetando si está editado o no).
         """
-        cur = self.conn.cursor()
+        self._mark_write()
+        if self._writer is not None:
+            row = self.get_code_by_id(code_id)
+            if not row:
+                return
+            fields = {"stock_per_box": stock_per_box, "stock_boxes": stock_boxes, "stock_remaining": stock_remaining}
+            if auto_update_status:
+                new_status = calculate_status_from_stock(stock_per_box, stock_boxes, stock_remaining)
+                if should_auto_update_status(bool(row["annotated"]), row["status"], new_status):
+                    fields["status"] = new_status
+            self._writer.enqueue_update(code_id, fields)
+            return
+        cur = self._db.cursor()
         
         # Obtener estado actual del código
         cur.execute("SELECT annotated, status FROM codes WHERE id = ?", (code_id,))
@@ -286,36 +899,294 @@ class CodeRepository:
             if should_auto_update_status(is_annotated, current_status, new_status):
                 cur.execute("UPDATE codes SET status = ? WHERE id = ?", (new_status, code_id))
         
-        self.conn.commit()
+        self._db.commit()
 
+    @_writes
     def delete_code(self, code_id: int) -> None:
-        cur = self.conn.cursor()
+        self._mark_write()
+        if self._writer is not None:
+            self._writer.enqueue_delete(code_id)
+            return
+        cur = self._db.cursor()
+        row = cur.execute("SELECT code FROM codes WHERE id = ?", (code_id,)).fetchone()
         cur.execute("DELETE FROM codes WHERE id = ?", (code_id,))
-        self.conn.commit()
-        self._refresh_duplicates()
+        self._db.commit()
+        if row is not None:
+            self._refresh_duplicates([row["code"]])
+
+    def merge_codes(self, chunks: Iterable[List[Tuple]], dry_run: bool = False,
+                    image_filter: Optional[Callable[[List[str]], Set[str]]] = None) -> MergePlan:
+        """Importación con actualización: agrega los códigos nuevos y carga el stock de los
+        existentes (recalculando el estado como update_stock), en una sola transacción.
+
+        `chunks` entrega listas de tuplas de add_codes. Se cargan en la tabla temporal
+        de una conexión propia sin tomar el lock de escritura (leer el archivo es lo
+        lento); el lock se toma solo para calcular y aplicar el plan. Si `chunks` lanza
+        una excepción no se aplica nada. Con dry_run solo se calcula el plan (ver
+        repository/merge.py) y no se modifica la base.
+        """
+        return self._with_staging_connection(lambda conn: self._merge_with(conn, chunks, dry_run, image_filter))
+
+    def import_codes(self, chunks: Iterable[List[Tuple]], auto_calc_status: bool = True) -> int:
+        """Agrega los códigos de `chunks` (listas de tuplas de add_codes) en una sola
+        transacción y retorna cuántos se insertaron.
+
+        Como en merge_codes, los tramos se cargan en una tabla temporal sin tomar el
+        lock de escritura y al final un solo INSERT ... SELECT los publica (ver
+        repository/merge.py). Si `chunks` lanza una excepción (p. ej. al cancelar) no
+        se inserta nada. Se omiten los códigos que ya existen al publicar; los
+        repetidos dentro de `chunks` se insertan todos y quedan marcados como duplicados.
+        """
+        return self._with_staging_connection(lambda conn: self._import_with(conn, chunks, auto_calc_status))
 
+    def _with_staging_connection(self, work: Callable[[sqlite3.Connection], Any]) -> Any:
+        """work(conn) con una conexión propia, para cargar tablas temporales sin el lock de escritura."""
+        if str(self.db_path) == ":memory:":
+            # Una base en memoria no se comparte entre conexiones: todo con la de escritura
+            with self._connections.writer() as conn:
+                return work(conn)
+        conn = sqlite3.connect(str(self.db_path))
+        try:
+            apply_profile(conn, self.profile)
+            return work(conn)
+        finally:
+            conn.close()
+
+    def _import_with(self, conn: sqlite3.Connection, chunks: Iterable[List[Tuple]], auto_calc_status: bool) -> int:
+        create_new_staging(conn)
+        try:
+            for items in chunks:
+                stage_new_rows(conn, (new_code_values(item, auto_calc_status) for item in items))
+            conn.commit()
+            with self._connections.writer():
+                self._mark_write()
+                self._barrier()
+                conn.execute("BEGIN IMMEDIATE")
+                inserted, codes = publish_new_rows(conn)
+                refresh_duplicates(conn, codes)
+                conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            drop_staging(conn)
+        return inserted
+
+    def _merge_with(self, conn: sqlite3.Connection, chunks: Iterable[List[Tuple]], dry_run: bool,
+                    image_filter: Optional[Callable[[List[str]], Set[str]]]) -> MergePlan:
+        conn.create_function("merged_status", 5, merged_status, deterministic=True)
+        create_staging(conn)
+        try:
+            for items in chunks:
+                stage_items(conn, items)
+            conn.commit()
+            with self._connections.writer():
+                if not dry_run:
+                    self._mark_write()
+                self._barrier()
+                if not dry_run:
+                    # El plan se calcula con la base ya reservada: lo que se aplica es lo que se planeó
+                    conn.execute("BEGIN IMMEDIATE")
+                plan = plan_merge(conn)
+                if dry_run or not (plan.inserts or plan.updates):
+                    conn.rollback()
+                    return plan
+                new_codes = [row[0] for row in conn.execute(
+                    "SELECT code FROM temp.import_staging s WHERE NOT EXISTS (SELECT 1 FROM codes c WHERE c.code = s.code)")]
+                missing = apply_merge(conn, to_epoch_ms(datetime.utcnow()), image_filter)
+                refresh_duplicates(conn, new_codes)
+                conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            drop_staging(conn)
+        return plan._replace(applied=True, missing_images=missing)
+
+    @_writes
+    def delete_codes(self, code_ids: List[int]) -> None:
+        """Borra varios códigos por id en una sola transacción."""
+        self._mark_write()
+        self._barrier()
+        codes = [row["code"] for row in bulk_select(self._db, "SELECT code FROM codes", "id", code_ids)]
+        cur = self._db.cursor()
+        try:
+            for i in range(0, len(code_ids), LOOKUP_CHUNK_SIZE):
+                chunk = code_ids[i:i + LOOKUP_CHUNK_SIZE]
+                cur.execute(f"DELETE FROM codes WHERE id IN ({','.join('?' * len(chunk))})", chunk)
+            self._db.commit()
+        except BaseException:
+            self._db.rollback()
+            raise
+        self._refresh_duplicates(codes)
+
+    @_writes
     def remove_all(self) -> None:
-        cur = self.conn.cursor()
+        self._mark_write()
+        self._barrier()
+        cur = self._db.cursor()
         cur.execute("DELETE FROM codes")
-        self.conn.commit()
+        self._db.commit()
         self._refresh_duplicates()
 
-    def _refresh_duplicates(self) -> None:
-        cur = self.conn.cursor()
-        cur.execute("UPDATE codes SET duplicate = 0")
-        cur.execute(
-            """
-            UPDATE codes
-            SET duplicate = 1
-            WHERE code IN (
-                SELECT code FROM codes GROUP BY code HAVING COUNT(*) > 1
+    # =========================================================================
+    # RESPALDOS (ver repository/backup.py)
+    # =========================================================================
+
+    def backup_service(self, policy: BackupPolicy = DEFAULT_BACKUP_POLICY) -> BackupService:
+        """Servicio de respaldos en línea de esta base; antes de cada respaldo
+        confirma la escritura diferida pendiente."""
+        return BackupService(self.db_path, policy, before_backup=self.flush_writes)
+
+    @_writes
+    def restore_backup(self, backup_path: Path, policy: BackupPolicy = DEFAULT_BACKUP_POLICY,
+                       progress: Optional[ProgressCallback] = None) -> BackupResult:
+        """Reemplaza el contenido de la base por el de un respaldo (.db o .db.gz).
+
+        El respaldo se verifica con PRAGMA integrity_check antes de tocar la base y
+        se copia con la API de backup sobre la conexión de escritura, en una sola
+        transacción. Después se migra el esquema y se invalida el registro de cambios
+        (changes_since retorna None), así la tabla y la instantánea se recargan enteras.
+        """
+        self._mark_write()
+        self._barrier()
+        start = time.perf_counter()
+        verified = prepare_restore(Path(backup_path), self.db_path.parent)
+        try:
+            old_version = self.change_version()
+            source = sqlite3.connect(str(verified))
+            try:
+                pages, restarts = copy_database(source, self.conn, policy.pages_per_step, 0, progress)
+            finally:
+                source.close()
+        finally:
+            verified.unlink(missing_ok=True)
+        self._init_db()
+        cur = self._db.cursor()
+        cur.execute("SELECT version FROM codes_version WHERE id = 1")
+        version = max(cur.fetchone()["version"], old_version) + 1
+        cur.execute("DELETE FROM codes_changes")
+        cur.execute("UPDATE codes_version SET version = ?, pruned_before = ? WHERE id = 1", (version, version))
+        self._db.commit()
+        self.clear_cache()
+        return BackupResult(Path(backup_path), pages, Path(backup_path).stat().st_size,
+                            (time.perf_counter() - start) * 1000, restarts)
+
+    # =========================================================================
+    # MANTENIMIENTO (ver repository/maintenance.py)
+    # =========================================================================
+
+    def maintenance_scheduler(self, policy: MaintenancePolicy = DEFAULT_MAINTENANCE_POLICY) -> MaintenanceScheduler:
+        """Mantenimiento por pasos para el tiempo ocioso (ver repository/maintenance.py)."""
+        return MaintenanceScheduler(self, policy)
+
+    # =========================================================================
+    # ARCHIVO: códigos fríos en codes_archive
+    # =========================================================================
+
+    def archive_cold_codes(self, policy: ArchivePolicy = DEFAULT_ARCHIVE_POLICY,
+                           max_batches: Optional[int] = None,
+                           is_cancelled: Optional[Callable[[], bool]] = None) -> int:
+        """Mueve a codes_archive los códigos fríos según `policy`, en lotes de
+        policy.batch_size filas (una transacción por lote). Retorna filas movidas.
+        Si `is_cancelled()` pasa a True se detiene al terminar el lote en curso."""
+        cutoff = to_epoch_ms(datetime.utcnow() - timedelta(days=policy.older_than_days))
+        moved: List[str] = []
+        batches = 0
+        try:
+            while max_batches is None or batches < max_batches:
+                if is_cancelled is not None and is_cancelled():
+                    break
+                ids = self._cold_code_ids(policy.statuses, cutoff, policy.batch_size)
+                if not ids:
+                    break
+                moved.extend(self._move_rows("codes", "codes_archive", ids))
+                batches += 1
+        finally:
+            self._refresh_moved_duplicates(moved)
+        return len(moved)
+
+    @_reads
+    def _cold_code_ids(self, statuses: Tuple[str, ...], cutoff: int, limit: int) -> List[int]:
+        self._barrier()
+        cur = self._db.cursor()
+        ids: List[int] = []
+        for status in statuses:
+            cur.execute("SELECT id FROM codes WHERE status = ? AND created_at < ? LIMIT ?", (status, cutoff, limit - len(ids)))
+            ids.extend(row["id"] for row in cur.fetchall())
+            if len(ids) >= limit:
+                break
+        return ids
+
+    def restore_archived(self, code_ids: List[int]) -> int:
+        """Devuelve códigos archivados a la tabla codes. Retorna filas restauradas."""
+        restored: List[str] = []
+        ids = list(code_ids)
+        try:
+            for start in range(0, len(ids), DEFAULT_ARCHIVE_POLICY.batch_size):
+                restored.extend(self._move_rows("codes_archive", "codes", ids[start:start + DEFAULT_ARCHIVE_POLICY.batch_size]))
+        finally:
+            self._refresh_moved_duplicates(restored)
+        return len(restored)
+
+    @_writes
+    def _move_rows(self, source: str, target: str, code_ids: List[int]) -> List[str]:
+        """Mueve filas entre codes y codes_archive en una transacción. Retorna los
+        códigos movidos (la marca duplicate se recalcula después, ver
+        _refresh_moved_duplicates). Al salir de codes los triggers registran la baja
+        (CDC) y actualizan codes_fts."""
+        self._mark_write()
+        self._barrier()
+        placeholders = ",".join("?" * len(code_ids))
+        archived_at = ", archived_at" if target == "codes_archive" else ""
+        archived_value = ", ?" if target == "codes_archive" else ""
+        params: List[Any] = [to_epoch_ms(datetime.utcnow())] if target == "codes_archive" else []
+        cur = self._db.cursor()
+        try:
+            cur.execute(f"SELECT code FROM {source} WHERE id IN ({placeholders})", list(code_ids))
+            codes = [row["code"] for row in cur.fetchall()]
+            cur.execute(
+                f"INSERT OR REPLACE INTO {target}({_ROW_COLUMNS}, prefix, number{archived_at}) "
+                f"SELECT {_ROW_COLUMNS}, prefix, number{archived_value} FROM {source} WHERE id IN ({placeholders})",
+                params + list(code_ids),
             )
-            """
-        )
-        self.conn.commit()
+            cur.execute(f"DELETE FROM {source} WHERE id IN ({placeholders})", list(code_ids))
+            self._db.commit()
+        except Exception:
+            self._db.rollback()
+            raise
+        return codes
+
+    def _refresh_moved_duplicates(self, codes: List[str]) -> None:
+        """La marca duplicate solo considera la tabla caliente: tras mover filas se
+        recalcula una sola vez, para los códigos movidos."""
+        if codes:
+            self._refresh_duplicates(codes)
 
+    @_reads
+    def archive_stats(self) -> Dict[str, Any]:
+        """Cantidad de códigos archivados (total y por estado) y fecha del último archivado."""
+        cur = self._db.cursor()
+        cur.execute("SELECT status, COUNT(*) AS c FROM codes_archive GROUP BY status")
+        by_status = {row["status"]: row["c"] for row in cur.fetchall()}
+        cur.execute("SELECT MAX(archived_at) AS last FROM codes_archive")
+        return {"total": sum(by_status.values()), "by_status": by_status, "last_archived_at": cur.fetchone()["last"]}
+
+    @_writes
+    def _refresh_duplicates(self, codes: Optional[Iterable[str]] = None) -> None:
+        refresh_duplicates(self._db, codes)
+        self._db.commit()
+
+    def refresh_duplicates(self) -> None:
+        """Recalcula la marca duplicate (tras add_codes con refresh_duplicates=False)."""
+        self._refresh_duplicates()
+
+    @_reads
     def stats(self) -> Dict[str, int]:
-        cur = self.conn.cursor()
+        return dict(self._cached(("stats",), self._stats))
+
+    def _stats(self) -> Dict[str, int]:
+        cur = self._db.cursor()
         cur.execute("SELECT COUNT(*) AS c FROM codes")
         total = cur.fetchone()["c"]
         cur.execute("SELECT COUNT(*) AS c FROM codes WHERE annotated = 1")
@@ -329,63 +1200,113 @@ class CodeRepository:
             status_counts[st] = cur.fetchone()["c"]
         return {"total": total, "annotated": annotated, "duplicates": duplicates, **status_counts}
 
+    @_reads
+    def list_codes_in_range(self, prefix: str, low: int, high: int) -> List[sqlite3.Row]:
+        """Códigos de un prefijo con número entre low y high (inclusive), en orden natural."""
+        cur = self._db.cursor()
+        cur.execute(
+            "SELECT id, code, created_at, annotated, duplicate, status, image_path, description, stock_per_box, stock_boxes, stock_remaining FROM codes "
+            "WHERE prefix = ? AND number BETWEEN ? AND ? ORDER BY prefix, number, code",
+            (prefix.upper(), low, high),
+        )
+        return self._overlay_pending(cur.fetchall())
+
+    @_reads
+    def count_by_prefix(self) -> Dict[str, int]:
+        """Cantidad de códigos por prefijo (recorre solo el índice prefix, number)."""
+
+        def query() -> Dict[str, int]:
+            cur = self._db.cursor()
+            cur.execute("SELECT prefix, COUNT(*) AS c FROM codes GROUP BY prefix ORDER BY prefix")
+            return {row["prefix"]: row["c"] for row in cur.fetchall()}
+
+        return dict(self._cached(("count_by_prefix",), query))
+
+    @_reads
     def get_all_codes_for_autocomplete(self) -> List[str]:
         """Retorna todos los códigos únicos para autocompletado."""
-        cur = self.conn.cursor()
+        cur = self._db.cursor()
         cur.execute("SELECT DISTINCT code FROM codes ORDER BY code")
         return [row["code"] for row in cur.fetchall()]
 
+    @_reads
     def search_codes_prefix(self, prefix: str, limit: int = 10) -> List[Dict[str, Any]]:
         """Busca códigos que empiecen con el prefijo dado o contengan la descripción.
-        Retorna código, status y descripción."""
-        cur = self.conn.cursor()
+        Retorna código, status y descripción (un resultado por código, ordenados por código).
+
+        El prefijo se resuelve como rango `code >= ? AND code < ?` sobre idx_codes_code y
+        la descripción con el índice de trigramas codes_fts (desde 3 caracteres). Sin
+        FTS5 las descripciones se buscan con LIKE como antes.
+        """
         search_term = prefix.strip()
+        if not search_term:
+            return []
+        rows = self._cached(("search_codes_prefix", search_term, limit), lambda: self._search_codes_prefix(search_term, limit))
+        return [dict(row) for row in rows]
+
+    def _search_codes_prefix(self, search_term: str, limit: int) -> List[Dict[str, Any]]:
+        cur = self._db.cursor()
+        code_prefix = search_term.upper()
         cur.execute(
-            """SELECT DISTINCT code, status, description FROM codes 
-               WHERE code LIKE ? OR description LIKE ? 
-               ORDER BY code LIMIT ?""",
-            (f"{search_term.upper()}%", f"%{search_term}%", limit)
+            "SELECT code, status, description FROM codes WHERE code >= ? AND code < ? GROUP BY code ORDER BY code LIMIT ?",
+            (code_prefix, prefix_upper_bound(code_prefix), limit),
         )
-        return [{"code": row["code"], "status": row["status"], "description": row["description"]} for row in cur.fetchall()]
+        found = {row["code"]: row for row in cur.fetchall()}
+        if self.description_fts:
+            if len(search_term) >= 3:
+                cur.execute(
+                    "SELECT c.code, c.status, c.description FROM codes_fts JOIN codes c ON c.id = codes_fts.rowid "
+                    "WHERE codes_fts MATCH ? LIMIT ?",
+                    (fts_phrase(search_term), limit * 4),
+                )
+                for row in cur.fetchall():
+                    found.setdefault(row["code"], row)
+        else:
+            cur.execute(
+                "SELECT code, status, description FROM codes WHERE description LIKE ? GROUP BY code ORDER BY code LIMIT ?",
+                (f"%{search_term}%", limit),
+            )
+            for row in cur.fetchall():
+                found.setdefault(row["code"], row)
+        rows = [found[code] for code in sorted(found)[:limit]]
+        return [{"code": row["code"], "status": row["status"], "description": row["description"]} for row in rows]
 
+    @_reads
     def codes_exist(self, codes: List[str]) -> List[str]:
         """Verifica cuáles códigos ya existen en la base de datos.
         Retorna lista de códigos que ya existen (duplicados)."""
         if not codes:
             return []
-        cur = self.conn.cursor()
-        placeholders = ",".join("?" * len(codes))
-        cur.execute(
-            f"SELECT DISTINCT code FROM codes WHERE code IN ({placeholders})",
-            [c.upper() for c in codes]
-        )
-        return [row["code"] for row in cur.fetchall()]
+        self._barrier()
+        rows = bulk_select(self._db, "SELECT DISTINCT code FROM codes", "code", [c.upper() for c in codes])
+        return [row["code"] for row in rows]
 
+    @_reads
     def get_codes_with_status(self, codes: List[str]) -> Dict[str, str]:
         """Retorna un diccionario {codigo: status} para los códigos que existen."""
         if not codes:
             return {}
-        cur = self.conn.cursor()
-        placeholders = ",".join("?" * len(codes))
-        cur.execute(
-            f"SELECT code, status FROM codes WHERE code IN ({placeholders})",
-            [c.upper() for c in codes]
-        )
-        return {row["code"]: row["status"] for row in cur.fetchall()}
+        self._barrier()
+        rows = bulk_select(self._db, "SELECT code, status FROM codes", "code", [c.upper() for c in codes])
+        return {row["code"]: row["status"] for row in rows}
 
+    @_writes
     def update_status_if_default(self, code: str, new_status: str) -> bool:
         """
         Actualiza el status de un código SOLO si su status actual es 'disponible'.
         Retorna True si se actualizó, False si no.
         """
-        cur = self.conn.cursor()
+        self._mark_write()
+        self._barrier()
+        cur = self._db.cursor()
         cur.execute(
             "UPDATE codes SET status = ? WHERE code = ? AND status = ?",
             (new_status, code.upper(), STATUS_DISPONIBLE)
         )
-        self.conn.commit()
+        self._db.commit()
         return cur.rowcount > 0
     
+    @_writes
     def recalculate_all_statuses(self) -> int:
         """Recalcula el estado de TODOS los códigos basándose en su stock.
         
@@ -395,7 +1316,9 @@ class CodeRepository:
         
         Retorna el número de códigos actualizados.
         """
-        cur = self.conn.cursor()
+        self._mark_write()
+        self._barrier()
+        cur = self._db.cursor()
         cur.execute("SELECT id, annotated, status, stock_per_box, stock_boxes, stock_remaining FROM codes")
         rows = cur.fetchall()
         
@@ -413,5 +1336,5 @@ class CodeRepository:
                 cur.execute("UPDATE codes SET status = ? WHERE id = ?", (new_status, code_id))
                 updated += 1
         
-        self.conn.commit()
+        self._db.commit()
         return updated
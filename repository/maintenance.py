@@ -0,0 +1,221 @@
+import logging
+import sqlite3
+import time
+from collections import deque
+from pathlib import Path
+from typing import Callable, Deque, Iterator, List, NamedTuple, Optional
+
+log = logging.getLogger(__name__)
+
+
+class MaintenancePolicy(NamedTuple):
+    """Umbrales y límites del mantenimiento en tiempo ocioso.
+
+    - step_budget_ms: tiempo máximo de cada step() antes de ceder el control
+    - vacuum_pages_per_unit: páginas liberadas por cada PRAGMA incremental_vacuum
+    - vacuum_min_free_pages: páginas libres a partir de las cuales se compacta
+    - checkpoint_wal_bytes: tamaño del WAL a partir del cual se hace checkpoint
+    - analyze_min_changes / analyze_changed_ratio: cambios (ver change_version)
+      desde el último ANALYZE para repetirlo: el mayor entre el mínimo y la fracción
+      de filas de codes
+    - analysis_limit: filas muestreadas por índice en ANALYZE (PRAGMA analysis_limit)
+    - optimize_interval_s: cada cuánto se ejecuta PRAGMA optimize
+    - truncate_wal: después del checkpoint PASSIVE, uno TRUNCATE que deja el WAL en
+      cero bytes; espera a los lectores (hasta busy_timeout), así que es solo para
+      herramientas o hilos aparte, nunca para el tiempo ocioso de la interfaz
+    """
+    step_budget_ms: int = 50
+    vacuum_pages_per_unit: int = 256
+    vacuum_min_free_pages: int = 256
+    checkpoint_wal_bytes: int = 1024 * 1024
+    analyze_min_changes: int = 1000
+    analyze_changed_ratio: float = 0.1
+    analysis_limit: int = 1000
+    optimize_interval_s: int = 3600
+    truncate_wal: bool = False
+
+
+DEFAULT_MAINTENANCE_POLICY = MaintenancePolicy()
+
+
+class DatabaseSize(NamedTuple):
+    file_bytes: int
+    wal_bytes: int
+    page_count: int
+    freelist_count: int
+
+
+class MaintenanceReport(NamedTuple):
+    task: str
+    duration_ms: float
+    units: int
+    before: DatabaseSize
+    after: DatabaseSize
+
+
+def database_size(conn: sqlite3.Connection, db_path: Path) -> DatabaseSize:
+    wal = Path(f"{db_path}-wal")
+    return DatabaseSize(
+        file_bytes=db_path.stat().st_size if db_path.exists() else 0,
+        wal_bytes=wal.stat().st_size if wal.exists() else 0,
+        page_count=conn.execute("PRAGMA page_count").fetchone()[0],
+        freelist_count=conn.execute("PRAGMA freelist_count").fetchone()[0],
+    )
+
+
+class MaintenanceScheduler:
+    """Mantenimiento de la base por pasos acotados en tiempo, para el tiempo ocioso.
+
+    Tareas, en este orden y solo si hacen falta (ver pending()):
+    - vacuum: PRAGMA incremental_vacuum por bloques (requiere auto_vacuum=INCREMENTAL,
+      migración 7) cuando hay muchas páginas libres, p. ej. tras remove_all()
+    - analyze: ANALYZE índice por índice, con muestreo, tras muchos cambios
+    - optimize: PRAGMA optimize periódico
+    - checkpoint: pasa el WAL a la base (PASSIVE: no espera a nadie); también hace
+      efectivo el vacuum (en WAL el archivo se achica recién en el checkpoint). El
+      WAL se trunca solo con policy.truncate_wal y al cerrar el repositorio
+
+    Cada unidad de trabajo toma la conexión de escritura y la libera enseguida, así
+    las escrituras de la interfaz se intercalan. step() ejecuta unidades hasta agotar
+    policy.step_budget_ms o hasta que should_yield() retorne True (actividad del
+    usuario) y retorna True si queda trabajo pendiente.
+    """
+
+    def __init__(self, repo, policy: MaintenancePolicy = DEFAULT_MAINTENANCE_POLICY) -> None:
+        self.repo = repo
+        self.policy = policy
+        self.history: Deque[MaintenanceReport] = deque(maxlen=50)
+        self._task: Optional[Iterator[None]] = None
+        self._task_name = ""
+        self._task_start = 0.0
+        self._task_units = 0
+        self._task_before: Optional[DatabaseSize] = None
+        self._analyzed_version: Optional[int] = None
+        self._last_optimize = time.monotonic()
+        self._checkpoint_needed = False
+        self._wal_after_checkpoint = -1
+
+    # ------------------------------------------------------------------ estado
+
+    def size(self) -> DatabaseSize:
+        with self.repo.writer() as conn:
+            return database_size(conn, self.repo.db_path)
+
+    def pending(self) -> List[str]:
+        """Tareas que hacen falta ahora (incluida la que está a medias)."""
+        tasks = [self._task_name] if self._task is not None else []
+        with self.repo.writer() as conn:
+            size = database_size(conn, self.repo.db_path)
+            incremental = conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2
+            version = conn.execute("SELECT version FROM codes_version WHERE id = 1").fetchone()[0]
+            analyzed = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'").fetchone() is not None
+            rows = conn.execute("SELECT MAX(id) FROM codes").fetchone()[0] or 0
+        if self._analyzed_version is None and analyzed:
+            self._analyzed_version = version  # estadísticas de una sesión anterior
+        candidates = []
+        if incremental and size.freelist_count >= self.policy.vacuum_min_free_pages:
+            candidates.append("vacuum")
+        threshold = max(self.policy.analyze_min_changes, int(rows * self.policy.analyze_changed_ratio))
+        if not analyzed or version - (self._analyzed_version or 0) >= threshold:
+            candidates.append("analyze")
+        if time.monotonic() - self._last_optimize >= self.policy.optimize_interval_s:
+            candidates.append("optimize")
+        # PASSIVE no achica el archivo WAL: no se repite hasta que cambie de tamaño
+        if self._checkpoint_needed or (size.wal_bytes >= self.policy.checkpoint_wal_bytes
+                                       and size.wal_bytes != self._wal_after_checkpoint):
+            candidates.append("checkpoint")
+        return tasks + [t for t in candidates if t not in tasks]
+
+    # ---------------------------------------------------------------- ejecución
+
+    def step(self, budget_ms: Optional[float] = None, should_yield: Optional[Callable[[], bool]] = None) -> bool:
+        """Avanza el mantenimiento durante a lo sumo `budget_ms` (por defecto
+        policy.step_budget_ms). Retorna True si queda trabajo pendiente."""
+        budget = (budget_ms if budget_ms is not None else self.policy.step_budget_ms) / 1000
+        deadline = time.perf_counter() + budget
+        while time.perf_counter() < deadline:
+            if should_yield is not None and should_yield():
+                return True
+            if self._task is None and not self._next_task():
+                return False
+            try:
+                next(self._task)
+                self._task_units += 1
+            except StopIteration:
+                self._finish_task()
+        return bool(self._task is not None or self.pending())
+
+    def run_all(self) -> List[MaintenanceReport]:
+        """Ejecuta todo el mantenimiento pendiente sin límite de tiempo (herramientas)."""
+        reports_before = len(self.history)
+        while self.step(budget_ms=60000):
+            pass
+        return list(self.history)[reports_before:]
+
+    def _next_task(self) -> bool:
+        tasks = self.pending()
+        if not tasks:
+            return False
+        self._task_name = tasks[0]
+        self._task = getattr(self, f"_{self._task_name}")()
+        self._task_start = time.perf_counter()
+        self._task_units = 0
+        self._task_before = self.size()
+        return True
+
+    def _finish_task(self) -> None:
+        report = MaintenanceReport(self._task_name, (time.perf_counter() - self._task_start) * 1000,
+                                   self._task_units, self._task_before, self.size())
+        self.history.append(report)
+        log.info("Mantenimiento %s: %d unidades en %.0f ms, %d -> %d bytes, %d -> %d páginas (%d libres)",
+                 report.task, report.units, report.duration_ms, report.before.file_bytes, report.after.file_bytes,
+                 report.before.page_count, report.after.page_count, report.after.freelist_count)
+        self._task = None
+
+    # ------------------------------------------------------------------ tareas
+
+    def _vacuum(self) -> Iterator[None]:
+        while True:
+            with self.repo.writer() as conn:
+                if conn.execute("PRAGMA freelist_count").fetchone()[0] == 0:
+                    break
+                # incremental_vacuum avanza una página por cada fila leída: hay que agotar el cursor
+                conn.execute(f"PRAGMA incremental_vacuum({int(self.policy.vacuum_pages_per_unit)})").fetchall()
+                conn.commit()
+            self._checkpoint_needed = True
+            yield
+
+    def _analyze(self) -> Iterator[None]:
+        with self.repo.writer() as conn:
+            version = conn.execute("SELECT version FROM codes_version WHERE id = 1").fetchone()[0]
+            names = [r[0] for r in conn.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'index' AND name NOT LIKE 'sqlite_%' ORDER BY name")]
+        # Un índice por unidad: ANALYZE completo no se puede interrumpir
+        for name in names:
+            with self.repo.writer() as conn:
+                conn.execute(f"PRAGMA analysis_limit = {int(self.policy.analysis_limit)}")
+                conn.execute(f'ANALYZE "{name}"')
+                conn.commit()
+            yield
+        self._analyzed_version = version
+
+    def _optimize(self) -> Iterator[None]:
+        with self.repo.writer() as conn:
+            conn.execute(f"PRAGMA analysis_limit = {int(self.policy.analysis_limit)}")
+            conn.execute("PRAGMA optimize")
+            conn.commit()
+        self._last_optimize = time.monotonic()
+        yield
+
+    def _checkpoint(self) -> Iterator[None]:
+        with self.repo.writer() as conn:
+            busy, frames, done = conn.execute("PRAGMA wal_checkpoint(PASSIVE)").fetchone()
+        yield
+        if self.policy.truncate_wal and busy == 0 and frames == done:
+            # Todo copiado: TRUNCATE deja el WAL en cero bytes (espera lectores, a lo sumo busy_timeout)
+            with self.repo.writer() as conn:
+                conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchone()
+            yield
+        self._checkpoint_needed = False
+        wal = Path(f"{self.repo.db_path}-wal")
+        self._wal_after_checkpoint = wal.stat().st_size if wal.exists() else 0
@@ -0,0 +1,210 @@
+"""Importación con actualización (upsert) resuelta con SQL de conjuntos.
+
+Las filas del archivo se cargan en la tabla temporal import_staging (una fila por
+código: si se repite, gana la última) y se comparan contra codes de una vez:
+
+- nuevos: códigos de import_staging que no están en codes
+- actualizados: filas de codes cuyo stock cambia; se copian a import_updates con
+  el stock y el estado nuevos (función SQL merged_status, las mismas reglas que
+  update_stock)
+- sin cambios: el resto
+
+Solo se actualiza el stock (y el estado que resulta de él); una celda vacía no
+borra el valor guardado. Las funciones no confirman: CodeRepository.merge_codes
+aplica todo en una transacción, o la deshace en una simulación.
+
+La importación sin actualización (CodeRepository.import_codes) usa la tabla
+temporal import_new: las filas ya calculadas se publican con un solo INSERT ... SELECT.
+"""
+import sqlite3
+from typing import Callable, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+from repository.migrations import CODE_NUMBER_SQL, CODE_PREFIX_SQL
+
+# Cambios de ejemplo que se muestran en la simulación
+MERGE_SAMPLE = 10
+
+# (stock_per_box, stock_boxes, stock_remaining)
+Stock = Tuple[Optional[int], Optional[int], Optional[int]]
+
+
+class MergeChange(NamedTuple):
+    code: str
+    old_stock: Stock
+    new_stock: Stock
+    old_status: str
+    new_status: str
+
+
+class MergePlan(NamedTuple):
+    staged: int                  # códigos distintos del archivo
+    inserts: int
+    updates: int                 # códigos con al menos una fila que cambia
+    unchanged: int
+    status_changes: int          # filas de codes cuyo estado cambia
+    sample: List[MergeChange]
+    applied: bool = False
+    missing_images: int = 0      # imágenes de códigos nuevos que no existen (se agregan sin imagen)
+
+
+def create_staging(conn: sqlite3.Connection) -> None:
+    conn.execute("DROP TABLE IF EXISTS temp.import_staging")
+    conn.execute("DROP TABLE IF EXISTS temp.import_updates")
+    # rowid conserva el orden del archivo para los códigos nuevos
+    conn.execute("""
+        CREATE TEMP TABLE import_staging (
+            code TEXT NOT NULL UNIQUE,
+            annotated INTEGER NOT NULL,
+            status TEXT,
+            image_path TEXT,
+            description TEXT,
+            stock_per_box INTEGER,
+            stock_boxes INTEGER,
+            stock_remaining INTEGER
+        )
+    """)
+    conn.execute("""
+        CREATE TEMP TABLE import_updates (
+            id INTEGER PRIMARY KEY,
+            code TEXT NOT NULL,
+            old_per_box INTEGER, old_boxes INTEGER, old_remaining INTEGER,
+            per_box INTEGER, boxes INTEGER, remaining INTEGER,
+            old_status TEXT, status TEXT
+        )
+    """)
+
+
+def drop_staging(conn: sqlite3.Connection) -> None:
+    conn.execute("DROP TABLE IF EXISTS temp.import_staging")
+    conn.execute("DROP TABLE IF EXISTS temp.import_updates")
+    conn.execute("DROP TABLE IF EXISTS temp.import_new")
+
+
+# Columnas de INSERT INTO codes que carga import_new (en este orden)
+NEW_CODE_COLUMNS = ("code, prefix, number, created_at, annotated, duplicate, status, image_path, description, "
+                    "stock_per_box, stock_boxes, stock_remaining")
+
+
+def create_new_staging(conn: sqlite3.Connection) -> None:
+    """Tabla temporal import_new: filas listas para codes, sin UNIQUE (los códigos
+    repetidos del archivo se insertan todos, como con add_codes)."""
+    conn.execute("DROP TABLE IF EXISTS temp.import_new")
+    conn.execute("""
+        CREATE TEMP TABLE import_new (
+            code TEXT NOT NULL,
+            prefix TEXT,
+            number INTEGER,
+            created_at INTEGER NOT NULL,
+            annotated INTEGER NOT NULL,
+            duplicate INTEGER NOT NULL,
+            status TEXT NOT NULL,
+            image_path TEXT,
+            description TEXT,
+            stock_per_box INTEGER,
+            stock_boxes INTEGER,
+            stock_remaining INTEGER
+        )
+    """)
+
+
+def stage_new_rows(conn: sqlite3.Connection, rows: Iterable[Tuple]) -> None:
+    """Carga tuplas con los valores de NEW_CODE_COLUMNS."""
+    conn.executemany(f"INSERT INTO temp.import_new({NEW_CODE_COLUMNS}) VALUES ({', '.join('?' * 12)})", rows)
+
+
+def publish_new_rows(conn: sqlite3.Connection) -> Tuple[int, List[str]]:
+    """Inserta en codes las filas de import_new cuyo código no existe todavía (otra
+    estación pudo agregarlo mientras se leía el archivo), en el orden del archivo.
+    Retorna (filas insertadas, códigos distintos)."""
+    inserted = conn.execute(f"""
+        INSERT INTO codes({NEW_CODE_COLUMNS})
+        SELECT {NEW_CODE_COLUMNS} FROM temp.import_new s
+        WHERE NOT EXISTS (SELECT 1 FROM codes c WHERE c.code = s.code)
+        ORDER BY s.rowid
+    """).rowcount
+    codes = [row[0] for row in conn.execute("SELECT DISTINCT code FROM temp.import_new")] if inserted else []
+    return inserted, codes
+
+
+def _staging_row(item: Tuple) -> Tuple:
+    padded = tuple(item) + (None,) * (9 - len(item))
+    return (padded[0], int(padded[1]), padded[3]) + padded[4:9]
+
+
+def stage_items(conn: sqlite3.Connection, items: Iterable[Tuple]) -> None:
+    """Carga tuplas de add_codes; created_at se ignora (los nuevos usan la hora de la importación)."""
+    conn.executemany(
+        "INSERT OR REPLACE INTO temp.import_staging(code, annotated, status, image_path, description, "
+        "stock_per_box, stock_boxes, stock_remaining) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        (_staging_row(item) for item in items),
+    )
+
+
+def plan_merge(conn: sqlite3.Connection) -> MergePlan:
+    """Clasifica los códigos de import_staging y llena import_updates.
+    Requiere la función SQL merged_status(annotated, status, per_box, boxes, remaining)."""
+    conn.execute("DELETE FROM temp.import_updates")
+    conn.execute("""
+        INSERT INTO temp.import_updates
+        SELECT id, code, old_per_box, old_boxes, old_remaining, per_box, boxes, remaining, old_status,
+               merged_status(annotated, old_status, per_box, boxes, remaining)
+        FROM (
+            SELECT c.id, c.code, c.annotated, c.status AS old_status,
+                   c.stock_per_box AS old_per_box, c.stock_boxes AS old_boxes, c.stock_remaining AS old_remaining,
+                   COALESCE(s.stock_per_box, c.stock_per_box) AS per_box,
+                   COALESCE(s.stock_boxes, c.stock_boxes) AS boxes,
+                   COALESCE(s.stock_remaining, c.stock_remaining) AS remaining
+            FROM temp.import_staging s JOIN codes c ON c.code = s.code
+        )
+        WHERE per_box IS NOT old_per_box OR boxes IS NOT old_boxes OR remaining IS NOT old_remaining
+    """)
+    staged = conn.execute("SELECT COUNT(*) FROM temp.import_staging").fetchone()[0]
+    existing = conn.execute(
+        "SELECT COUNT(*) FROM temp.import_staging s WHERE EXISTS (SELECT 1 FROM codes c WHERE c.code = s.code)"
+    ).fetchone()[0]
+    updates, status_changes = conn.execute(
+        "SELECT COUNT(DISTINCT code), COALESCE(SUM(status IS NOT old_status), 0) FROM temp.import_updates"
+    ).fetchone()
+    sample = [
+        MergeChange(row[0], (row[1], row[2], row[3]), (row[4], row[5], row[6]), row[7], row[8])
+        for row in conn.execute(
+            "SELECT code, old_per_box, old_boxes, old_remaining, per_box, boxes, remaining, old_status, status "
+            "FROM temp.import_updates ORDER BY code, id LIMIT ?", (MERGE_SAMPLE,))
+    ]
+    return MergePlan(staged, staged - existing, updates, existing - updates, status_changes, sample)
+
+
+def apply_merge(conn: sqlite3.Connection, created_at_ms: int,
+                image_filter: Optional[Callable[[List[str]], Set[str]]] = None) -> int:
+    """Aplica el plan de plan_merge: actualiza el stock y el estado de import_updates e
+    inserta los códigos nuevos. `image_filter(rutas)` retorna las rutas que existen;
+    las demás se guardan sin imagen. Retorna la cantidad de imágenes descartadas."""
+    missing = 0
+    if image_filter is not None:
+        rows = conn.execute(
+            "SELECT code, image_path FROM temp.import_staging s "
+            "WHERE image_path IS NOT NULL AND NOT EXISTS (SELECT 1 FROM codes c WHERE c.code = s.code)"
+        ).fetchall()
+        if rows:
+            present = image_filter([row[1] for row in rows])
+            dropped = [(row[0],) for row in rows if row[1] not in present]
+            conn.executemany("UPDATE temp.import_staging SET image_path = NULL WHERE code = ?", dropped)
+            missing = len(dropped)
+    conn.execute("""
+        UPDATE codes
+        SET (stock_per_box, stock_boxes, stock_remaining, status) =
+            (SELECT per_box, boxes, remaining, status FROM temp.import_updates u WHERE u.id = codes.id)
+        WHERE id IN (SELECT id FROM temp.import_updates)
+    """)
+    # prefix/number con las mismas expresiones que el trigger de la migración 4, que así no corre
+    conn.execute(f"""
+        INSERT INTO codes(code, prefix, number, created_at, annotated, duplicate, status, image_path, description,
+                          stock_per_box, stock_boxes, stock_remaining)
+        SELECT code, {CODE_PREFIX_SQL.format(code='code')}, {CODE_NUMBER_SQL.format(code='code')}, ?, annotated, 0,
+               merged_status(annotated, status, stock_per_box, stock_boxes, stock_remaining),
+               image_path, description, stock_per_box, stock_boxes, stock_remaining
+        FROM temp.import_staging s
+        WHERE NOT EXISTS (SELECT 1 FROM codes c WHERE c.code = s.code)
+        ORDER BY s.rowid
+    """, (created_at_ms,))
+    return missing
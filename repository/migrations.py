@@ -0,0 +1,402 @@
+import logging
+import re
+import sqlite3
+import time
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+log = logging.getLogger(__name__)
+
+
+class Migration(NamedTuple):
+    """Paso de migración del esquema.
+
+    - version: valor de PRAGMA user_version tras aplicar el paso (estrictamente creciente)
+    - description: texto corto para el log
+    - apply: función que recibe la conexión y ejecuta el cambio (debe ser idempotente)
+    - transactional: si es False el paso se ejecuta fuera de transacción
+      (necesario para VACUUM o cambios de PRAGMA que no admiten transacción)
+    """
+    version: int
+    description: str
+    apply: Callable[[sqlite3.Connection], None]
+    transactional: bool = True
+
+
+MIGRATIONS: List[Migration] = []
+
+
+def migration(version: int, description: str, transactional: bool = True):
+    """Decorador que registra una función como paso de migración."""
+    def register(func: Callable[[sqlite3.Connection], None]) -> Callable[[sqlite3.Connection], None]:
+        if any(m.version == version for m in MIGRATIONS):
+            raise ValueError(f"Migración duplicada para la versión {version}")
+        MIGRATIONS.append(Migration(version, description, func, transactional))
+        MIGRATIONS.sort(key=lambda m: m.version)
+        return func
+    return register
+
+
+def latest_version() -> int:
+    return MIGRATIONS[-1].version if MIGRATIONS else 0
+
+
+def current_version(conn: sqlite3.Connection) -> int:
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def column_exists(conn: sqlite3.Connection, table: str, column: str) -> bool:
+    return any(row[1] == column for row in conn.execute(f"PRAGMA table_info({table})"))
+
+
+def add_column_if_missing(conn: sqlite3.Connection, table: str, column: str, declaration: str) -> None:
+    """ALTER TABLE ADD COLUMN solo si la columna no existe (paso idempotente)."""
+    if not column_exists(conn, table, column):
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {declaration}")
+
+
+def column_type(conn: sqlite3.Connection, table: str, column: str) -> Optional[str]:
+    return next((row[2].upper() for row in conn.execute(f"PRAGMA table_info({table})") if row[1] == column), None)
+
+
+def rebuild_table(conn: sqlite3.Connection, table: str, new_sql: str, exprs: Dict[str, str]) -> None:
+    """Reconstruye `table` con el esquema `new_sql` (para cambios que ALTER TABLE no
+    admite, p. ej. el tipo de una columna), según el procedimiento de SQLite: crea la
+    tabla nueva, copia las filas (`exprs`: expresión SQL por columna, por defecto la
+    misma columna), reemplaza la original y recrea sus índices y triggers.
+    Conserva los id y la secuencia de AUTOINCREMENT. Debe correr dentro de una transacción."""
+    objects = [row[0] for row in conn.execute(
+        "SELECT sql FROM sqlite_master WHERE tbl_name = ? AND type IN ('index', 'trigger') AND sql IS NOT NULL "
+        "ORDER BY type, name", (table,))]
+    columns = [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+    sequence = None
+    if table_exists(conn, "sqlite_sequence"):
+        row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = ?", (table,)).fetchone()
+        sequence = row[0] if row else None
+    staging = f"{table}_rebuild"
+    conn.execute(f"DROP TABLE IF EXISTS {staging}")
+    conn.execute(re.sub(rf"^\s*CREATE TABLE (IF NOT EXISTS )?{table}\b", f"CREATE TABLE {staging}", new_sql, count=1))
+    conn.execute(f"INSERT INTO {staging}({', '.join(columns)}) "
+                 f"SELECT {', '.join(exprs.get(c, c) for c in columns)} FROM {table}")
+    conn.execute(f"DROP TABLE {table}")
+    conn.execute(f"ALTER TABLE {staging} RENAME TO {table}")
+    for sql in objects:
+        conn.execute(sql)
+    if sequence is not None:
+        conn.execute("DELETE FROM sqlite_sequence WHERE name = ?", (table,))
+        conn.execute("INSERT INTO sqlite_sequence(name, seq) VALUES (?, ?)", (table, sequence))
+
+
+def migrate(conn: sqlite3.Connection, migrations: Optional[List[Migration]] = None) -> int:
+    """Aplica en orden las migraciones pendientes y retorna la versión final.
+
+    Una base de datos ya actualizada solo cuesta una lectura de PRAGMA user_version.
+    Cada paso transaccional se ejecuta dentro de BEGIN IMMEDIATE junto con la
+    actualización de user_version, de modo que un fallo deja la base en la versión anterior.
+    """
+    steps = sorted(migrations if migrations is not None else MIGRATIONS, key=lambda m: m.version)
+    version = current_version(conn)
+    target = steps[-1].version if steps else 0
+    if version >= target:
+        if version > target:
+            log.warning("La base de datos está en la versión %d, más nueva que la soportada (%d)", version, target)
+        return version
+
+    if conn.in_transaction:
+        conn.commit()
+    for step in steps:
+        if step.version <= version:
+            continue
+        start = time.perf_counter()
+        if step.transactional:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Otro proceso pudo haber migrado mientras esperábamos el lock
+                if current_version(conn) >= step.version:
+                    conn.rollback()
+                    version = current_version(conn)
+                    continue
+                step.apply(conn)
+                conn.execute(f"PRAGMA user_version = {int(step.version)}")
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                log.exception("Falló la migración %d (%s)", step.version, step.description)
+                raise
+        else:
+            step.apply(conn)
+            if conn.in_transaction:
+                conn.commit()
+            conn.execute(f"PRAGMA user_version = {int(step.version)}")
+        version = step.version
+        log.info("Migración %d aplicada (%s) en %.1f ms", step.version, step.description,
+                 (time.perf_counter() - start) * 1000)
+    return version
+
+
+# =============================================================================
+# PASOS DE MIGRACIÓN
+# =============================================================================
+
+@migration(1, "esquema base de codes")
+def _m001_base_schema(conn: sqlite3.Connection) -> None:
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS codes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            code TEXT NOT NULL,
+            created_at TEXT NOT NULL,
+            annotated INTEGER NOT NULL DEFAULT 0,
+            duplicate INTEGER NOT NULL DEFAULT 0,
+            status TEXT NOT NULL DEFAULT 'disponible',
+            image_path TEXT DEFAULT NULL,
+            description TEXT DEFAULT NULL,
+            stock_per_box INTEGER DEFAULT NULL,
+            stock_boxes INTEGER DEFAULT NULL,
+            stock_remaining INTEGER DEFAULT NULL
+        )
+        """
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_codes_code ON codes(code)")
+    # Bases creadas por versiones anteriores pueden no tener estas columnas
+    add_column_if_missing(conn, "codes", "status", "TEXT NOT NULL DEFAULT 'disponible'")
+    add_column_if_missing(conn, "codes", "image_path", "TEXT DEFAULT NULL")
+    add_column_if_missing(conn, "codes", "description", "TEXT DEFAULT NULL")
+    add_column_if_missing(conn, "codes", "stock_per_box", "INTEGER DEFAULT NULL")
+    add_column_if_missing(conn, "codes", "stock_boxes", "INTEGER DEFAULT NULL")
+    add_column_if_missing(conn, "codes", "stock_remaining", "INTEGER DEFAULT NULL")
+
+
+@migration(2, "índices compuestos para filtros y ordenamientos de la tabla")
+def _m002_query_indexes(conn: sqlite3.Connection) -> None:
+    # Un índice por combinación filtro/orden de CodesTableModel:
+    # filtros (ninguno | annotated | status | status+annotated) x orden (created_at | code | status)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_codes_created_at ON codes(created_at)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_codes_status_created_at ON codes(status, created_at)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_codes_status_code ON codes(status, code)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_codes_annotated_created_at ON codes(annotated, created_at)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_codes_annotated_code ON codes(annotated, code)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_codes_annotated_status ON codes(annotated, status)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_codes_status_annotated_created_at ON codes(status, annotated, created_at)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_codes_status_annotated_code ON codes(status, annotated, code)")
+    # Índice parcial: solo contiene las filas duplicadas (conteo en stats() y listado de duplicados)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_codes_duplicate ON codes(created_at) WHERE duplicate = 1")
+
+
+# Columnas cuya modificación se registra en codes_changes
+CDC_COLUMNS = ("code", "created_at", "annotated", "duplicate", "status", "image_path",
+               "description", "stock_per_box", "stock_boxes", "stock_remaining")
+
+
+def create_cdc_triggers(conn: sqlite3.Connection, columns=CDC_COLUMNS) -> None:
+    """(Re)crea los triggers que alimentan codes_changes.
+
+    El registro es compacto: una fila por id de codes con la última operación
+    ('I' alta, 'U' modificación, 'D' baja) y la versión en que ocurrió.
+    """
+    bump = (
+        "UPDATE codes_version SET version = version + 1 WHERE id = 1; "
+        "INSERT OR REPLACE INTO codes_changes(row_id, op, version) "
+        "VALUES ({row}, '{op}', (SELECT version FROM codes_version WHERE id = 1));"
+    )
+    changed = " OR ".join(f"OLD.{c} IS NOT NEW.{c}" for c in columns)
+    conn.execute("DROP TRIGGER IF EXISTS trg_codes_cdc_insert")
+    conn.execute("DROP TRIGGER IF EXISTS trg_codes_cdc_update")
+    conn.execute("DROP TRIGGER IF EXISTS trg_codes_cdc_delete")
+    conn.execute(f"CREATE TRIGGER trg_codes_cdc_insert AFTER INSERT ON codes BEGIN {bump.format(row='NEW.id', op='I')} END")
+    conn.execute(f"CREATE TRIGGER trg_codes_cdc_update AFTER UPDATE ON codes WHEN {changed} "
+                 f"BEGIN {bump.format(row='NEW.id', op='U')} END")
+    conn.execute(f"CREATE TRIGGER trg_codes_cdc_delete AFTER DELETE ON codes BEGIN {bump.format(row='OLD.id', op='D')} END")
+
+
+@migration(3, "registro de cambios (CDC) con contador de versión")
+def _m003_change_log(conn: sqlite3.Connection) -> None:
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS codes_version (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            version INTEGER NOT NULL,
+            pruned_before INTEGER NOT NULL DEFAULT 0
+        )
+        """
+    )
+    conn.execute("INSERT OR IGNORE INTO codes_version(id, version, pruned_before) VALUES (1, 0, 0)")
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS codes_changes (
+            row_id INTEGER PRIMARY KEY,
+            op TEXT NOT NULL,
+            version INTEGER NOT NULL
+        )
+        """
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_codes_changes_version ON codes_changes(version)")
+    create_cdc_triggers(conn)
+
+
+# Partes derivadas del código: prefijo = código sin los dígitos finales,
+# número = dígitos finales como entero (NULL si no termina en dígitos)
+CODE_PREFIX_SQL = "rtrim({code}, '0123456789')"
+CODE_NUMBER_SQL = "CAST(NULLIF(substr({code}, length(rtrim({code}, '0123456789')) + 1), '') AS INTEGER)"
+
+
+@migration(4, "columnas prefix/number derivadas del código (orden natural)")
+def _m004_code_parts(conn: sqlite3.Connection) -> None:
+    add_column_if_missing(conn, "codes", "prefix", "TEXT")
+    add_column_if_missing(conn, "codes", "number", "INTEGER")
+    derived = (f"prefix = {CODE_PREFIX_SQL.format(code='code')}, "
+               f"number = {CODE_NUMBER_SQL.format(code='code')}")
+    conn.execute(f"UPDATE codes SET {derived}")
+    # Triggers en lugar de calcularlo en Python: también cubren inserciones de
+    # estaciones con versiones anteriores de la aplicación y cargas directas por SQL
+    conn.execute("DROP TRIGGER IF EXISTS trg_codes_parts_insert")
+    conn.execute("DROP TRIGGER IF EXISTS trg_codes_parts_update")
+    conn.execute(f"CREATE TRIGGER trg_codes_parts_insert AFTER INSERT ON codes "
+                 f"BEGIN UPDATE codes SET {derived} WHERE id = NEW.id; END")
+    conn.execute(f"CREATE TRIGGER trg_codes_parts_update AFTER UPDATE OF code ON codes "
+                 f"BEGIN UPDATE codes SET {derived} WHERE id = NEW.id; END")
+    # El orden por código pasa a ser natural (prefix, number, code): se reemplazan
+    # los índices por code de la migración 2 por sus equivalentes por prefijo y número
+    conn.execute("DROP INDEX IF EXISTS idx_codes_status_code")
+    conn.execute("DROP INDEX IF EXISTS idx_codes_annotated_code")
+    conn.execute("DROP INDEX IF EXISTS idx_codes_status_annotated_code")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_codes_prefix_number ON codes(prefix, number, code)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_codes_status_prefix_number ON codes(status, prefix, number, code)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_codes_annotated_prefix_number ON codes(annotated, prefix, number, code)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_codes_status_annotated_prefix_number ON codes(status, annotated, prefix, number, code)")
+
+
+def table_exists(conn: sqlite3.Connection, name: str) -> bool:
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (name,)).fetchone() is not None
+
+
+def fts_trigram_available(conn: sqlite3.Connection) -> bool:
+    """FTS5 con tokenizador trigram (SQLite 3.34 o superior compilado con FTS5)."""
+    try:
+        conn.execute("CREATE VIRTUAL TABLE temp.fts_probe USING fts5(x, tokenize = 'trigram')")
+        conn.execute("DROP TABLE temp.fts_probe")
+        return True
+    except sqlite3.OperationalError:
+        return False
+
+
+def create_description_fts(conn: sqlite3.Connection) -> bool:
+    """Crea el índice de texto codes_fts (trigramas de description) y sus triggers.
+    Retorna False si el SQLite instalado no soporta FTS5 trigram."""
+    if table_exists(conn, "codes_fts"):
+        return True
+    if not fts_trigram_available(conn):
+        log.info("SQLite %s sin FTS5 trigram: las descripciones se buscan con LIKE", sqlite3.sqlite_version)
+        return False
+    # Tabla de contenido externo: solo guarda el índice, el texto sigue en codes
+    conn.execute("CREATE VIRTUAL TABLE codes_fts USING fts5(description, content = 'codes', "
+                 "content_rowid = 'id', tokenize = 'trigram')")
+    conn.execute("INSERT INTO codes_fts(codes_fts) VALUES ('rebuild')")
+    insert = "INSERT INTO codes_fts(rowid, description) VALUES (NEW.id, NEW.description);"
+    delete = "INSERT INTO codes_fts(codes_fts, rowid, description) VALUES ('delete', OLD.id, OLD.description);"
+    conn.execute(f"CREATE TRIGGER trg_codes_fts_insert AFTER INSERT ON codes BEGIN {insert} END")
+    conn.execute(f"CREATE TRIGGER trg_codes_fts_delete AFTER DELETE ON codes BEGIN {delete} END")
+    conn.execute(f"CREATE TRIGGER trg_codes_fts_update AFTER UPDATE OF description ON codes BEGIN {delete} {insert} END")
+    return True
+
+
+@migration(5, "índice de texto (FTS5 trigram) para descripciones")
+def _m005_description_fts(conn: sqlite3.Connection) -> None:
+    # Si no hay soporte el paso igual se marca aplicado; CodeRepository reintenta
+    # crear el índice al abrir la base con un SQLite que sí lo soporte
+    create_description_fts(conn)
+
+
+@migration(6, "tabla codes_archive para códigos fríos")
+def _m006_archive(conn: sqlite3.Connection) -> None:
+    # Mismas columnas que codes (ids conservados: AUTOINCREMENT nunca los reutiliza)
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS codes_archive (
+            id INTEGER PRIMARY KEY,
+            code TEXT NOT NULL,
+            created_at TEXT NOT NULL,
+            annotated INTEGER NOT NULL DEFAULT 0,
+            duplicate INTEGER NOT NULL DEFAULT 0,
+            status TEXT NOT NULL DEFAULT 'disponible',
+            image_path TEXT DEFAULT NULL,
+            description TEXT DEFAULT NULL,
+            stock_per_box INTEGER DEFAULT NULL,
+            stock_boxes INTEGER DEFAULT NULL,
+            stock_remaining INTEGER DEFAULT NULL,
+            prefix TEXT,
+            number INTEGER,
+            archived_at TEXT NOT NULL
+        )
+        """
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_codes_archive_code ON codes_archive(code, created_at)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_codes_archive_created_at ON codes_archive(created_at)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_codes_archive_prefix_number ON codes_archive(prefix, number, code)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_codes_archive_status ON codes_archive(status, created_at)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_codes_archive_archived_at ON codes_archive(archived_at)")
+
+
+@migration(7, "auto_vacuum incremental", transactional=False)
+def _m007_incremental_vacuum(conn: sqlite3.Connection) -> None:
+    # En una base existente auto_vacuum solo cambia con un VACUUM completo (una sola vez);
+    # después PRAGMA incremental_vacuum libera páginas por partes (ver repository/maintenance.py)
+    if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.execute("VACUUM")
+
+
+# Texto ISO (UTC, como lo escribía datetime.utcnow().isoformat()) -> milisegundos desde 1970,
+# truncando los microsegundos igual que to_epoch_ms (julianday redondearía al ms más cercano).
+# Los valores que ya son enteros se conservan (paso idempotente).
+def _epoch_ms_sql(column: str) -> str:
+    return (f"CASE WHEN typeof({column}) = 'integer' THEN {column} "
+            f"ELSE COALESCE(CAST(strftime('%s', {column}) AS INTEGER) * 1000 + "
+            f"CASE WHEN substr({column}, 20, 1) = '.' THEN CAST(substr({column} || '000', 21, 3) AS INTEGER) ELSE 0 END, 0) END")
+
+
+@migration(8, "fechas como enteros (epoch ms)")
+def _m008_epoch_ms_timestamps(conn: sqlite3.Connection) -> None:
+    for table, columns in (("codes", ("created_at",)), ("codes_archive", ("created_at", "archived_at"))):
+        if all(column_type(conn, table, c) == "INTEGER" for c in columns):
+            continue
+        sql = conn.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone()[0]
+        for column in columns:
+            sql = re.sub(rf"\b{column}\s+TEXT\b", f"{column} INTEGER", sql)
+        rebuild_table(conn, table, sql, {c: _epoch_ms_sql(c) for c in columns})
+
+
+@migration(9, "triggers que convierten a epoch ms las fechas en texto de estaciones anteriores")
+def _m009_text_created_at(conn: sqlite3.Connection) -> None:
+    # Las estaciones con versiones anteriores de la aplicación siguen insertando
+    # datetime.utcnow().isoformat(): la afinidad INTEGER no convierte ese texto, así que
+    # los triggers lo reescriben en epoch ms (igual que prefix/number en la migración 4)
+    # para que filtros, orden, exportación e instantánea vean siempre un entero
+    convert = f"UPDATE codes SET created_at = {_epoch_ms_sql('created_at')} WHERE id = NEW.id;"
+    conn.execute("DROP TRIGGER IF EXISTS trg_codes_created_at_insert")
+    conn.execute("DROP TRIGGER IF EXISTS trg_codes_created_at_update")
+    conn.execute(f"CREATE TRIGGER trg_codes_created_at_insert AFTER INSERT ON codes "
+                 f"WHEN typeof(NEW.created_at) = 'text' BEGIN {convert} END")
+    conn.execute(f"CREATE TRIGGER trg_codes_created_at_update AFTER UPDATE OF created_at ON codes "
+                 f"WHEN typeof(NEW.created_at) = 'text' BEGIN {convert} END")
+    # Filas en texto que llegaron entre la migración 8 y esta
+    for table, columns in (("codes", ("created_at",)), ("codes_archive", ("created_at", "archived_at"))):
+        for column in columns:
+            conn.execute(f"UPDATE {table} SET {column} = {_epoch_ms_sql(column)} WHERE typeof({column}) = 'text'")
+
+
+@migration(10, "índice por estado para el orden por estado con desempate por id")
+def _m010_status_index(conn: sqlite3.Connection) -> None:
+    # list_codes desempata por id: idx_codes_status termina en rowid, así que
+    # ORDER BY status, id se lee en orden del índice, sin ordenar aparte
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_codes_status ON codes(status)")
+
+
+@migration(11, "trigger de prefix/number solo para inserciones que no los traen")
+def _m011_parts_insert_fallback(conn: sqlite3.Connection) -> None:
+    # add_codes y la importación con actualización ya insertan prefix/number: el
+    # trigger queda para estaciones anteriores y cargas por SQL, sin un segundo UPDATE por fila
+    derived = (f"prefix = {CODE_PREFIX_SQL.format(code='code')}, "
+               f"number = {CODE_NUMBER_SQL.format(code='code')}")
+    conn.execute("DROP TRIGGER IF EXISTS trg_codes_parts_insert")
+    conn.execute(f"CREATE TRIGGER trg_codes_parts_insert AFTER INSERT ON codes WHEN NEW.prefix IS NULL "
+                 f"BEGIN UPDATE codes SET {derived} WHERE id = NEW.id; END")
@@ -0,0 +1,105 @@
+import sys
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, NamedTuple
+
+# Valor retornado por QueryCache.get cuando no hay resultado válido
+MISS = object()
+
+
+class _Entry(NamedTuple):
+    value: Any
+    rows: int
+    nbytes: int
+
+
+def estimate_bytes(rows: Any, sample: int = 64) -> int:
+    """Tamaño aproximado de un resultado: se mide una muestra de filas y se extrapola."""
+    if isinstance(rows, dict):
+        rows = list(rows.items())
+    if not isinstance(rows, list):
+        return sys.getsizeof(rows)
+    if not rows:
+        return sys.getsizeof(rows)
+    step = max(1, len(rows) // sample)
+    measured = rows[::step]
+    per_row = sum(sys.getsizeof(r) + sum(sys.getsizeof(v) for v in r) for r in measured) / len(measured)
+    return int(sys.getsizeof(rows) + per_row * len(rows))
+
+
+class QueryCache:
+    """Caché LRU de resultados de consultas, válida para una sola versión de los datos.
+
+    Cada get/put recibe la versión actual (ver CodeRepository._cache_version); si
+    cambió desde la última vez se descartan todas las entradas, porque cualquier
+    escritura puede afectar cualquier consulta. Límites por cantidad de entradas,
+    filas totales y bytes estimados; un resultado que por sí solo supera los
+    límites no se guarda.
+    """
+
+    def __init__(self, max_entries: int = 64, max_rows: int = 500000, max_bytes: int = 128 * 1024 * 1024) -> None:
+        self.max_entries = max_entries
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self._version: Any = None
+        self._rows = 0
+        self._bytes = 0
+        self._counters = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0, "skipped": 0}
+        self._lock = threading.RLock()
+
+    def get(self, key: Hashable, version: Any) -> Any:
+        with self._lock:
+            self._check_version(version)
+            entry = self._entries.get(key)
+            if entry is None:
+                self._counters["misses"] += 1
+                return MISS
+            self._entries.move_to_end(key)
+            self._counters["hits"] += 1
+            return entry.value
+
+    def put(self, key: Hashable, version: Any, value: Any, rows: int, nbytes: int) -> None:
+        with self._lock:
+            self._check_version(version)
+            if rows > self.max_rows or nbytes > self.max_bytes:
+                self._counters["skipped"] += 1
+                return
+            self._discard(key)
+            self._entries[key] = _Entry(value, rows, nbytes)
+            self._rows += rows
+            self._bytes += nbytes
+            while self._entries and (len(self._entries) > self.max_entries or self._rows > self.max_rows
+                                     or self._bytes > self.max_bytes):
+                oldest = next(iter(self._entries))
+                self._discard(oldest)
+                self._counters["evictions"] += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._counters["invalidations"] += len(self._entries)
+            self._entries.clear()
+            self._rows = 0
+            self._bytes = 0
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._counters["hits"] + self._counters["misses"]
+            return {
+                **self._counters,
+                "hit_rate": self._counters["hits"] / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+                "rows": self._rows,
+                "bytes": self._bytes,
+            }
+
+    def _check_version(self, version: Any) -> None:
+        if version != self._version:
+            self.clear()
+            self._version = version
+
+    def _discard(self, key: Hashable) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._rows -= entry.rows
+            self._bytes -= entry.nbytes
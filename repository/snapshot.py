@@ -0,0 +1,629 @@
+"""Copia en memoria, por columnas, de la tabla codes para filtrar y ordenar sin SQLite.
+
+Con NumPy las columnas son arreglos y los filtros son máscaras vectorizadas; sin
+NumPy se usan arreglos del módulo `array` y bucles de Python (mismo resultado,
+más lento). La copia se mantiene al día con el registro de cambios del
+repositorio (codes_changes), así que ve toda escritura confirmada, venga de la
+interfaz, de la cola de escritura diferida o de otra estación.
+
+La búsqueda de texto no recorre las cadenas en Python: cada pool guarda sus
+textos en un solo arreglo de bytes donde se ubican las apariciones del término.
+El orden por código sale de las columnas prefix/number con np.lexsort. sync()
+corrige los órdenes y las búsquedas guardadas solo en las filas que cambiaron.
+"""
+import threading
+from array import array
+from bisect import bisect_left
+from collections.abc import Sequence
+from typing import Any, Callable, Dict, List, Optional
+
+try:
+    import numpy as np
+except Exception:
+    np = None
+
+# Sin NumPy la instantánea funciona pero no alcanza la latencia objetivo con muchas filas
+HAS_NUMPY = np is not None
+from repository.db_querys import CodeRepository, ALL_STATUSES, like_contains, parse_code_range, split_code
+
+NULL_INT = -(2 ** 63)  # centinela para enteros NULL
+_COLUMNS = "id, code, created_at, annotated, duplicate, status, image_path, description, stock_per_box, stock_boxes, stock_remaining"
+_BYTE_COLUMNS = ("annotated", "duplicate", "status")
+# Órdenes que se calculan al cargar (los que ofrece la interfaz)
+PREWARM_ORDERS = ("created_at", "code", "status")
+# Con más filas cambiadas en un sync() los órdenes y búsquedas guardados se descartan
+# (la próxima consulta los recalcula enteros) en lugar de corregirse fila por fila
+PATCH_MAX_ROWS = 2000
+# Búsquedas guardadas (una máscara de un byte por fila cada una)
+SEARCH_CACHE_SIZE = 16
+# Filas cambiadas desde las que sync() ubica las reinserciones con np.searchsorted
+# sobre las columnas de la clave (con menos, una búsqueda binaria en Python es más barata)
+VECTOR_PATCH_ROWS = 16
+# LIKE de SQLite solo ignora mayúsculas ASCII: en UTF-8 son bytes sueltos
+_ASCII_FOLD = bytes.maketrans(b"ABCDEFGHIJKLMNOPQRSTUVWXYZ", b"abcdefghijklmnopqrstuvwxyz")
+
+
+class StringPool:
+    """Tabla de cadenas internadas: cada texto distinto se guarda una sola vez."""
+
+    def __init__(self) -> None:
+        self.strings: List[str] = []
+        self._index: Dict[str, int] = {}
+        self._ranks = None
+        # Texto para contains(): las cadenas en UTF-8 y minúsculas ASCII, separadas por \0
+        if np is not None:
+            self._text = np.zeros(0, dtype=np.uint8)
+            self._starts = np.zeros(0, dtype=np.int64)      # inicio de cada cadena en _text
+            self._byte_counts = np.zeros(256, dtype=np.int64)
+        self._indexed = 0                                   # cadenas ya agregadas a _text
+
+    def intern(self, value: Optional[str]) -> int:
+        if value is None:
+            return -1
+        idx = self._index.get(value)
+        if idx is None:
+            idx = len(self.strings)
+            self.strings.append(value)
+            self._index[value] = idx
+            self._ranks = None
+        return idx
+
+    def get(self, idx: int) -> Optional[str]:
+        return self.strings[idx] if idx >= 0 else None
+
+    def find(self, value: str) -> int:
+        """Índice de la cadena, o -1 si no está en el pool."""
+        return self._index.get(value, -1)
+
+    def ranks(self):
+        """Posición de cada cadena en orden binario (como SQLite); índice -1 (NULL) primero."""
+        if self._ranks is None:
+            strings = self.strings
+            order = sorted(range(len(strings)), key=strings.__getitem__)
+            if np is not None:
+                ranks = np.empty(len(order) + 1, dtype=np.int64)
+                ranks[np.array(order, dtype=np.int64)] = np.arange(len(order))
+            else:
+                ranks = array("q", [0]) * (len(order) + 1)
+                for rank, idx in enumerate(order):
+                    ranks[idx] = rank
+            ranks[-1] = -1
+            self._ranks = ranks
+        return self._ranks
+
+    def matching(self, predicate):
+        """Máscara sobre el pool (+ posición final para NULL) con las cadenas que cumplen predicate."""
+        flags = [predicate(s) for s in self.strings] + [False]
+        return np.array(flags, dtype=bool) if np is not None else flags
+
+    def index_text(self) -> None:
+        """Agrega a _text las cadenas internadas desde la última vez."""
+        if np is None or self._indexed == len(self.strings):
+            return
+        new = self.strings[self._indexed:]
+        chunk = np.frombuffer(("\0".join(new) + "\0").encode("utf-8").translate(_ASCII_FOLD), dtype=np.uint8)
+        ends = np.flatnonzero(chunk == 0)
+        if len(ends) != len(new):
+            # Alguna cadena contiene \0: los límites se calculan cadena por cadena
+            ends = np.cumsum([len(s.encode("utf-8")) + 1 for s in new], dtype=np.int64) - 1
+        starts = np.empty(len(new), dtype=np.int64)
+        starts[0] = 0
+        starts[1:] = ends[:-1] + 1
+        self._starts = np.concatenate([self._starts, starts + len(self._text)])
+        self._text = np.concatenate([self._text, chunk])
+        self._byte_counts += np.bincount(chunk, minlength=256)
+        self._indexed = len(self.strings)
+
+    def contains(self, term: str):
+        """Como matching(lambda s: like_contains(s, term)), sin recorrer las cadenas en Python."""
+        if np is None or "\0" in term:
+            return self.matching(lambda s: like_contains(s, term))
+        self.index_text()
+        hits = np.zeros(len(self.strings) + 1, dtype=bool)
+        needle = term.encode("utf-8").translate(_ASCII_FOLD)
+        if not needle:
+            hits[:-1] = True
+            return hits
+        text, size = self._text, len(needle)
+        if size == 1:
+            hits[:-1] = np.logical_or.reduceat(text == needle[0], self._starts)
+            return hits
+        # Se parte de las apariciones del par de bytes menos frecuente del término (con
+        # los bytes vistos de a dos, en posiciones pares e impares) y se descartan las que
+        # no siguen con el resto; el \0 separador impide coincidencias entre dos cadenas
+        counts = self._byte_counts
+        anchor = min(range(size - 1), key=lambda j: int(counts[needle[j]]) * int(counts[needle[j + 1]]))
+        pair = needle[anchor] | (needle[anchor + 1] << 8)
+        even = text[:len(text) // 2 * 2].view("<u2")
+        odd = text[1:1 + (len(text) - 1) // 2 * 2].view("<u2")
+        found = np.concatenate([np.flatnonzero(even == pair) * 2, np.flatnonzero(odd == pair) * 2 + 1]) - anchor
+        found = found[(found >= 0) & (found <= len(text) - size)]
+        for j in range(size):
+            if j not in (anchor, anchor + 1) and len(found):
+                found = found[text[found + j] == needle[j]]
+        hits[np.searchsorted(self._starts, found, side="right") - 1] = True
+        return hits
+
+
+class CodesSnapshot:
+    """Instantánea por columnas de codes.
+
+    query() retorna posiciones (filas de la instantánea) ya filtradas y ordenadas;
+    row(pos) materializa una fila como dict con las mismas claves que list_codes.
+    Las posiciones siguen el orden por id. query() y sync() pueden llamarse desde
+    otro hilo (toman un candado); row() lee los arreglos vigentes sin tomarlo, así
+    que la interfaz sincroniza en su hilo y en el pool solo consulta (sync=False).
+    """
+
+    def __init__(self, repo: CodeRepository) -> None:
+        self.repo = repo
+        self.version = 0
+        self.codes = StringPool()
+        self.prefixes = StringPool()
+        self.descriptions = StringPool()
+        self.images = StringPool()
+        self.status_names: List[str] = list(ALL_STATUSES)
+        self._status_index = {name: i for i, name in enumerate(self.status_names)}
+        self._orders: Dict[str, Any] = {}
+        self._search_cache: Dict[str, Any] = {}
+        self._lock = threading.RLock()
+        self.load()
+
+    # ------------------------------------------------------------------ carga
+
+    def load(self) -> None:
+        with self._lock:
+            # Solo lo confirmado (como changes_since): la interfaz superpone lo que siga en la cola
+            self.version = self.repo.change_version()
+            with self.repo.reader() as conn:
+                cur = conn.cursor()
+                cur.row_factory = None
+                cur.execute(f"SELECT {_COLUMNS}, prefix, number FROM codes ORDER BY id")
+                rows = cur.fetchall()
+            self._build(rows)
+            # Lo que pagaría la primera consulta de cada tipo se paga acá
+            self.codes.index_text()
+            self.descriptions.index_text()
+            for order_by in PREWARM_ORDERS:
+                self._order(order_by)
+
+    def _status_code(self, status: Optional[str]) -> int:
+        idx = self._status_index.get(status)
+        if idx is None:
+            idx = len(self.status_names)
+            self.status_names.append(status)
+            self._status_index[status] = idx
+        return idx
+
+    def _columns(self, rows: List[tuple]) -> Dict[str, Any]:
+        """Columnas de filas (_COLUMNS, prefix, number) ordenadas por id."""
+        columns = {
+            "ids": [r[0] for r in rows],
+            "code_idx": [self.codes.intern(r[1]) for r in rows],
+            "created": [r[2] for r in rows],
+            "annotated": [1 if r[3] else 0 for r in rows],
+            "duplicate": [1 if r[4] else 0 for r in rows],
+            "status": [self._status_code(r[5]) for r in rows],
+            "image_idx": [self.images.intern(r[6]) for r in rows],
+            "desc_idx": [self.descriptions.intern(r[7]) for r in rows],
+            "stock_per_box": [NULL_INT if r[8] is None else r[8] for r in rows],
+            "stock_boxes": [NULL_INT if r[9] is None else r[9] for r in rows],
+            "stock_remaining": [NULL_INT if r[10] is None else r[10] for r in rows],
+            "prefix_idx": [self.prefixes.intern(r[11]) for r in rows],
+            "number": [-1 if r[12] is None else r[12] for r in rows],  # -1: NULL ordena primero
+        }
+        if np is not None:
+            arrays = {name: np.array(values, dtype=np.uint8 if name in _BYTE_COLUMNS else np.int64)
+                      for name, values in columns.items()}
+            arrays["alive"] = np.ones(len(rows), dtype=bool)
+        else:
+            arrays = {name: array("B" if name in _BYTE_COLUMNS else "q", values) for name, values in columns.items()}
+            arrays["alive"] = array("B", [1]) * len(rows)
+        return arrays
+
+    def _build(self, rows: List[tuple]) -> None:
+        for name, values in self._columns(rows).items():
+            setattr(self, name, values)
+        self._orders.clear()
+        self._search_cache.clear()
+
+    def __len__(self) -> int:
+        return int(np.count_nonzero(self.alive)) if np is not None else sum(self.alive)
+
+    # -------------------------------------------------------- sincronización
+
+    def sync(self, before_apply: Optional[Callable[[List[int]], None]] = None) -> Optional[List[int]]:
+        """Aplica los cambios confirmados desde la última sincronización.
+
+        Retorna los ids que cambiaron ([] si no hubo cambios), o None si las
+        posiciones se renumeraron (recarga completa, o filas restauradas del archivo
+        que vuelven con su id original): ahí los resultados anteriores ya no valen.
+        before_apply(ids) se llama antes de tocar las filas, p. ej. para leer los
+        valores anteriores de las que se muestran.
+        """
+        with self._lock:
+            changes = self.repo.changes_since(self.version)
+            if changes is None:
+                self.load()
+                return None
+            if not changes:
+                return []
+            latest = {}
+            for change in changes:
+                latest[change["row_id"]] = change["op"]
+            if before_apply is not None:
+                before_apply(list(latest))
+            fresh = self.repo.get_codes_by_ids([row_id for row_id, op in latest.items() if op != "D"])
+            touched: List[int] = []
+            appended = []
+            for row_id in latest:
+                pos = self._find(row_id)
+                row = fresh.get(row_id)
+                if row is None:
+                    if pos is not None and self.alive[pos]:
+                        self.alive[pos] = False
+                        touched.append(pos)
+                elif pos is None:
+                    appended.append(tuple(row) + split_code(row["code"]))
+                else:
+                    self._set_row(pos, row)
+                    touched.append(pos)
+            self.version = changes[-1]["version"]
+            first_new = len(self.ids)
+            if appended and self._append(sorted(appended)):
+                self._orders.clear()
+                self._search_cache.clear()
+                return None
+            self._patch_caches(touched + list(range(first_new, len(self.ids))))
+            return list(latest)
+
+    def _find(self, row_id: int) -> Optional[int]:
+        """Posición del id, viva o borrada (None si nunca estuvo)."""
+        pos = int(np.searchsorted(self.ids, row_id)) if np is not None else bisect_left(self.ids, row_id)
+        if pos < len(self.ids) and self.ids[pos] == row_id:
+            return pos
+        return None
+
+    def _position(self, row_id: int) -> Optional[int]:
+        pos = self._find(row_id)
+        return pos if pos is not None and self.alive[pos] else None
+
+    def _set_row(self, pos: int, row) -> None:
+        self.code_idx[pos] = self.codes.intern(row["code"])
+        self.created[pos] = row["created_at"]
+        self.annotated[pos] = 1 if row["annotated"] else 0
+        self.duplicate[pos] = 1 if row["duplicate"] else 0
+        self.status[pos] = self._status_code(row["status"])
+        self.image_idx[pos] = self.images.intern(row["image_path"])
+        self.desc_idx[pos] = self.descriptions.intern(row["description"])
+        for column in ("stock_per_box", "stock_boxes", "stock_remaining"):
+            value = row[column]
+            getattr(self, column)[pos] = NULL_INT if value is None else value
+        prefix, number = split_code(row["code"])
+        self.prefix_idx[pos] = self.prefixes.intern(prefix)
+        self.number[pos] = -1 if number is None else number
+        self.alive[pos] = True  # también revive filas archivadas y restauradas
+
+    def _append(self, rows: List[tuple]) -> bool:
+        """Agrega filas nuevas (ordenadas por id) manteniendo las posiciones en orden de id.
+
+        Los ids de AUTOINCREMENT crecen y van al final, pero una fila restaurada del
+        archivo vuelve con su id original y va en el medio. Retorna True en ese caso:
+        las posiciones siguientes se corrieron.
+        """
+        extra = self._columns(rows)
+        if not len(self.ids) or rows[0][0] > self.ids[-1]:
+            for name, values in extra.items():
+                head = getattr(self, name)
+                setattr(self, name, np.concatenate([head, values]) if np is not None else head + values)
+            return False
+        if np is not None:
+            at = np.searchsorted(self.ids, extra["ids"])
+            for name, values in extra.items():
+                setattr(self, name, np.insert(getattr(self, name), at, values))
+        else:
+            for i in reversed(range(len(rows))):
+                at = bisect_left(self.ids, rows[i][0])
+                for name, values in extra.items():
+                    getattr(self, name)[at:at] = values[i:i + 1]
+        return True
+
+    def _patch_caches(self, positions: List[int]) -> None:
+        """Corrige órdenes y búsquedas guardados para las filas `positions`
+        (modificadas, borradas o agregadas al final)."""
+        if not positions:
+            return
+        if np is None or len(positions) > PATCH_MAX_ROWS:
+            self._orders.clear()
+            self._search_cache.clear()
+            return
+        n = len(self.ids)
+        changed = np.array(positions, dtype=np.int64)
+        for search, mask in list(self._search_cache.items()):
+            if len(mask) < n:
+                mask = np.concatenate([mask, np.zeros(n - len(mask), dtype=bool)])
+            mask[changed] = self._search_rows(search, positions)
+            self._search_cache[search] = mask
+        if not self._orders:
+            return
+        stale = np.zeros(n, dtype=bool)
+        stale[changed] = True
+        alive = [pos for pos in positions if self.alive[pos]]
+        for order_by, order in list(self._orders.items()):
+            # Se sacan las filas cambiadas y las vivas se reinsertan en su lugar
+            key = self._order_key(order_by)
+            rest = order[~stale[order]]
+            moved = sorted(alive, key=key)
+            if len(moved) < VECTOR_PATCH_ROWS:
+                at = [self._insert_point(rest, key, 0, len(rest), key(pos)) for pos in moved]
+            else:
+                at = self._insert_points(order_by, rest, moved)
+            self._orders[order_by] = np.insert(rest, at, np.array(moved, dtype=np.int64))
+
+    def _insert_points(self, order_by: str, rest, moved: List[int]) -> List[int]:
+        """Lugar en `rest` de cada posición de `moved`: las columnas numéricas de la clave
+        se buscan juntas (np.searchsorted sobre un arreglo estructurado) y solo los
+        empates entre ellas se resuelven con el resto de la clave."""
+        if order_by == "code":
+            columns = [self.prefixes.ranks()[self.prefix_idx], self.number]
+            key = self._order_key("code")
+        else:
+            if order_by == "status":
+                columns = [self._status_ranks()[self.status]]
+            else:
+                columns = [getattr(self, order_by) if order_by in ("annotated", "duplicate") else self.created]
+            key = None  # entre empates `rest` ya está en orden de posición
+        dtype = np.dtype([(f"k{i}", np.int64) for i in range(len(columns))])
+        sorted_keys = np.empty(len(rest), dtype=dtype)
+        moved_keys = np.empty(len(moved), dtype=dtype)
+        moved_positions = np.array(moved, dtype=np.int64)
+        for i, column in enumerate(columns):
+            sorted_keys[f"k{i}"] = column[rest]
+            moved_keys[f"k{i}"] = column[moved_positions]
+        lows = np.searchsorted(sorted_keys, moved_keys, "left").tolist()
+        highs = np.searchsorted(sorted_keys, moved_keys, "right").tolist()
+        points = []
+        for pos, lo, hi in zip(moved, lows, highs):
+            if key is None:
+                points.append(lo + int(np.searchsorted(rest[lo:hi], pos)))
+            else:
+                points.append(self._insert_point(rest, key, lo, hi, key(pos)))
+        return points
+
+    @staticmethod
+    def _insert_point(order, key: Callable, lo: int, hi: int, value) -> int:
+        """Búsqueda binaria de `value` entre order[lo:hi], comparando key(posición)."""
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if key(int(order[mid])) < value:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    # --------------------------------------------------------------- consulta
+
+    def _order(self, order_by: str):
+        """Posiciones en orden ascendente por `order_by` (empates por id, como list_codes)."""
+        order = self._orders.get(order_by)
+        if order is not None:
+            return order
+        if np is None:
+            order = array("q", sorted(range(len(self.ids)), key=self._order_key(order_by)))
+        elif order_by == "code":
+            order = self._code_order()
+        else:
+            # Las posiciones ya están ordenadas por id: un argsort estable desempata por id
+            if order_by == "status":
+                key = self._status_ranks()[self.status]
+            else:
+                key = getattr(self, order_by) if order_by in ("annotated", "duplicate") else self.created
+            order = np.argsort(key, kind="stable")
+        self._orders[order_by] = order
+        return order
+
+    def _code_order(self):
+        """Orden natural (prefix, number, code) sin comparar cadenas en Python."""
+        prefix_rank = self.prefixes.ranks()[self.prefix_idx]
+        order = np.lexsort((self.number, prefix_rank))  # estable: los empates quedan por id
+        # Mismo prefijo y número con códigos distintos ('CQ012' y 'CQ12'): esos pocos
+        # grupos se terminan de ordenar por código
+        prefix_rank, number, code_idx = prefix_rank[order], self.number[order], self.code_idx[order]
+        same = (prefix_rank[1:] == prefix_rank[:-1]) & (number[1:] == number[:-1])
+        mixed = np.flatnonzero(same & (code_idx[1:] != code_idx[:-1]))
+        if len(mixed):
+            starts = np.flatnonzero(np.concatenate(([True], ~same)))
+            ends = np.append(starts[1:], len(order))
+            key = self._order_key("code")
+            for group in np.unique(np.searchsorted(starts, mixed, side="right") - 1):
+                start, end = starts[group], ends[group]
+                order[start:end] = sorted(order[start:end].tolist(), key=key)
+        return order
+
+    def _order_key(self, order_by: str) -> Callable[[int], tuple]:
+        """Clave de una posición con el mismo criterio que _order (la posición desempata)."""
+        if order_by == "code":
+            ranks, strings = self.prefixes.ranks(), self.codes.strings
+            return lambda pos: (ranks[self.prefix_idx[pos]], self.number[pos], strings[self.code_idx[pos]], pos)
+        if order_by == "status":
+            status_ranks = self._status_ranks()
+            return lambda pos: (status_ranks[self.status[pos]], pos)
+        column = getattr(self, order_by) if order_by in ("annotated", "duplicate") else self.created
+        return lambda pos: (column[pos], pos)
+
+    def _status_ranks(self):
+        ranks = [0] * len(self.status_names)
+        for rank, code in enumerate(sorted(range(len(self.status_names)), key=self._status_sort_key)):
+            ranks[code] = rank
+        return np.array(ranks, dtype=np.int64) if np is not None else ranks
+
+    def _status_sort_key(self, code: int):
+        name = self.status_names[code]
+        return (name is not None, name or "")
+
+    def _search_mask(self, search: str):
+        mask = self._search_cache.pop(search, None)
+        if mask is None:
+            code_range = parse_code_range(search)
+            if code_range is not None and np is not None:
+                prefix, low, high = self.prefixes.find(code_range[0]), code_range[1], code_range[2]
+                mask = (self.prefix_idx == prefix) & (self.number >= low) & (self.number <= high) & (prefix >= 0)
+            elif code_range is not None:
+                mask = self._search_rows(search, range(len(self.ids)))
+            else:
+                code_hits = self.codes.contains(search.upper())
+                desc_hits = self.descriptions.contains(search)
+                if np is not None:
+                    mask = code_hits[self.code_idx] | desc_hits[self.desc_idx]
+                else:
+                    mask = [code_hits[c] or desc_hits[d] for c, d in zip(self.code_idx, self.desc_idx)]
+        # La más reciente queda al final: se descartan primero las más viejas
+        self._search_cache[search] = mask
+        while len(self._search_cache) > SEARCH_CACHE_SIZE:
+            del self._search_cache[next(iter(self._search_cache))]
+        return mask
+
+    def _search_rows(self, search: str, positions) -> List[bool]:
+        """_search_mask evaluada fila por fila en `positions`."""
+        code_range = parse_code_range(search)
+        if code_range is not None:
+            prefix, low, high = self.prefixes.find(code_range[0]), code_range[1], code_range[2]
+            return [prefix >= 0 and self.prefix_idx[pos] == prefix and low <= self.number[pos] <= high
+                    for pos in positions]
+        code_term = search.upper()
+        return [like_contains(self.codes.get(int(self.code_idx[pos])), code_term)
+                or like_contains(self.descriptions.get(int(self.desc_idx[pos])), search) for pos in positions]
+
+    def query(self, annotated: Optional[bool] = None, duplicates_only: Optional[bool] = None,
+              search: Optional[str] = None, status: Optional[str] = None,
+              order_by: str = "created_at", order_dir: str = "DESC",
+              created_from: Optional[int] = None, created_to: Optional[int] = None, sync: bool = True):
+        """Mismos filtros y orden que CodeRepository.list_codes; retorna posiciones.
+        Con sync=False consulta la instantánea tal como está (ver self.version)."""
+        with self._lock:
+            if sync:
+                self.sync()
+            return self._query(annotated, duplicates_only, search, status, order_by, order_dir, created_from, created_to)
+
+    def _query(self, annotated, duplicates_only, search, status, order_by, order_dir, created_from, created_to):
+        if order_by not in {"created_at", "code", "annotated", "duplicate", "status"}:
+            order_by = "created_at"
+        order = self._order(order_by)
+        if np is not None:
+            mask = self.alive.copy()
+            if annotated is not None:
+                mask &= self.annotated == (1 if annotated else 0)
+            if duplicates_only:
+                mask &= self.duplicate == 1
+            if status:
+                code = self._status_index.get(status)
+                if code is None:
+                    return np.empty(0, dtype=np.int64)
+                mask &= self.status == code
+            if search:
+                mask &= self._search_mask(search)
+            if created_from is not None:
+                mask &= self.created >= created_from
+            if created_to is not None:
+                mask &= self.created < created_to
+            result = order[mask[order]]
+            return result[::-1] if order_dir.upper() != "ASC" else result
+        status_code = self._status_index.get(status, -1) if status else None
+        search_mask = self._search_mask(search) if search else None
+
+        def keep(pos: int) -> bool:
+            if not self.alive[pos]:
+                return False
+            if annotated is not None and self.annotated[pos] != (1 if annotated else 0):
+                return False
+            if duplicates_only and not self.duplicate[pos]:
+                return False
+            if status_code is not None and self.status[pos] != status_code:
+                return False
+            if created_from is not None and self.created[pos] < created_from:
+                return False
+            if created_to is not None and self.created[pos] >= created_to:
+                return False
+            return search_mask is None or search_mask[pos]
+
+        result = [pos for pos in order if keep(pos)]
+        if order_dir.upper() != "ASC":
+            result.reverse()
+        return result
+
+    def row(self, pos: int) -> Dict[str, Any]:
+        """Materializa una fila con las mismas claves que list_codes."""
+        pos = int(pos)
+
+        def stock(column) -> Optional[int]:
+            value = int(column[pos])
+            return None if value == NULL_INT else value
+
+        return {
+            "id": int(self.ids[pos]),
+            "code": self.codes.get(int(self.code_idx[pos])),
+            "created_at": int(self.created[pos]),
+            "annotated": int(self.annotated[pos]),
+            "duplicate": int(self.duplicate[pos]),
+            "status": self.status_names[int(self.status[pos])],
+            "image_path": self.images.get(int(self.image_idx[pos])),
+            "description": self.descriptions.get(int(self.desc_idx[pos])),
+            "stock_per_box": stock(self.stock_per_box),
+            "stock_boxes": stock(self.stock_boxes),
+            "stock_remaining": stock(self.stock_remaining),
+        }
+
+    def get(self, row_id: int) -> Optional[Dict[str, Any]]:
+        """La fila con ese id como row(), o None si no está (borrada o archivada)."""
+        pos = self._position(row_id)
+        return self.row(pos) if pos is not None else None
+
+    def rows(self, positions) -> "SnapshotRows":
+        return SnapshotRows(self, positions)
+
+
+class SnapshotRows(Sequence):
+    """Vista perezosa de un resultado de query(): las filas se materializan al leerlas."""
+
+    def __init__(self, snapshot: CodesSnapshot, positions) -> None:
+        self.snapshot = snapshot
+        self.positions = positions
+
+    def __len__(self) -> int:
+        return len(self.positions)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self.snapshot.row(p) for p in self.positions[i]]
+        return self.snapshot.row(self.positions[i])
+
+    def insert(self, i: int, row_id: int) -> None:
+        """Agrega la fila con ese id en el índice i (deltas de la interfaz)."""
+        pos = self.snapshot._find(row_id)
+        if np is not None and isinstance(self.positions, np.ndarray):
+            self.positions = np.insert(self.positions, i, pos)
+        else:
+            self.positions = list(self.positions)
+            self.positions.insert(i, pos)
+
+    def delete(self, i: int) -> None:
+        """Quita la fila del índice i (deltas de la interfaz)."""
+        if np is not None and isinstance(self.positions, np.ndarray):
+            self.positions = np.delete(self.positions, i)
+        else:
+            self.positions = list(self.positions)
+            del self.positions[i]
+
+    def index_of(self, row_id: int) -> Optional[int]:
+        """Índice en este resultado de la fila con ese id, o None si no está. Una fila
+        que la instantánea ya dio por borrada se encuentra igual, para poder quitarla."""
+        pos = self.snapshot._find(row_id)
+        if pos is None:
+            return None
+        if np is not None and isinstance(self.positions, np.ndarray):
+            found = np.flatnonzero(self.positions == pos)
+            return int(found[0]) if len(found) else None
+        try:
+            return list(self.positions).index(pos)
+        except ValueError:
+            return None
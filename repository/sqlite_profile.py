@@ -0,0 +1,85 @@
+import sqlite3
+from typing import Any, Dict, NamedTuple
+
+
+class SQLiteProfile(NamedTuple):
+    """Parámetros de conexión aplicados con PRAGMA al abrir la base de datos.
+
+    - journal_mode: 'wal' permite lecturas concurrentes mientras se escribe
+    - synchronous: 'normal' en WAL evita un fsync por commit (solo en checkpoint)
+    - mmap_size: bytes de la base mapeados en memoria para lecturas (0 = desactivado)
+    - cache_size: páginas en caché; negativo = tamaño en KiB
+    - temp_store: 'memory' para tablas temporales y ordenamientos
+    - busy_timeout: ms de espera si otra conexión tiene el lock de escritura
+    """
+    journal_mode: str = "wal"
+    synchronous: str = "normal"
+    mmap_size: int = 256 * 1024 * 1024
+    cache_size: int = -64000
+    temp_store: str = "memory"
+    busy_timeout: int = 5000
+
+
+# Perfil recomendado para la aplicación
+DEFAULT_PROFILE = SQLiteProfile()
+
+# Valores por defecto de sqlite3.connect (comportamiento anterior, útil para comparar)
+LEGACY_PROFILE = SQLiteProfile(
+    journal_mode="delete",
+    synchronous="full",
+    mmap_size=0,
+    cache_size=-2000,
+    temp_store="default",
+    busy_timeout=0,
+)
+
+_JOURNAL_MODES = {"delete", "truncate", "persist", "memory", "wal", "off"}
+_SYNCHRONOUS = {"off", "normal", "full", "extra"}
+_TEMP_STORE = {"default", "file", "memory"}
+
+
+def apply_profile(conn: sqlite3.Connection, profile: SQLiteProfile = DEFAULT_PROFILE, read_only: bool = False) -> None:
+    """Aplica el perfil a una conexión recién abierta (fuera de transacción).
+    Con read_only se omiten journal_mode y synchronous, que solo importan al escribir
+    (una conexión `mode=ro` no puede cambiar el modo del journal)."""
+    journal_mode = profile.journal_mode.lower()
+    synchronous = profile.synchronous.lower()
+    temp_store = profile.temp_store.lower()
+    if journal_mode not in _JOURNAL_MODES:
+        raise ValueError(f"journal_mode inválido: {profile.journal_mode}")
+    if synchronous not in _SYNCHRONOUS:
+        raise ValueError(f"synchronous inválido: {profile.synchronous}")
+    if temp_store not in _TEMP_STORE:
+        raise ValueError(f"temp_store inválido: {profile.temp_store}")
+    # busy_timeout primero: cambiar journal_mode necesita un lock exclusivo
+    conn.execute(f"PRAGMA busy_timeout = {int(profile.busy_timeout)}")
+    if not read_only:
+        conn.execute(f"PRAGMA journal_mode = {journal_mode}")
+        conn.execute(f"PRAGMA synchronous = {synchronous}")
+    conn.execute(f"PRAGMA mmap_size = {int(profile.mmap_size)}")
+    conn.execute(f"PRAGMA cache_size = {int(profile.cache_size)}")
+    conn.execute(f"PRAGMA temp_store = {temp_store}")
+
+
+_SYNCHRONOUS_NAMES = {0: "off", 1: "normal", 2: "full", 3: "extra"}
+_TEMP_STORE_NAMES = {0: "default", 1: "file", 2: "memory"}
+
+
+def read_pragmas(conn: sqlite3.Connection) -> Dict[str, Any]:
+    """Lee los valores efectivos de la conexión (para diagnóstico)."""
+    def pragma(name: str) -> Any:
+        row = conn.execute(f"PRAGMA {name}").fetchone()
+        return row[0] if row else None
+
+    return {
+        "journal_mode": pragma("journal_mode"),
+        "synchronous": _SYNCHRONOUS_NAMES.get(pragma("synchronous"), pragma("synchronous")),
+        "mmap_size": pragma("mmap_size"),
+        "cache_size": pragma("cache_size"),
+        "temp_store": _TEMP_STORE_NAMES.get(pragma("temp_store"), pragma("temp_store")),
+        "busy_timeout": pragma("busy_timeout"),
+        "page_size": pragma("page_size"),
+        "page_count": pragma("page_count"),
+        "freelist_count": pragma("freelist_count"),
+        "user_version": pragma("user_version"),
+    }
@@ -0,0 +1,293 @@
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Set, Union
+
+from repository.sqlite_profile import SQLiteProfile, DEFAULT_PROFILE, apply_profile
+
+log = logging.getLogger(__name__)
+
+
+class _Deleted:
+    """Marca de fila borrada en la cola (singleton DELETED)."""
+    def __repr__(self) -> str:
+        return "DELETED"
+
+
+DELETED = _Deleted()
+
+# Columnas que la cola puede escribir (las demás pasan por el camino síncrono)
+WRITABLE_COLUMNS = {"annotated", "status", "image_path", "stock_per_box", "stock_boxes", "stock_remaining"}
+
+Change = Union[Dict[str, Any], _Deleted]
+
+
+class WriteBehindTimeout(sqlite3.OperationalError):
+    """La barrera no vio confirmada la cola a tiempo (p. ej. la base sigue bloqueada)."""
+
+
+def apply_batch(conn: sqlite3.Connection, batch: Dict[int, Change]) -> List[str]:
+    """Escribe un lote ya fusionado {id: campos | DELETED} (sin commit).
+    Retorna los códigos de las filas borradas."""
+    deleted: List[str] = []
+    for code_id, change in batch.items():
+        if change is DELETED:
+            row = conn.execute("SELECT code FROM codes WHERE id = ?", (code_id,)).fetchone()
+            if row is not None:
+                conn.execute("DELETE FROM codes WHERE id = ?", (code_id,))
+                deleted.append(row[0])
+            continue
+        columns = [c for c in change if c in WRITABLE_COLUMNS]
+        if not columns:
+            continue
+        assignments = ", ".join(f"{c} = ?" for c in columns)
+        conn.execute(f"UPDATE codes SET {assignments} WHERE id = ?", [change[c] for c in columns] + [code_id])
+    return deleted
+
+
+class WriteBehindQueue:
+    """Cola de escritura diferida con un hilo escritor dedicado.
+
+    Las mutaciones se fusionan por fila (la última escritura de cada columna gana,
+    un borrado reemplaza todo) y el hilo las confirma en transacciones pequeñas
+    cada flush_interval_ms o al acumular max_batch_ops operaciones.
+
+    - pending(code_id) permite leer lo propio antes del commit (read-your-writes)
+    - flush() es una barrera: espera a que todo lo encolado antes esté confirmado
+    - metrics() expone contadores de durabilidad (pendientes, antigüedad, lotes)
+
+    Un lote que falla vuelve a la cola y se reintenta; tras max_retries fallos
+    seguidos se descarta (base bloqueada, restricción violada, disco lleno) para no
+    trabar las barreras: queda en metrics() como dropped_rows y last_error.
+    """
+
+    def __init__(self, db_path: Path, profile: SQLiteProfile = DEFAULT_PROFILE,
+                 flush_interval_ms: int = 200, max_batch_ops: int = 50,
+                 after_batch: Optional[Callable[[sqlite3.Connection, Dict[int, Change], List[str]], None]] = None,
+                 max_retries: int = 5) -> None:
+        self.db_path = Path(db_path)
+        self.profile = profile
+        self.flush_interval = flush_interval_ms / 1000.0
+        self.max_batch_ops = max_batch_ops
+        self.after_batch = after_batch
+        self.max_retries = max_retries
+        self._failures = 0              # fallos seguidos del lote que se está reintentando
+        self._cond = threading.Condition()
+        self._pending: Dict[int, Change] = {}
+        self._inflight: Dict[int, Change] = {}
+        self._pending_ops = 0
+        self._first_pending_at: Optional[float] = None
+        self._enqueued_seq = 0
+        self._committed_seq = 0
+        self._flush_requested = False
+        self._closing = False
+        self._metrics = {
+            "enqueued": 0,
+            "coalesced": 0,
+            "committed_rows": 0,
+            "batches": 0,
+            "flushes": 0,
+            "errors": 0,
+            "dropped_batches": 0,
+            "dropped_rows": 0,
+            "last_batch_ms": 0.0,
+            "max_batch_ms": 0.0,
+            "max_lag_ms": 0.0,
+        }
+        self._last_error: Optional[str] = None
+        self._last_commit_at: Optional[float] = None
+        self._thread = threading.Thread(target=self._run, name="CodeTraceWriter", daemon=True)
+        self._thread.start()
+
+    # ------------------------------------------------------------------ cola
+
+    def enqueue_update(self, code_id: int, fields: Dict[str, Any]) -> None:
+        unknown = set(fields) - WRITABLE_COLUMNS
+        if unknown:
+            raise ValueError(f"Columnas no soportadas por la cola: {sorted(unknown)}")
+        with self._cond:
+            current = self._pending.get(code_id)
+            if current is DELETED:
+                return  # la fila ya se va a borrar
+            if current is None:
+                self._pending[code_id] = dict(fields)
+            else:
+                current.update(fields)
+                self._metrics["coalesced"] += 1
+            self._mark_enqueued()
+
+    def enqueue_delete(self, code_id: int) -> None:
+        with self._cond:
+            if code_id in self._pending:
+                self._metrics["coalesced"] += 1
+            self._pending[code_id] = DELETED
+            self._mark_enqueued()
+
+    def _mark_enqueued(self) -> None:
+        self._enqueued_seq += 1
+        self._pending_ops += 1
+        self._metrics["enqueued"] += 1
+        if self._first_pending_at is None:
+            self._first_pending_at = time.monotonic()
+        self._cond.notify_all()
+
+    def pending(self, code_id: int) -> Optional[Change]:
+        """Cambios aún no confirmados de una fila (fusionando el lote en curso)."""
+        with self._cond:
+            newer = self._pending.get(code_id)
+            older = self._inflight.get(code_id)
+        if newer is DELETED or (older is DELETED and newer is None):
+            return DELETED
+        if older is None or older is DELETED:
+            return dict(newer) if newer is not None else None
+        merged = dict(older)
+        if newer is not None:
+            merged.update(newer)
+        return merged
+
+    def pending_ids(self) -> Set[int]:
+        """Ids con cambios sin confirmar (encolados o en el lote en curso)."""
+        with self._cond:
+            return set(self._pending) | set(self._inflight)
+
+    def has_pending(self) -> bool:
+        with self._cond:
+            return bool(self._pending or self._inflight)
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Barrera: espera a que se confirme (o se descarte, ver max_retries) todo lo
+        encolado hasta ahora. Retorna False si se agotó el timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            target = self._enqueued_seq
+            if self._committed_seq >= target:
+                return True
+            self._metrics["flushes"] += 1
+            self._flush_requested = True
+            self._cond.notify_all()
+            while self._committed_seq < target:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def close(self, timeout: Optional[float] = None) -> None:
+        """Confirma lo pendiente y detiene el hilo escritor."""
+        with self._cond:
+            self._closing = True
+            self._cond.notify_all()
+        self._thread.join(timeout)
+
+    def metrics(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        with self._cond:
+            data = dict(self._metrics)
+            data["pending_rows"] = len(self._pending) + len(self._inflight)
+            data["pending_ops"] = self._pending_ops
+            data["oldest_pending_ms"] = (now - self._first_pending_at) * 1000 if self._first_pending_at else 0.0
+            data["since_last_commit_ms"] = (now - self._last_commit_at) * 1000 if self._last_commit_at else None
+            data["last_error"] = self._last_error
+        return data
+
+    # --------------------------------------------------------------- escritor
+
+    def _take_batch(self):
+        """Espera hasta que haya un lote listo; retorna (lote, seq, antigüedad) o None al cerrar."""
+        with self._cond:
+            while True:
+                if self._pending:
+                    age = time.monotonic() - self._first_pending_at
+                    if (self._closing or self._flush_requested or age >= self.flush_interval
+                            or self._pending_ops >= self.max_batch_ops):
+                        break
+                    self._cond.wait(self.flush_interval - age)
+                elif self._closing:
+                    return None
+                else:
+                    self._flush_requested = False
+                    self._cond.wait()
+            batch, self._pending = self._pending, {}
+            self._inflight = batch
+            seq = self._enqueued_seq
+            self._pending_ops = 0
+            self._first_pending_at = None
+            self._flush_requested = False
+            return batch, seq, age
+
+    def _run(self) -> None:
+        conn = sqlite3.connect(str(self.db_path))
+        try:
+            apply_profile(conn, self.profile)
+            while True:
+                taken = self._take_batch()
+                if taken is None:
+                    break
+                batch, seq, age = taken
+                start = time.perf_counter()
+                try:
+                    conn.execute("BEGIN IMMEDIATE")
+                    deleted = apply_batch(conn, batch)
+                    if self.after_batch is not None:
+                        self.after_batch(conn, batch, deleted)
+                    conn.commit()
+                except Exception as e:
+                    conn.rollback()
+                    self._failures += 1
+                    if self._failures >= self.max_retries:
+                        self._drop(batch, seq, e)
+                        continue
+                    self._requeue(batch, e)
+                    if self._closing:
+                        log.error("Se descartan %d filas pendientes al cerrar", len(self._pending))
+                        break
+                    time.sleep(self.flush_interval)
+                    continue
+                elapsed = (time.perf_counter() - start) * 1000
+                self._failures = 0
+                with self._cond:
+                    self._inflight = {}
+                    self._committed_seq = max(self._committed_seq, seq)
+                    self._last_commit_at = time.monotonic()
+                    self._metrics["batches"] += 1
+                    self._metrics["committed_rows"] += len(batch)
+                    self._metrics["last_batch_ms"] = elapsed
+                    self._metrics["max_batch_ms"] = max(self._metrics["max_batch_ms"], elapsed)
+                    self._metrics["max_lag_ms"] = max(self._metrics["max_lag_ms"], age * 1000 + elapsed)
+                    self._cond.notify_all()
+        finally:
+            conn.close()
+
+    def _drop(self, batch: Dict[int, Change], seq: int, error: Exception) -> None:
+        """Descarta un lote que falló max_retries veces seguidas y libera a las barreras."""
+        log.error("Se descartan %d filas tras %d intentos fallidos: %s", len(batch), self._failures, error)
+        self._failures = 0
+        with self._cond:
+            self._metrics["errors"] += 1
+            self._metrics["dropped_batches"] += 1
+            self._metrics["dropped_rows"] += len(batch)
+            self._last_error = str(error)
+            self._inflight = {}
+            self._committed_seq = max(self._committed_seq, seq)
+            self._cond.notify_all()
+
+    def _requeue(self, batch: Dict[int, Change], error: Exception) -> None:
+        """Devuelve un lote fallido a la cola sin pisar cambios más nuevos."""
+        log.warning("Fallo al confirmar lote de escritura diferida: %s", error)
+        with self._cond:
+            self._metrics["errors"] += 1
+            self._last_error = str(error)
+            for code_id, change in batch.items():
+                newer = self._pending.get(code_id)
+                if newer is None:
+                    self._pending[code_id] = change
+                elif newer is not DELETED and change is not DELETED:
+                    merged = dict(change)
+                    merged.update(newer)
+                    self._pending[code_id] = merged
+            self._inflight = {}
+            self._pending_ops += len(batch)
+            if self._first_pending_at is None:
+                self._first_pending_at = time.monotonic()
@@ -0,0 +1,62 @@
+"""Mide la latencia del autocompletado (search_codes_prefix) por pulsación.
+
+Simula escribir varios términos letra por letra (desde 2 caracteres, como
+AutocompleteSearchEdit) y compara la consulta anterior con LIKE contra la
+actual (rango sobre idx_codes_code + índice de trigramas). Objetivo: < 5 ms.
+
+Uso (desde la raíz del proyecto):
+    python -m tools.bench_autocomplete [--rows 1000000]
+"""
+import argparse
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from repository.db_querys import CodeRepository
+from tools.synthetic import populate
+
+TARGET_MS = 5.0
+TERMS = ("CQ1234", "TY9", "BST50", "Producto 12", "ducto 49", "zzz")
+
+# Consulta de search_codes_prefix antes del índice de texto
+LEGACY_SQL = """SELECT DISTINCT code, status, description FROM codes
+                WHERE code LIKE ? OR description LIKE ?
+                ORDER BY code LIMIT ?"""
+
+
+def _keystrokes(term: str):
+    return [term[:n] for n in range(2, len(term) + 1)]
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1000000)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        repo = CodeRepository(Path(tmp) / "autocomplete.db", cache_entries=0)
+        populate(repo, args.rows)
+        print(f"índice de texto: {'FTS5 trigram' if repo.description_fts else 'no disponible (LIKE)'}\n")
+        print(f"{'término':<14}{'anterior p50':>14}{'actual p50':>12}{'actual máx':>12}{'resultados':>12}")
+        worst = 0.0
+        for term in TERMS:
+            legacy, current, count = [], [], 0
+            for text in _keystrokes(term):
+                start = time.perf_counter()
+                repo.conn.execute(LEGACY_SQL, (f"{text.upper()}%", f"%{text}%", 15)).fetchall()
+                legacy.append((time.perf_counter() - start) * 1000)
+                start = time.perf_counter()
+                count = len(repo.search_codes_prefix(text, limit=15))
+                current.append((time.perf_counter() - start) * 1000)
+            worst = max(worst, max(current))
+            print(f"{term:<14}{statistics.median(legacy):>14.1f}{statistics.median(current):>12.2f}"
+                  f"{max(current):>12.2f}{count:>12}")
+        repo.close()
+    print(f"\npeor pulsación: {worst:.2f} ms (objetivo {TARGET_MS:.0f} ms)")
+    return 0 if worst <= TARGET_MS else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,66 @@
+"""Compara las estrategias de bulk_select para búsquedas masivas de códigos.
+
+Para cada tamaño de entrada (10 a 1.000.000 códigos, mitad existentes y mitad
+inexistentes) mide codes_exist con una sola sentencia IN, con sentencias de
+LOOKUP_CHUNK_SIZE parámetros y con la tabla temporal. 'límite' indica que la
+sentencia única supera el máximo de parámetros de SQLite.
+
+Uso (desde la raíz del proyecto):
+    python -m tools.bench_bulk_lookup [--rows 1000000] [--max-input 1000000]
+"""
+import argparse
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from repository.db_querys import CodeRepository, bulk_select, LOOKUP_CHUNK_SIZE, LOOKUP_TEMP_TABLE_MIN
+from tools.synthetic import populate
+
+SIZES = (10, 100, 1000, 10000, 100000, 1000000)
+STRATEGIES = ("in", "chunks", "temp")
+
+
+def _lookup_ms(conn: sqlite3.Connection, codes, strategy: str):
+    start = time.perf_counter()
+    try:
+        found = bulk_select(conn, "SELECT DISTINCT code FROM codes", "code", codes, strategy=strategy)
+    except sqlite3.OperationalError:
+        return None, None
+    return (time.perf_counter() - start) * 1000, len(found)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--max-input", type=int, default=1000000)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        repo = CodeRepository(Path(tmp) / "lookup.db")
+        populate(repo, args.rows)
+        existing = [r[0] for r in repo.conn.execute("SELECT code FROM codes")]
+        print(f"chunk={LOOKUP_CHUNK_SIZE}, tabla temporal desde {LOOKUP_TEMP_TABLE_MIN} códigos\n")
+        print(f"{'códigos':>10}" + "".join(f"{name + ' ms':>14}" for name in STRATEGIES) + f"{'encontrados':>14}")
+        for size in (s for s in SIZES if s <= args.max_input):
+            half = size // 2
+            codes = [existing[(i * 7919) % len(existing)] for i in range(size - half)]
+            codes += [f"ZZ{i:09d}" for i in range(half)]
+            cells = []
+            found = None
+            for strategy in STRATEGIES:
+                ms, count = _lookup_ms(repo.conn, codes, strategy)
+                cells.append("límite" if ms is None else f"{ms:.1f}")
+                if count is not None:
+                    if found is not None and count != found:
+                        print(f"Resultado distinto con {strategy}: {count} != {found}")
+                        return 1
+                    found = count
+            print(f"{size:>10}" + "".join(f"{c:>14}" for c in cells) + f"{found:>14}")
+        repo.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,156 @@
+"""Mide el tiempo de pintado de las columnas Stock y Estado de la tabla.
+
+Pinta en un QImage (plataforma offscreen) las celdas de una pantalla de filas con
+StockDelegate y StatusBadgeDelegate, desplazándose como al hacer scroll sobre las
+primeras --scroll-rows filas, y lo compara con dibujar cada celda desde cero
+(QFont, QPen, medición de texto y antialiasing en cada paint, como antes de la
+caché). Reporta ms por pantalla con la caché fría (primer cuadro tras cambiar
+tema o tamaño) y caliente (tras una pasada por la zona de scroll).
+
+Uso (desde la raíz del proyecto):
+    python -m tools.bench_delegates [--rows 5000] [--scroll-rows 1000] [--frames 200] [--dpr 1.0]
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt5.QtCore import Qt, QRect
+from PyQt5.QtGui import QBrush, QColor, QFont, QImage, QPainter, QPen
+from PyQt5.QtWidgets import QApplication, QStyleOptionViewItem
+
+from repository.db_querys import CodeRepository, STATUS_LABELS
+from styles.styles import get_status_color
+from tools.synthetic import populate
+from ui.table_rows import remaining_boxes_text
+from ui.ui import CodesTableModel, StatusBadgeDelegate, StockDelegate
+
+VISIBLE_ROWS = 40
+ROW_HEIGHT = 31
+STOCK_WIDTH = 160
+STATUS_WIDTH = 110
+
+
+def _legacy_badge(painter: QPainter, rect: QRect, status: str) -> None:
+    painter.save()
+    painter.setRenderHint(QPainter.Antialiasing)
+    badge = rect.adjusted(8, 6, -8, -6)
+    painter.setBrush(QBrush(QColor(get_status_color(status))))
+    painter.setPen(Qt.NoPen)
+    painter.drawRoundedRect(badge, 10, 10)
+    painter.setPen(QPen(QColor('#ffffff')))
+    font = QFont()
+    font.setBold(True)
+    font.setPointSize(9)
+    painter.setFont(font)
+    painter.drawText(badge, Qt.AlignCenter, STATUS_LABELS.get(status, status))
+    painter.restore()
+
+
+def _legacy_stock(painter: QPainter, rect: QRect, stock) -> None:
+    per_box, boxes, remaining = stock
+    painter.save()
+    painter.setRenderHint(QPainter.Antialiasing)
+    total = per_box * boxes
+    remaining = total if remaining is None else remaining
+    color = StockDelegate.COLOR_REMAINING_OK
+    if total > 0 and remaining / total <= 0.3:
+        color = StockDelegate.COLOR_REMAINING_LOW if remaining / total > 0.1 else StockDelegate.COLOR_REMAINING_CRITICAL
+    total_text = f"{per_box}({boxes})"
+    remaining_text = f"{remaining}({remaining_boxes_text(per_box, remaining)})"
+    font = QFont()
+    font.setBold(True)
+    font.setPointSize(9)
+    painter.setFont(font)
+    fm = painter.fontMetrics()
+    widths = [fm.horizontalAdvance(t) for t in (total_text, " | ", remaining_text)]
+    x = rect.x() + (rect.width() - sum(widths)) // 2
+    y = rect.y() + (rect.height() + fm.ascent() - fm.descent()) // 2
+    for text, width, pen_color in zip((total_text, " | ", remaining_text), widths,
+                                      (StockDelegate.COLOR_TOTAL, StockDelegate.COLOR_SEPARATOR, color)):
+        painter.setPen(QPen(QColor(pen_color)))
+        painter.drawText(x, y, text)
+        x += width
+    painter.restore()
+
+
+def _frames(image: QImage, model: CodesTableModel, frames: int, scroll_rows: int, paint_cell) -> list:
+    """ms de cada pantalla; cada una avanza media pantalla y vuelve al principio
+    al llegar a scroll_rows."""
+    samples = []
+    option = QStyleOptionViewItem()
+    step = VISIBLE_ROWS // 2
+    span = max(1, min(model.rowCount(), scroll_rows) - VISIBLE_ROWS)
+    for frame in range(frames):
+        first = (frame * step) % span
+        painter = QPainter(image)
+        start = time.perf_counter()
+        for i in range(VISIBLE_ROWS):
+            y = i * ROW_HEIGHT
+            stock_index = model.index(first + i, 3)
+            status_index = model.index(first + i, 5)
+            option.rect = QRect(0, y, STOCK_WIDTH, ROW_HEIGHT)
+            paint_cell(painter, option, stock_index, 3)
+            option.rect = QRect(STOCK_WIDTH, y, STATUS_WIDTH, ROW_HEIGHT)
+            paint_cell(painter, option, status_index, 5)
+        samples.append((time.perf_counter() - start) * 1000)
+        painter.end()
+    return samples
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=5000, help="filas sintéticas (default: 5000)")
+    parser.add_argument("--scroll-rows", type=int, default=1000, help="filas recorridas con el scroll (default: 1000)")
+    parser.add_argument("--frames", type=int, default=200, help="pantallas pintadas (default: 200)")
+    parser.add_argument("--dpr", type=float, default=1.0, help="device pixel ratio del destino (default: 1.0)")
+    args = parser.parse_args(argv)
+    app = QApplication.instance() or QApplication(sys.argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        repo = CodeRepository(Path(tmp) / "paint.db", cache_entries=0)
+        populate(repo, args.rows)
+        model = CodesTableModel(repo)
+        model.load()
+        image = QImage(round((STOCK_WIDTH + STATUS_WIDTH) * args.dpr), round(VISIBLE_ROWS * ROW_HEIGHT * args.dpr),
+                       QImage.Format_ARGB32_Premultiplied)
+        image.setDevicePixelRatio(args.dpr)
+        image.fill(Qt.white)
+
+        def legacy(painter, option, index, column):
+            if column == 3 and index.data(Qt.UserRole + 1):
+                _legacy_stock(painter, option.rect, index.data(Qt.UserRole + 1))
+            elif column == 5 and index.data(Qt.UserRole):
+                _legacy_badge(painter, option.rect, index.data(Qt.UserRole))
+
+        stock, status = StockDelegate(), StatusBadgeDelegate()
+
+        def cached(painter, option, index, column):
+            (stock if column == 3 else status).paint(painter, option, index)
+
+        legacy_ms = _frames(image, model, args.frames, args.scroll_rows, legacy)
+        stock.set_theme("Claro")
+        status.set_theme("Claro")
+        cold_ms = _frames(image, model, 1, args.scroll_rows, cached)[0]
+        _frames(image, model, args.scroll_rows // (VISIBLE_ROWS // 2), args.scroll_rows, cached)
+        warm_ms = _frames(image, model, args.frames, args.scroll_rows, cached)
+        repo.close()
+
+    cells = VISIBLE_ROWS * 2
+    print(f"{VISIBLE_ROWS} filas x 2 columnas por pantalla, dpr {args.dpr}")
+    print(f"{'':<22}{'ms/pantalla':>12}{'µs/celda':>10}")
+    print(f"{'sin caché':<22}{statistics.median(legacy_ms):>12.2f}{statistics.median(legacy_ms) * 1000 / cells:>10.1f}")
+    print(f"{'caché fría':<22}{cold_ms:>12.2f}{cold_ms * 1000 / cells:>10.1f}")
+    print(f"{'caché caliente':<22}{statistics.median(warm_ms):>12.2f}{statistics.median(warm_ms) * 1000 / cells:>10.1f}")
+    print(f"badges en caché: {len(status._pixmaps)}, stocks en caché: {len(stock._layouts)}")
+    del app
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,67 @@
+"""Mide la lectura de un CSV grande con 1 y con varios procesos.
+
+Genera un CSV sintético (con descripciones entre comillas que contienen saltos
+de línea) y lo recorre con iter_import_chunks para cada cantidad de procesos,
+sin escribir en ninguna base. Falla si algún resultado difiere de la lectura
+secuencial.
+
+Uso (desde la raíz del proyecto):
+    python -m tools.bench_import [--rows 1000000] [--workers 1 2 4]
+"""
+import argparse
+import csv
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from modules.import_utils import iter_import_chunks, default_workers, PARALLEL_MIN_BYTES
+
+
+def _write_csv(path: Path, rows: int) -> None:
+    with open(path, "w", encoding="utf-8-sig", newline="") as f:
+        writer = csv.writer(f, delimiter=";", lineterminator="\r\n")
+        writer.writerow(["Código", "Descripción", "Stock_Caja", "Stock_Cajas", "Stock_Restante", "Estado", "Usado"])
+        for i in range(rows):
+            description = f'Caja "grande"\nlote {i}' if i % 1000 == 0 else f"Producto {i}"
+            writer.writerow([f"CQ{i:07d}", description, 12, i % 40, i % 12, "Pedido", "Sí" if i % 3 == 0 else "No"])
+
+
+def _read(path: Path, workers: int):
+    start = time.perf_counter()
+    items = []
+    rows = 0
+    for chunk in iter_import_chunks(path, workers=workers):
+        items.extend(chunk.items)
+        rows += chunk.rows
+    return time.perf_counter() - start, items, rows
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--workers", type=int, nargs="+", default=sorted({1, 2, default_workers()}))
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "import.csv"
+        _write_csv(path, args.rows)
+        size_mb = path.stat().st_size / 1024 / 1024
+        print(f"{args.rows} filas, {size_mb:.1f} MB, {os.cpu_count()} CPU "
+              f"(paralelo desde {PARALLEL_MIN_BYTES // 1024 // 1024} MB)\n")
+        print(f"{'procesos':>10}{'s':>10}{'filas/s':>14}{'códigos':>12}")
+        baseline = None
+        for workers in args.workers:
+            seconds, items, rows = _read(path, workers)
+            if baseline is None:
+                baseline = (items, rows)
+            elif (items, rows) != baseline:
+                print(f"Resultado distinto con {workers} procesos")
+                return 1
+            print(f"{workers:>10}{seconds:>10.2f}{rows / seconds:>14.0f}{len(items):>12}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
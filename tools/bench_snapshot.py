@@ -0,0 +1,114 @@
+"""Mide filtrar/ordenar con CodesSnapshot frente a list_codes sobre SQLite.
+
+Ejecuta las combinaciones de filtros y órdenes de la interfaz, verifica que la
+instantánea retorna exactamente los mismos ids que list_codes y reporta la
+latencia de cada camino. La instantánea se mide en frío (primera ejecución, la
+que ve el usuario al cambiar de filtro u orden) y en caliente (mediana de las
+siguientes); el objetivo de < 20 ms se juzga sobre la medición en frío. Después
+aplica algunas escrituras y repite la verificación con los órdenes y búsquedas
+que sync() corrigió en lugar de recalcular.
+
+Uso (desde la raíz del proyecto):
+    python -m tools.bench_snapshot [--rows 1000000] [--repeat 5]
+"""
+import argparse
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from repository.db_querys import CodeRepository, STATUS_PEDIDO, STATUS_DISPONIBLE
+from repository.snapshot import CodesSnapshot, HAS_NUMPY
+from tools.synthetic import populate
+
+TARGET_MS = 20.0
+
+# (etiqueta, parámetros de list_codes) como los arma MainWindow
+QUERIES = [
+    ("todo, fecha desc", {}),
+    ("todo, código asc", {"order_by": "code", "order_dir": "ASC"}),
+    ("todo, código desc", {"order_by": "code", "order_dir": "DESC"}),
+    ("todo, estado", {"order_by": "status", "order_dir": "ASC"}),
+    ("anotados, fecha asc", {"annotated": True, "order_dir": "ASC"}),
+    ("no anotados, código", {"annotated": False, "order_by": "code", "order_dir": "ASC"}),
+    ("pedido, fecha desc", {"status": STATUS_PEDIDO}),
+    ("disponible + anotados", {"status": STATUS_DISPONIBLE, "annotated": True, "order_by": "code", "order_dir": "ASC"}),
+    ("búsqueda 'CQ12'", {"search": "CQ12"}),
+    ("rango CQ 1000-500000", {"search": "CQ 1000-500000", "order_by": "code", "order_dir": "ASC"}),
+]
+
+
+def _time_ms(func, repeat: int):
+    """(primera ejecución, mediana de las siguientes, resultado) en ms."""
+    samples = []
+    result = None
+    for _ in range(max(1, repeat)):
+        start = time.perf_counter()
+        result = func()
+        samples.append((time.perf_counter() - start) * 1000)
+    warm = statistics.median(samples[1:]) if len(samples) > 1 else samples[0]
+    return samples[0], warm, result
+
+
+def _check(repo: CodeRepository, snapshot: CodesSnapshot, repeat: int):
+    """Corre QUERIES en ambos caminos. Retorna (consultas distintas, consultas lentas en frío)."""
+    print(f"{'consulta':<24}{'filas':>10}{'sqlite ms':>12}{'frío ms':>10}{'caliente ms':>13}")
+    mismatches = 0
+    slow = 0
+    for label, params in QUERIES:
+        _, sql_ms, sql_rows = _time_ms(lambda: repo.list_codes(**params), 1)
+        cold_ms, warm_ms, positions = _time_ms(lambda: snapshot.query(**params), repeat)
+        if not _same_result(sql_rows, [snapshot.row(p) for p in positions], params.get("order_by", "created_at")):
+            mismatches += 1
+            label += " (DIFIERE)"
+        slow += cold_ms > TARGET_MS
+        print(f"{label:<24}{len(positions):>10}{sql_ms:>12.1f}{cold_ms:>10.1f}{warm_ms:>13.1f}")
+    return mismatches, slow
+
+
+def _same_result(expected, actual, order_by: str) -> bool:
+    """Mismas filas en la misma secuencia (list_codes desempata por id, igual que la instantánea)."""
+    return [r["id"] for r in expected] == [r["id"] for r in actual]
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+    if not HAS_NUMPY:
+        print("Aviso: NumPy no está instalado, se mide el camino de respaldo con `array`.")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        repo = CodeRepository(Path(tmp) / "snapshot.db", cache_entries=0)
+        populate(repo, args.rows)
+        start = time.perf_counter()
+        snapshot = CodesSnapshot(repo)
+        print(f"carga de la instantánea: {(time.perf_counter() - start) * 1000:.0f} ms ({len(snapshot)} filas)\n")
+
+        mismatches, slow = _check(repo, snapshot, args.repeat)
+
+        # Escrituras que mueven filas en todos los órdenes: estado, código, alta y baja
+        ids = snapshot.ids
+        repo.update_status(int(ids[len(ids) // 2]), STATUS_PEDIDO)
+        repo.update_code(int(ids[len(ids) // 3]), "CQ12")
+        repo.add_codes([("CQ120", False, None, None, None, "nuevo CQ12", None, None, None)])
+        repo.delete_code(int(ids[len(ids) // 4]))
+        repo.flush_writes()
+        sync_ms, _, _ = _time_ms(snapshot.sync, 1)
+        print(f"\nsync tras cuatro escrituras: {sync_ms:.1f} ms\n")
+        after_mismatches, after_slow = _check(repo, snapshot, args.repeat)
+        mismatches += after_mismatches
+        slow += after_slow
+        repo.close()
+
+    if mismatches:
+        print(f"{mismatches} consulta(s) con resultado distinto a list_codes")
+        return 1
+    print(f"{slow} consulta(s) sobre el objetivo de {TARGET_MS:.0f} ms en frío")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,87 @@
+"""Compara el perfil SQLite anterior (valores por defecto) con el perfil ajustado.
+
+Mide la latencia de commit de update_status/update_annotated (un commit por
+llamada, como en la interfaz) y el rendimiento de lectura de list_codes.
+
+Uso (desde la raíz del proyecto):
+    python -m tools.bench_sqlite_profile [--rows 100000] [--commits 500] [--db-dir DIR]
+
+--db-dir permite medir sobre el disco real de la estación (por defecto se usa
+un directorio temporal).
+"""
+import argparse
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict
+
+from repository.db_querys import CodeRepository, STATUS_PEDIDO, STATUS_DISPONIBLE
+from repository.sqlite_profile import SQLiteProfile, DEFAULT_PROFILE, LEGACY_PROFILE
+from tools.synthetic import populate
+
+
+def _percentile(values, pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+
+def run_profile(name: str, profile: SQLiteProfile, directory: Path, rows: int, commits: int) -> Dict[str, float]:
+    db_path = directory / f"bench_{name}.db"
+    repo = CodeRepository(db_path, profile=profile, cache_entries=0)
+    populate(repo, rows)
+    ids = [r[0] for r in repo.conn.execute("SELECT id FROM codes ORDER BY id LIMIT ?", (commits,))]
+
+    latencies = []
+    for i, code_id in enumerate(ids):
+        start = time.perf_counter()
+        if i % 2:
+            repo.update_status(code_id, STATUS_PEDIDO if i % 4 == 1 else STATUS_DISPONIBLE)
+        else:
+            repo.update_annotated(code_id, bool(i % 3))
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    read_rows = 0
+    passes = 0
+    while time.perf_counter() - start < 2.0:
+        read_rows += len(repo.list_codes(status=STATUS_PEDIDO, order_by="code"))
+        read_rows += len(repo.list_codes(order_by="created_at", order_dir="DESC"))
+        passes += 2
+    elapsed = time.perf_counter() - start
+    repo.close()
+    return {
+        "commit_p50_ms": statistics.median(latencies),
+        "commit_p95_ms": _percentile(latencies, 0.95),
+        "commit_max_ms": max(latencies),
+        "read_rows_per_s": read_rows / elapsed,
+        "queries_per_s": passes / elapsed,
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--commits", type=int, default=500)
+    parser.add_argument("--db-dir", type=Path, default=None)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(dir=args.db_dir) as tmp:
+        results = {
+            "anterior": run_profile("legacy", LEGACY_PROFILE, Path(tmp), args.rows, args.commits),
+            "ajustado": run_profile("tuned", DEFAULT_PROFILE, Path(tmp), args.rows, args.commits),
+        }
+
+    metrics = list(next(iter(results.values())).keys())
+    print(f"{'métrica':<18}" + "".join(f"{name:>14}" for name in results))
+    for metric in metrics:
+        print(f"{metric:<18}" + "".join(f"{r[metric]:>14.2f}" for r in results.values()))
+    before, after = results["anterior"], results["ajustado"]
+    print(f"\ncommit p50: x{before['commit_p50_ms'] / max(after['commit_p50_ms'], 1e-9):.1f} más rápido, "
+          f"lectura: x{after['read_rows_per_s'] / max(before['read_rows_per_s'], 1e-9):.2f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
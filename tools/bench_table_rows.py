@@ -0,0 +1,137 @@
+"""Mide memoria por fila y latencia de data() de CodesTableModel.
+
+Compara las filas como dict (lo que guardaba el modelo antes) con CodeRow
+(ui/table_rows.py, textos precalculados): memoria por fila con tracemalloc,
+tiempo de armar las filas y microsegundos por llamada a data() para cada rol que
+pide la vista al repintar, sobre una ventana de filas visibles. La columna "dict"
+de data() recalcula los textos en cada llamada, como el modelo anterior.
+
+Uso (desde la raíz del proyecto):
+    python -m tools.bench_table_rows [--rows 50000] [--repeat 200]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt5.QtCore import Qt, QVariant
+from PyQt5.QtWidgets import QApplication
+
+from repository.db_querys import CodeRepository, STATUS_LABELS, STATUS_DISPONIBLE
+from tools.synthetic import populate
+from ui.table_rows import format_created_at, format_stock, make_rows
+from ui.ui import CodesTableModel
+
+# Filas visibles en la tabla de la ventana principal
+VISIBLE_ROWS = 40
+
+# (etiqueta, columna, rol) que pide QTableView al pintar una fila
+ROLES = [
+    ("texto #", 0, Qt.DisplayRole),
+    ("texto código", 1, Qt.DisplayRole),
+    ("texto stock", 3, Qt.DisplayRole),
+    ("texto fecha", 4, Qt.DisplayRole),
+    ("stock (delegate)", 3, Qt.UserRole + 1),
+    ("estado (delegate)", 5, Qt.UserRole),
+    ("fuente", 2, Qt.FontRole),
+    ("tooltip", 2, Qt.ToolTipRole),
+]
+
+
+def _dict_data(row: dict, pos: int, col: int, role: int):
+    """data() sobre un dict, formateando en cada llamada (modelo anterior)."""
+    if role == Qt.DisplayRole:
+        if col == 0:
+            return pos + 1
+        if col == 1:
+            return row['code']
+        if col == 3:
+            return format_stock(row.get('stock_per_box'), row.get('stock_boxes'), row.get('stock_remaining'))
+        if col == 4:
+            return format_created_at(row['created_at'])
+    if role == Qt.UserRole + 1 and col == 3:
+        if row.get('stock_per_box') is not None and row.get('stock_boxes') is not None:
+            return (row['stock_per_box'], row['stock_boxes'], row['stock_remaining'])
+        return None
+    if role == Qt.UserRole and col == 5:
+        return row.get('status', STATUS_DISPONIBLE)
+    if role == Qt.FontRole and row.get('archived'):
+        return None
+    if role == Qt.ToolTipRole:
+        status = row.get('status', STATUS_DISPONIBLE)
+        stock = format_stock(row.get('stock_per_box'), row.get('stock_boxes'), row.get('stock_remaining'))
+        return (f"Código: {row['code']}\nDescripción: {row.get('description') or 'Sin descripción'}\n"
+                f"Stock: {stock or 'Sin stock'}\nEstado: {STATUS_LABELS.get(status, status)}")
+    return QVariant()
+
+
+class _DictModel(CodesTableModel):
+    """El mismo modelo con filas dict: data() pasa por Qt igual que en CodesTableModel."""
+
+    def data(self, index, role=Qt.DisplayRole):
+        return _dict_data(self.rows[index.row()], index.row(), index.column(), role)
+
+
+def _measure(build):
+    """(resultado, bytes retenidos, ms); el tiempo se toma sin tracemalloc."""
+    start = time.perf_counter()
+    build()
+    elapsed = (time.perf_counter() - start) * 1000
+    tracemalloc.start()
+    result = build()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, size, elapsed
+
+
+def _data_us(model, indexes, role, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for index in indexes:
+            model.data(index, role)
+    return (time.perf_counter() - start) * 1e6 / (repeat * len(indexes))
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=50000, help="filas sintéticas (default: 50000)")
+    parser.add_argument("--repeat", type=int, default=200, help="repintados simulados por rol (default: 200)")
+    args = parser.parse_args(argv)
+    app = QApplication.instance() or QApplication(sys.argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        repo = CodeRepository(Path(tmp) / "rows.db", cache_entries=0)
+        populate(repo, args.rows)
+        records = repo.list_codes()
+
+        dicts, dict_bytes, dict_ms = _measure(lambda: [dict(r) for r in records])
+        rows, row_bytes, row_ms = _measure(lambda: make_rows(records))
+        # Los tooltips se arman al pedirlos: se mide también con todos generados
+        _, full_bytes, _ = _measure(lambda: [(r, r.tooltip) for r in make_rows(records)])
+        print(f"{'filas':<22}{'bytes/fila':>12}{'armado ms':>12}")
+        print(f"{'dict':<22}{dict_bytes / len(dicts):>12.0f}{dict_ms:>12.1f}")
+        print(f"{'CodeRow':<22}{row_bytes / len(rows):>12.0f}{row_ms:>12.1f}")
+        print(f"{'CodeRow + tooltip':<22}{full_bytes / len(rows):>12.0f}")
+
+        model = CodesTableModel(repo)
+        model.rows = rows
+        dict_model = _DictModel(repo)
+        dict_model.rows = dicts
+        window = range(len(rows) // 2, len(rows) // 2 + VISIBLE_ROWS)
+        print(f"\n{'data()':<22}{'dict µs':>12}{'CodeRow µs':>12}")
+        for label, col, role in ROLES:
+            dict_us = _data_us(dict_model, [dict_model.index(pos, col) for pos in window], role, args.repeat)
+            row_us = _data_us(model, [model.index(pos, col) for pos in window], role, args.repeat)
+            print(f"{label:<22}{dict_us:>12.2f}{row_us:>12.2f}")
+        repo.close()
+    del app
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,171 @@
+"""Verifica con EXPLAIN QUERY PLAN que las consultas del repositorio usan índices.
+
+Crea una base sintética grande, ejecuta cada método de CodeRepository capturando
+las sentencias SQL reales (set_trace_callback) y analiza su plan. Falla (código de
+salida 1) si alguna sentencia con WHERE recorre la tabla completa (SCAN) o si
+alguna necesita ordenar en un B-tree temporal (USE TEMP B-TREE).
+
+Uso (desde la raíz del proyecto):
+    python -m tools.check_query_plans [--rows 200000] [--verbose]
+"""
+import argparse
+import re
+import sqlite3
+import sys
+import tempfile
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, List, Tuple
+
+from repository.db_querys import CodeRepository, STATUS_PEDIDO, STATUS_DISPONIBLE
+from tools.synthetic import populate
+
+# Sentencias que por diseño recorren todas las filas: (patrón, motivo)
+ALLOWED_FULL_SCANS: List[Tuple[str, str]] = [
+    (r"LIKE '%", "búsqueda por subcadena en descripción"),
+    (r"^SELECT DISTINCT code FROM codes ORDER BY code", "lista completa para autocompletado"),
+    (r"^UPDATE codes SET duplicate = [01] WHERE duplicate = [01] ", "recálculo de duplicados de toda la tabla"),
+    (r"^SELECT id, annotated, status, stock_per_box, stock_boxes, stock_remaining FROM codes$", "recálculo de todos los estados"),
+    (r"prefix = \? AND number BETWEEN \? AND \? ORDER BY (?!prefix)", "rango numérico: pocas filas, se ordenan en memoria"),
+    (r"created_at [<>]=? (?:\?|\d+) ORDER BY (?!created_at)", "rango de fechas: se ordenan en memoria las filas del rango"),
+]
+
+# Órdenes disponibles en MainWindow.on_sort_changed
+SORTS = [('created_at', 'DESC'), ('created_at', 'ASC'), ('code', 'ASC'), ('code', 'DESC'), ('status', 'ASC')]
+
+
+def repository_calls(repo: CodeRepository) -> List[Tuple[str, Callable[[], object]]]:
+    """Todas las llamadas que hace la aplicación, con parámetros representativos."""
+    sample = repo.conn.execute("SELECT id, code FROM codes WHERE id = 1000").fetchone()
+    code_id, code = sample["id"], sample["code"]
+    some_codes = [r["code"] for r in repo.conn.execute("SELECT code FROM codes LIMIT 300")]
+    many_codes = [r["code"] for r in repo.conn.execute("SELECT code FROM codes LIMIT 6000")]
+    created = repo.conn.execute("SELECT created_at FROM codes WHERE id = 1000").fetchone()[0]
+    day_from, day_to = created, created + 24 * 3600 * 1000
+    calls: List[Tuple[str, Callable[[], object]]] = []
+    for annotated in (None, True, False):
+        for status in (None, STATUS_PEDIDO):
+            for order_by, order_dir in SORTS:
+                label = f"list_codes(annotated={annotated}, status={status}, order={order_by} {order_dir})"
+                calls.append((label, lambda a=annotated, s=status, o=order_by, d=order_dir:
+                              repo.list_codes(annotated=a, duplicates_only=False, status=s, order_by=o, order_dir=d)))
+    calls += [
+        ("list_codes(search)", lambda: repo.list_codes(search=code[:4])),
+        ("list_codes(duplicates_only)", lambda: repo.list_codes(duplicates_only=True)),
+        ("list_codes(rango)", lambda: repo.list_codes(search="CQ 1000-200000", order_by="code", order_dir="ASC")),
+        ("list_codes(fechas)", lambda: repo.list_codes(created_from=day_from, created_to=day_to)),
+        ("list_codes(fechas, estado)", lambda: repo.list_codes(status=STATUS_PEDIDO, created_from=day_from, created_to=day_to,
+                                                               order_dir="ASC")),
+        ("list_codes(fechas, anotados, código)", lambda: repo.list_codes(annotated=True, created_from=day_from,
+                                                                         created_to=day_to, order_by="code", order_dir="ASC")),
+        ("list_codes_in_range", lambda: repo.list_codes_in_range("CQ", 1000, 200000)),
+        ("count_by_prefix", repo.count_by_prefix),
+        ("stats", repo.stats),
+        ("get_code_by_id", lambda: repo.get_code_by_id(code_id)),
+        ("get_code_by_code", lambda: repo.get_code_by_code(code)),
+        ("get_codes_by_ids", lambda: repo.get_codes_by_ids([code_id, code_id + 1, code_id + 2])),
+        ("change_version", repo.change_version),
+        ("changes_since", lambda: repo.changes_since(repo.change_version() - 5)),
+        ("codes_exist", lambda: repo.codes_exist(some_codes)),
+        ("get_codes_with_status", lambda: repo.get_codes_with_status(some_codes)),
+        ("codes_exist(tabla temporal)", lambda: repo.codes_exist(many_codes)),
+        ("get_codes_with_status(tabla temporal)", lambda: repo.get_codes_with_status(many_codes)),
+        ("search_codes_prefix", lambda: repo.search_codes_prefix(code[:3], limit=15)),
+        ("search_codes_prefix(descripción)", lambda: repo.search_codes_prefix("ducto 12", limit=15)),
+        ("get_all_codes_for_autocomplete", repo.get_all_codes_for_autocomplete),
+        ("update_status", lambda: repo.update_status(code_id, STATUS_PEDIDO)),
+        ("update_annotated", lambda: repo.update_annotated(code_id, True)),
+        ("update_image_path", lambda: repo.update_image_path(code_id, None)),
+        ("update_stock", lambda: repo.update_stock(code_id, 10, 2, 15)),
+        ("update_status_if_default", lambda: repo.update_status_if_default(code, STATUS_DISPONIBLE)),
+        ("update_code", lambda: repo.update_code(code_id, code, True, STATUS_PEDIDO)),
+        ("recalculate_all_statuses", repo.recalculate_all_statuses),
+        ("add_codes", lambda: repo.add_codes([("ZZ000001", False, datetime.utcnow(), STATUS_DISPONIBLE)])),
+        ("delete_code", lambda: repo.delete_code(code_id)),
+        ("prune_changes", lambda: repo.prune_changes(repo.change_version())),
+        ("archive_cold_codes", lambda: repo.archive_cold_codes(max_batches=2)),
+        ("archive_stats", repo.archive_stats),
+        ("list_codes(include_archived)", lambda: repo.list_codes(include_archived=True, order_by="code", order_dir="ASC")),
+        ("get_code_by_code(include_archived)", lambda: repo.get_code_by_code("ZZ-no-existe", include_archived=True)),
+        ("restore_archived", lambda: repo.restore_archived([r["id"] for r in repo.conn.execute(
+            "SELECT id FROM codes_archive LIMIT 10")])),
+    ]
+    return calls
+
+
+def _normalize(sql: str) -> str:
+    return re.sub(r"\s+", " ", sql).strip()
+
+
+def _partial_indexes(conn: sqlite3.Connection) -> set:
+    return {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index' AND sql LIKE '% WHERE %'")}
+
+
+def plan_problems(statement: str, details: List[str], partial: set) -> List[str]:
+    """Retorna los pasos del plan que se consideran regresión."""
+    has_where = " WHERE " in f" {statement.upper()} "
+    problems = []
+    for d in details:
+        if "USE TEMP B-TREE" in d:
+            problems.append(d)
+        elif re.search(r"VIRTUAL TABLE INDEX \d+:\S", d):
+            continue  # tabla virtual (FTS5) resolviendo la restricción con su propio índice
+        elif d.startswith("SCAN ") and not d.startswith("SCAN CONSTANT ROW"):
+            index = re.search(r"USING (?:COVERING )?INDEX (\w+)", d)
+            if index is None:
+                problems.append(d)
+            elif has_where and index.group(1) not in partial:
+                problems.append(d)
+    return problems
+
+
+def check(repo: CodeRepository, verbose: bool = False) -> int:
+    conn = repo.conn
+    partial = _partial_indexes(conn)
+    failures = 0
+    for label, call in repository_calls(repo):
+        captured: List[str] = []
+        conn.set_trace_callback(captured.append)
+        try:
+            call()
+        finally:
+            conn.set_trace_callback(None)
+        for statement in map(_normalize, captured):
+            if not statement.upper().startswith(("SELECT", "UPDATE", "DELETE")):
+                continue
+            details = [r[3] for r in conn.execute(f"EXPLAIN QUERY PLAN {statement}")]
+            problems = plan_problems(statement, details, partial)
+            allowed = next((reason for pattern, reason in ALLOWED_FULL_SCANS if re.search(pattern, statement)), None)
+            if problems and not allowed:
+                failures += 1
+                print(f"FALLA  {label}\n       {statement[:160]}")
+                for d in details:
+                    print(f"         {d}")
+            elif verbose:
+                tag = f"PERMITIDO ({allowed})" if problems else "OK"
+                print(f"{tag}  {label}\n       {statement[:160]}")
+                for d in details:
+                    print(f"         {d}")
+    return failures
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=200000, help="filas sintéticas (default: 200000)")
+    parser.add_argument("--verbose", action="store_true", help="mostrar también los planes correctos")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        repo = CodeRepository(Path(tmp) / "plans.db", cache_entries=0, read_pool_size=0)
+        populate(repo, args.rows)
+        failures = check(repo, verbose=args.verbose)
+        repo.close()
+    if failures:
+        print(f"\n{failures} consulta(s) con SCAN o USE TEMP B-TREE")
+        return 1
+    print("Todas las consultas usan índices.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
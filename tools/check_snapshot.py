@@ -0,0 +1,92 @@
+"""Verifica que CodesSnapshot sigue igual a la tabla codes tras archivar, restaurar y editar.
+
+Recorre dos casos sobre una base sintética:
+- la instantánea ve archivar y después restaurar las mismas filas
+- la instantánea se carga con las filas ya archivadas: al restaurarlas vuelven con
+  su id original, menor que el último, y van en el medio de las posiciones
+En ambos edita las filas restauradas y compara la instantánea fila por fila con
+codes, y cada orden de la interfaz con list_codes. Falla (código de salida 1) ante
+cualquier diferencia.
+
+Uso (desde la raíz del proyecto):
+    python -m tools.check_snapshot [--rows 20000]
+"""
+import argparse
+import sys
+import tempfile
+from pathlib import Path
+from typing import List
+
+from repository.db_querys import CodeRepository, STATUS_PEDIDO
+from repository.snapshot import CodesSnapshot
+from tools.bench_snapshot import _same_result
+from tools.check_query_plans import SORTS
+from tools.synthetic import populate
+
+_COLUMNS = "id, code, created_at, annotated, duplicate, status, image_path, description, stock_per_box, stock_boxes, stock_remaining"
+
+
+def differences(repo: CodeRepository, snapshot: CodesSnapshot) -> List[str]:
+    """Diferencias entre la instantánea (ya sincronizada) y la base."""
+    problems = []
+    ids = [int(i) for i in snapshot.ids]
+    if any(a >= b for a, b in zip(ids, ids[1:])):
+        problems.append("las posiciones no están en orden estricto de id (filas repetidas)")
+    expected = {row["id"]: dict(row) for row in repo.conn.execute(f"SELECT {_COLUMNS} FROM codes")}
+    actual = {row["id"]: row for row in (snapshot.row(p) for p in snapshot.query(order_dir="ASC"))}
+    if len(snapshot) != len(expected):
+        problems.append(f"{len(snapshot)} filas en la instantánea, {len(expected)} en codes")
+    for code_id in sorted(expected.keys() | actual.keys()):
+        if expected.get(code_id) != actual.get(code_id):
+            problems.append(f"id {code_id}: codes={expected.get(code_id)} instantánea={actual.get(code_id)}")
+    for order_by, order_dir in SORTS:
+        params = {"order_by": order_by, "order_dir": order_dir}
+        rows = [snapshot.row(p) for p in snapshot.query(**params)]
+        if not _same_result(repo.list_codes(**params), rows, order_by):
+            problems.append(f"orden {order_by} {order_dir} distinto a list_codes")
+    return problems
+
+
+def check_case(repo: CodeRepository, reload_before_restore: bool) -> List[str]:
+    snapshot = CodesSnapshot(repo)
+    repo.archive_cold_codes(max_batches=1)
+    snapshot.sync()
+    ids = [row[0] for row in repo.conn.execute("SELECT id FROM codes_archive ORDER BY id LIMIT 20")]
+    if reload_before_restore:
+        snapshot = CodesSnapshot(repo)
+    repo.restore_archived(ids)
+    snapshot.sync()
+    for code_id in ids[:10]:
+        repo.update_status(code_id, STATUS_PEDIDO)
+    repo.update_code(ids[10], "CQ1")
+    repo.flush_writes()
+    snapshot.sync()
+    return differences(repo, snapshot)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=20000, help="filas sintéticas (default: 20000)")
+    args = parser.parse_args(argv)
+
+    failures = 0
+    with tempfile.TemporaryDirectory() as tmp:
+        repo = CodeRepository(Path(tmp) / "snapshot.db", cache_entries=0)
+        populate(repo, args.rows)
+        for label, reload_before_restore in (("archivar y restaurar con la instantánea abierta", False),
+                                             ("restaurar en una instantánea cargada después de archivar", True)):
+            problems = check_case(repo, reload_before_restore)
+            print(f"{'FALLA' if problems else 'OK':<6} {label}")
+            for problem in problems[:10]:
+                print(f"       {problem}")
+            failures += bool(problems)
+        repo.close()
+    if failures:
+        print(f"\n{failures} caso(s) con diferencias")
+        return 1
+    print("La instantánea coincide con la base.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,108 @@
+"""Verifica que las fechas en texto de estaciones anteriores se guardan como epoch ms.
+
+Las versiones anteriores de la aplicación insertan created_at como
+datetime.utcnow().isoformat(). Recorre dos casos sobre una base sintética:
+- una fila insertada y otra actualizada por SQL directo con la base ya migrada
+  (triggers de la migración 9)
+- una fila en texto que ya estaba en la base antes de la migración 9
+En todos comprueba que created_at queda entero e igual a to_epoch_ms del texto, y que
+list_codes (filtro por fechas), format_created_at y la instantánea lo leen bien.
+Falla (código de salida 1) ante cualquier diferencia.
+
+Uso (desde la raíz del proyecto):
+    python -m tools.check_text_timestamps [--rows 2000]
+"""
+import argparse
+import sqlite3
+import sys
+import tempfile
+from datetime import datetime
+from pathlib import Path
+from typing import List
+
+from repository.db_querys import CodeRepository, to_epoch_ms
+from repository.snapshot import CodesSnapshot
+from tools.synthetic import populate
+from ui.table_rows import format_created_at
+
+_OLD_INSERT = "INSERT INTO codes (code, created_at, annotated, status) VALUES (?, ?, 0, 'disponible')"
+
+
+def check_row(repo: CodeRepository, code: str, text: str) -> List[str]:
+    """Diferencias de la fila `code`, escrita con created_at = `text`."""
+    problems = []
+    expected = to_epoch_ms(text)
+    row = repo.conn.execute("SELECT id, created_at, typeof(created_at) AS kind FROM codes WHERE code = ?",
+                            (code,)).fetchone()
+    if row is None:
+        return [f"{code}: no está en codes"]
+    if row["kind"] != "integer" or row["created_at"] != expected:
+        problems.append(f"{code}: created_at={row['created_at']!r} ({row['kind']}), esperado {expected}")
+        return problems
+    listed = repo.list_codes(created_from=expected, created_to=expected + 1)
+    if [r["id"] for r in listed] != [row["id"]]:
+        problems.append(f"{code}: list_codes por fecha devolvió {[r['id'] for r in listed]}")
+    try:
+        format_created_at(row["created_at"])
+    except TypeError as e:
+        problems.append(f"{code}: format_created_at falla: {e}")
+    snapshot = CodesSnapshot(repo)
+    cached = snapshot.get(row["id"])
+    if cached is None or cached["created_at"] != expected:
+        problems.append(f"{code}: la instantánea no tiene created_at={expected}")
+    return problems
+
+
+def check_migrated(repo: CodeRepository) -> List[str]:
+    now = datetime.utcnow()
+    inserted = now.replace(microsecond=123456).isoformat()
+    updated = now.replace(second=7, microsecond=0).isoformat()
+    repo.conn.execute(_OLD_INSERT, ("OLD0001", inserted))
+    repo.conn.execute(_OLD_INSERT, ("OLD0002", now.isoformat()))
+    repo.conn.execute("UPDATE codes SET created_at = ? WHERE code = 'OLD0002'", (updated,))
+    repo.conn.commit()
+    return check_row(repo, "OLD0001", inserted) + check_row(repo, "OLD0002", updated)
+
+
+def check_before_migration(path: Path) -> List[str]:
+    text = datetime(2025, 3, 1, 12, 30, 15, 999000).isoformat()
+    conn = sqlite3.connect(str(path))
+    conn.execute("DROP TRIGGER IF EXISTS trg_codes_created_at_insert")
+    conn.execute(_OLD_INSERT, ("OLD0003", text))
+    conn.execute("PRAGMA user_version = 8")
+    conn.commit()
+    conn.close()
+    repo = CodeRepository(path, cache_entries=0)
+    try:
+        return check_row(repo, "OLD0003", text)
+    finally:
+        repo.close()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=2000, help="filas sintéticas (default: 2000)")
+    args = parser.parse_args(argv)
+
+    failures = 0
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "timestamps.db"
+        repo = CodeRepository(path, cache_entries=0)
+        populate(repo, args.rows)
+        results = [("insertar y actualizar con texto ISO en la base migrada", check_migrated(repo))]
+        repo.close()
+        results.append(("texto ISO guardado antes de la migración 9", check_before_migration(path)))
+    for label, problems in results:
+        print(f"{'FALLA' if problems else 'OK':<6} {label}")
+        for problem in problems[:10]:
+            print(f"       {problem}")
+        failures += bool(problems)
+    if failures:
+        print(f"\n{failures} caso(s) con diferencias")
+        return 1
+    print("Las fechas en texto se convierten a epoch ms.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
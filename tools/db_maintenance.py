@@ -0,0 +1,59 @@
+"""Ejecuta el mantenimiento de la base (vacuum incremental, ANALYZE, optimize, checkpoint).
+
+Es lo mismo que hace la aplicación en tiempo ocioso, pero de una vez y truncando el
+WAL al final del checkpoint (la aplicación solo lo trunca al cerrar). Reporta el
+tamaño del archivo, del WAL y las páginas antes y después de cada tarea. Con
+--step-ms se usa el modo por pasos de la aplicación y se informa el paso más largo.
+
+Uso (desde la raíz del proyecto):
+    python -m tools.db_maintenance [--db db/codes.db] [--step-ms 50]
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+from repository.db_querys import CodeRepository, FULL_DB_PATH
+from repository.maintenance import DatabaseSize, DEFAULT_MAINTENANCE_POLICY
+
+
+def _fmt(size: DatabaseSize) -> str:
+    return (f"{size.file_bytes / 1024:>10.0f} KiB  wal {size.wal_bytes / 1024:>8.0f} KiB  "
+            f"{size.page_count:>8} págs  {size.freelist_count:>7} libres")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db", type=Path, default=Path(FULL_DB_PATH), help="base de datos (default: db/codes.db)")
+    parser.add_argument("--step-ms", type=float, default=None, help="ejecutar por pasos de este tamaño")
+    args = parser.parse_args(argv)
+    if not args.db.exists():
+        print(f"No existe {args.db}")
+        return 1
+
+    repo = CodeRepository(args.db, cache_entries=0, read_pool_size=0)
+    scheduler = repo.maintenance_scheduler(DEFAULT_MAINTENANCE_POLICY._replace(truncate_wal=True))
+    start = scheduler.size()
+    print(f"pendiente: {', '.join(scheduler.pending()) or 'nada'}")
+    print(f"inicio      {_fmt(start)}")
+    if args.step_ms is None:
+        reports = scheduler.run_all()
+    else:
+        steps, worst = 0, 0.0
+        while True:
+            t = time.perf_counter()
+            more = scheduler.step(budget_ms=args.step_ms)
+            worst = max(worst, (time.perf_counter() - t) * 1000)
+            steps += 1
+            if not more:
+                break
+        reports = list(scheduler.history)
+        print(f"{steps} paso(s), el más largo {worst:.1f} ms")
+    for report in reports:
+        print(f"{report.task:<11} {_fmt(report.after)}  ({report.units} unidades, {report.duration_ms:.0f} ms)")
+    repo.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,47 @@
+"""Datos sintéticos compartidos por las herramientas de verificación y benchmarks."""
+import random
+import sqlite3
+from datetime import datetime, timedelta
+
+from repository.db_querys import CodeRepository, ALL_STATUSES, to_epoch_ms
+
+PREFIXES = ('CQ', 'CGF', 'CHW', 'TY', 'CAT', 'BAT', 'GF', 'BST', 'ST', 'HW', 'QC', 'TL')
+
+
+def synthetic_rows(rows: int, seed: int = 7):
+    """Genera tuplas (code, created_at, annotated, duplicate, status, image_path,
+    description, stock_per_box, stock_boxes, stock_remaining) con una distribución
+    parecida a la real."""
+    rnd = random.Random(seed)
+    base = datetime(2025, 1, 1)
+    for i in range(rows):
+        code = f"{rnd.choice(PREFIXES)}{rnd.randint(100, 99999999)}"
+        created = to_epoch_ms(base + timedelta(seconds=i * 37))
+        per_box = rnd.choice((None, 10, 25, 50, 100))
+        yield (
+            code, created, int(rnd.random() < 0.3), 0, rnd.choice(ALL_STATUSES),
+            None, f"Producto {i % 5000}", per_box,
+            rnd.randint(1, 10) if per_box else None,
+            rnd.randint(-5, 500) if per_box else None,
+        )
+
+
+def populate(repo: CodeRepository, rows: int, seed: int = 7) -> None:
+    """Llena la tabla codes directamente (sin pasar por add_codes) en lotes."""
+    batch = []
+    for row in synthetic_rows(rows, seed):
+        batch.append(row)
+        if len(batch) >= 50000:
+            _insert(repo.conn, batch)
+            batch = []
+    if batch:
+        _insert(repo.conn, batch)
+    repo.conn.commit()
+    repo.clear_cache()
+
+
+def _insert(conn: sqlite3.Connection, batch: list) -> None:
+    conn.executemany(
+        "INSERT INTO codes(code, created_at, annotated, duplicate, status, image_path, description, stock_per_box, stock_boxes, stock_remaining) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        batch,
+    )
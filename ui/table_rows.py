@@ -0,0 +1,159 @@
+"""Filas de CodesTableModel con los textos de la tabla ya calculados.
+
+Qt llama a data() varias veces por celda visible en cada repintado. CodeRow guarda
+los campos de list_codes en __slots__ (sin el dict por fila) junto con los textos
+de Fecha y Stock, calculados una sola vez al crear la fila; el tooltip se arma la
+primera vez que se pide y queda guardado. Las filas se reemplazan enteras cuando
+el registro de cambios trae una versión nueva, así que nunca quedan textos viejos.
+"""
+import functools
+from collections.abc import MutableSequence, Sequence
+from typing import Any, Iterable, List, Optional, Tuple
+
+from repository.db_querys import STATUS_LABELS, STATUS_DISPONIBLE, from_epoch_ms
+
+# Campos de list_codes (más 'archived' con include_archived)
+ROW_FIELDS = ('id', 'code', 'created_at', 'annotated', 'duplicate', 'status', 'image_path', 'description',
+              'stock_per_box', 'stock_boxes', 'stock_remaining', 'archived')
+
+
+def format_created_at(ms: int) -> str:
+    """Texto de la columna Fecha (resolución de minutos)."""
+    return _format_minute(ms // 60000)
+
+
+@functools.lru_cache(maxsize=65536)
+def _format_minute(minute: int) -> str:
+    # Las importaciones comparten minuto: cada uno se formatea una sola vez
+    return from_epoch_ms(minute * 60000).strftime('%d/%m/%Y %H:%M')
+
+
+def format_stock(per_box: Optional[int], boxes: Optional[int], remaining: Optional[int]) -> str:
+    """Formatea el stock como '250(5) - 700(1.7)' donde:
+    - 250 = cantidad por caja
+    - (5) = número de cajas
+    - 700 = cantidad restante
+    - (1.7) = cajas restantes calculadas (restante / por_caja)
+    """
+    if per_box is None or boxes is None:
+        return ''
+    # Si no hay remaining, mostrar solo total
+    if remaining is None:
+        return f"{per_box}({boxes}) - {per_box * boxes}({boxes})"
+    return f"{per_box}({boxes}) - {remaining}({remaining_boxes_text(per_box, remaining)})"
+
+
+def remaining_boxes_text(per_box: int, remaining: int) -> str:
+    """Cajas restantes: entero si es exacto, si no con un decimal."""
+    if per_box <= 0:
+        return "0"
+    remaining_boxes = remaining / per_box
+    if remaining_boxes == int(remaining_boxes):
+        return str(int(remaining_boxes))
+    return f"{remaining_boxes:.1f}"
+
+
+class CodeRow:
+    """Fila de la tabla. Se lee como un dict (row['code'], row.get('archived'))
+    para que filtros, exportación y diálogos no dependan de la representación."""
+
+    __slots__ = ROW_FIELDS + ('created_text', 'stock', 'stock_text', '_tooltip')
+
+    def __init__(self, values: Sequence) -> None:
+        # Mismo orden que ROW_FIELDS
+        (self.id, self.code, self.created_at, self.annotated, self.duplicate, self.status, self.image_path,
+         self.description, self.stock_per_box, self.stock_boxes, self.stock_remaining, self.archived) = values
+        self.created_text = format_created_at(self.created_at)
+        per_box, boxes, remaining = self.stock_per_box, self.stock_boxes, self.stock_remaining
+        # Tupla para StockDelegate (None si no hay stock cargado)
+        self.stock: Optional[Tuple[int, int, Optional[int]]] = (per_box, boxes, remaining) if per_box is not None and boxes is not None else None
+        self.stock_text = format_stock(per_box, boxes, remaining)
+        self._tooltip: Optional[str] = None
+
+    @classmethod
+    def from_record(cls, record) -> "CodeRow":
+        """Desde un sqlite3.Row o un dict con (al menos parte de) las claves de ROW_FIELDS."""
+        keys = record.keys()
+        return cls([record[name] if name in keys else None for name in ROW_FIELDS])
+
+    @property
+    def tooltip(self) -> str:
+        if self._tooltip is None:
+            status = self.status or STATUS_DISPONIBLE
+            archived = "\n(Archivado)" if self.archived else ""
+            self._tooltip = (f"Código: {self.code}\nDescripción: {self.description or 'Sin descripción'}\n"
+                             f"Stock: {self.stock_text or 'Sin stock'}\nEstado: {STATUS_LABELS.get(status, status)}{archived}")
+        return self._tooltip
+
+    # Acceso tipo dict ----------------------------------------------------------
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in ROW_FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return getattr(self, key) if key in ROW_FIELDS else default
+
+    def keys(self) -> Tuple[str, ...]:
+        return ROW_FIELDS
+
+    def __repr__(self) -> str:
+        return f"CodeRow(id={self.id}, code={self.code!r})"
+
+
+def make_rows(records: Iterable) -> List[CodeRow]:
+    """CodeRow para cada fila de una consulta; las columnas se ubican una sola vez."""
+    rows: List[CodeRow] = []
+    columns = None
+    for record in records:
+        if columns is None:
+            keys = list(record.keys())
+            columns = [keys.index(name) if name in keys else None for name in ROW_FIELDS]
+        rows.append(CodeRow([record[i] if i is not None else None for i in columns]))
+    return rows
+
+
+class LazyCodeRows(MutableSequence):
+    """Convierte las filas de una vista perezosa (CodesSnapshot.rows) en CodeRow al
+    leerlas, una sola vez por posición: con un millón de filas solo se pagan las visibles.
+    Admite los deltas de CodesTableModel.refresh(): insertar, quitar y reemplazar filas."""
+
+    def __init__(self, source) -> None:
+        self.source = source
+        self._cache = {}
+
+    def __len__(self) -> int:
+        return len(self.source)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        row = self._cache.get(i)
+        if row is None:
+            row = self._cache[i] = CodeRow.from_record(self.source[i])
+        return row
+
+    def __setitem__(self, i: int, row: CodeRow) -> None:
+        # Misma fila (mismo id) con datos nuevos: la posición en la instantánea no cambia
+        if i < 0:
+            i += len(self)
+        self._cache[i] = row
+
+    def __delitem__(self, i: int) -> None:
+        if i < 0:
+            i += len(self)
+        self.source.delete(i)
+        self._cache = {j - (j > i): row for j, row in self._cache.items() if j != i}
+
+    def insert(self, i: int, row: CodeRow) -> None:
+        if i < 0:
+            i += len(self)
+        self.source.insert(i, row['id'])
+        self._cache = {j + (j >= i): cached for j, cached in self._cache.items()}
+        self._cache[i] = row
+
+    def index_of(self, row_id: int) -> Optional[int]:
+        return self.source.index_of(row_id)
@@ -3,45 +3,87 @@
 # Bytecode version: 3.8.0rc1+ (3413)
 
 import re
-from typing import List, Optional
-from PyQt5.QtCore import Qt, QSize, QAbstractTableModel, QModelIndex, QVariant, QStringListModel, QTimer, QPoint
-from PyQt5.QtWidgets import QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QTableView, QLineEdit, QPushButton, QLabel, QCheckBox, QComboBox, QFileDialog, QMessageBox, QSplitter, QDialog, QFormLayout, QCompleter, QListView, QStyledItemDelegate, QFrame, QGridLayout, QSizeGrip
-from PyQt5.QtGui import QPixmap, QIcon, QColor, QPainter, QBrush, QPen, QFont
+import sqlite3
+import time
+from typing import Any, Callable, Dict, List, Optional
+from PyQt5.QtCore import Qt, QSize, QRect, QAbstractTableModel, QModelIndex, QVariant, QStringListModel, QTimer, QPoint, QEvent, QDate, QObject, QRunnable, QThreadPool, pyqtSignal
+from PyQt5.QtWidgets import QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QTableView, QLineEdit, QPushButton, QLabel, QCheckBox, QComboBox, QFileDialog, QMessageBox, QSplitter, QDialog, QFormLayout, QCompleter, QListView, QStyledItemDelegate, QFrame, QGridLayout, QSizeGrip, QMenu, QApplication, QDateEdit
+from PyQt5.QtGui import QPixmap, QIcon, QColor, QPainter, QBrush, QPen, QFont, QFontMetrics, QStaticText, QTransform
 from pathlib import Path
-from datetime import datetime
-from repository.db_querys import CodeRepository, STATUS_LABELS, ALL_STATUSES, STATUS_DISPONIBLE, STATUS_PENDIENTE, STATUS_PEDIDO, STATUS_PERDIDO, STATUS_NO_HAY_MAS, STATUS_ULTIMO, calculate_status_from_stock
-from modules.export_utils import export_to_csv
+from datetime import date, datetime, timedelta
+from repository.db_querys import CodeRepository, STATUS_LABELS, ALL_STATUSES, STATUS_DISPONIBLE, calculate_status_from_stock, row_matches_filters, natural_code_key, local_days_ms
+from repository.snapshot import CodesSnapshot, HAS_NUMPY
+from repository.archive import ArchiveJob
+from modules.export_utils import ExportJob, ask_export_path
+from modules.import_utils import ImportJob, MODE_INSERT, MODE_PREVIEW, MODE_UPSERT
+from modules.image_cache import ThumbnailLoader
+from modules.tiled_viewer import TiledImageView
+from ui.table_rows import CodeRow, LazyCodeRows, format_stock, make_rows, remaining_boxes_text
 from styles.styles import get_status_color, COLORS
 
 CODE_REGEX = re.compile('^[A-Z]{2,5}\\d{3,9}$')
 
 
 class StatusBadgeDelegate(QStyledItemDelegate):
-    """Delegate para mostrar el status como un badge con color."""
+    """Delegate para mostrar el status como un badge con color.
+
+    Cada badge se dibuja una sola vez en un QPixmap por (estado, tema, tamaño de
+    celda, device pixel ratio); paint() solo copia el pixmap. La caché se vacía
+    al cambiar el tema (set_theme) o el tamaño de las celdas."""
+
+    def __init__(self, parent=None) -> None:
+        super().__init__(parent)
+        self.theme = None
+        self._font = QFont()
+        self._font.setBold(True)
+        self._font.setPointSize(9)
+        self._cell = None
+        self._pixmaps: Dict[tuple, QPixmap] = {}
+
+    def set_theme(self, theme: str) -> None:
+        self.theme = theme
+        self._pixmaps.clear()
+
     def paint(self, painter: QPainter, option, index: QModelIndex):
         status = index.data(Qt.UserRole)
-        if status:
-            painter.save()
-            painter.setRenderHint(QPainter.Antialiasing)
-            color = QColor(get_status_color(status))
-            rect = option.rect.adjusted(8, 6, -8, -6)
-            painter.setBrush(QBrush(color))
-            painter.setPen(Qt.NoPen)
-            painter.drawRoundedRect(rect, 10, 10)
-            painter.setPen(QPen(QColor('#ffffff')))
-            font = QFont()
-            font.setBold(True)
-            font.setPointSize(9)
-            painter.setFont(font)
-            label = STATUS_LABELS.get(status, status)
-            painter.drawText(rect, Qt.AlignCenter, label)
-            painter.restore()
-        else:
+        if not status:
             super().paint(painter, option, index)
+            return
+        rect = option.rect
+        cell = (rect.width(), rect.height(), painter.device().devicePixelRatioF())
+        if cell != self._cell:
+            # Celdas de otro tamaño (columna redimensionada, otra pantalla): los badges ya no sirven
+            self._cell = cell
+            self._pixmaps.clear()
+        key = (status, self.theme) + cell
+        pixmap = self._pixmaps.get(key)
+        if pixmap is None:
+            pixmap = self._pixmaps[key] = self._render(status, *cell)
+        painter.drawPixmap(rect.topLeft(), pixmap)
+
+    def _render(self, status: str, width: int, height: int, ratio: float) -> QPixmap:
+        pixmap = QPixmap(max(1, round(width * ratio)), max(1, round(height * ratio)))
+        pixmap.setDevicePixelRatio(ratio)
+        pixmap.fill(Qt.transparent)
+        painter = QPainter(pixmap)
+        painter.setRenderHint(QPainter.Antialiasing)
+        rect = QRect(0, 0, width, height).adjusted(8, 6, -8, -6)
+        painter.setBrush(QBrush(QColor(get_status_color(status))))
+        painter.setPen(Qt.NoPen)
+        painter.drawRoundedRect(rect, 10, 10)
+        painter.setPen(QPen(QColor('#ffffff')))
+        painter.setFont(self._font)
+        painter.drawText(rect, Qt.AlignCenter, STATUS_LABELS.get(status, status))
+        painter.end()
+        return pixmap
 
 
 class StockDelegate(QStyledItemDelegate):
-    """Delegate para mostrar el stock con colores: azul para total, verde/rojo para restante."""
+    """Delegate para mostrar el stock con colores: azul para total, verde/rojo para restante.
+
+    Los textos de cada stock se preparan una sola vez como QStaticText (glifos ya
+    ubicados) junto con sus anchos y el color del restante; la caché se vacía al
+    cambiar el tema (set_theme) o la pantalla (device pixel ratio)."""
     
     # Colores
     COLOR_TOTAL = "#3b82f6"      # Azul para cantidad total (cajas)
@@ -49,87 +91,90 @@ class StockDelegate(QStyledItemDelegate):
     COLOR_REMAINING_LOW = "#f59e0b"  # Naranja para stock bajo (10-30%)
     COLOR_REMAINING_CRITICAL = "#ef4444"  # Rojo para stock crítico (<10%)
     COLOR_SEPARATOR = "#64748b"  # Gris para el separador
-    
+    # Stocks distintos recordados; al superarlo se empieza de nuevo
+    MAX_CACHED = 4096
+
+    def __init__(self, parent=None) -> None:
+        super().__init__(parent)
+        self.theme = None
+        self._font = QFont()
+        self._font.setBold(True)
+        self._font.setPointSize(9)
+        self._pens = {color: QPen(QColor(color)) for color in (
+            self.COLOR_TOTAL, self.COLOR_REMAINING_OK, self.COLOR_REMAINING_LOW,
+            self.COLOR_REMAINING_CRITICAL, self.COLOR_SEPARATOR)}
+        self._ratio = None
+        self._layouts: Dict[tuple, tuple] = {}
+        self._separator = None
+
+    def set_theme(self, theme: str) -> None:
+        self.theme = theme
+        self._layouts.clear()
+        self._separator = None
+
+    def _remaining_color(self, total: int, remaining: int) -> str:
+        # Determinar color del restante según porcentaje
+        if total > 0:
+            percentage = (remaining / total) * 100
+            if percentage > 30:
+                return self.COLOR_REMAINING_OK
+            elif percentage > 10:
+                return self.COLOR_REMAINING_LOW
+            return self.COLOR_REMAINING_CRITICAL
+        return self.COLOR_REMAINING_OK
+
+    def _static_text(self, text: str) -> QStaticText:
+        static = QStaticText(text)
+        static.setTextFormat(Qt.PlainText)
+        static.prepare(QTransform(), self._font)
+        return static
+
+    def _layout(self, stock: tuple) -> tuple:
+        """(total, ancho, restante, ancho, pen del restante) para un stock."""
+        per_box, boxes, remaining = stock
+        total = per_box * boxes
+        if remaining is None:
+            remaining = total
+        total_text = self._static_text(f"{per_box}({boxes})")
+        remaining_text = self._static_text(f"{remaining}({remaining_boxes_text(per_box, remaining)})")
+        pen = self._pens[self._remaining_color(total, remaining)]
+        return (total_text, round(total_text.size().width()), remaining_text, round(remaining_text.size().width()), pen)
+
     def paint(self, painter: QPainter, option, index: QModelIndex):
         # Obtener datos de stock del UserRole
         stock_data = index.data(Qt.UserRole + 1)  # Usamos UserRole+1 para stock
-        
-        if not stock_data:
+        if not stock_data or stock_data[0] is None or stock_data[1] is None:
             # Si no hay datos, dibujar normalmente
             super().paint(painter, option, index)
             return
-        
-        per_box, boxes, remaining = stock_data
-        
-        if per_box is None or boxes is None:
-            super().paint(painter, option, index)
-            return
-        
-        painter.save()
-        painter.setRenderHint(QPainter.Antialiasing)
-        
-        # Calcular el total y cajas restantes
-        total = per_box * boxes
-        if remaining is None:
-            remaining = total
-        
-        if per_box > 0:
-            remaining_boxes = remaining / per_box
-            if remaining_boxes == int(remaining_boxes):
-                remaining_boxes_str = str(int(remaining_boxes))
-            else:
-                remaining_boxes_str = f"{remaining_boxes:.1f}"
-        else:
-            remaining_boxes_str = "0"
-            remaining_boxes = 0
-        
-        # Determinar color del restante según porcentaje
-        if total > 0:
-            percentage = (remaining / total) * 100
-            if percentage > 30:
-                remaining_color = self.COLOR_REMAINING_OK
-            elif percentage > 10:
-                remaining_color = self.COLOR_REMAINING_LOW
-            else:
-                remaining_color = self.COLOR_REMAINING_CRITICAL
-        else:
-            remaining_color = self.COLOR_REMAINING_OK
-        
-        # Preparar textos
-        total_text = f"{per_box}({boxes})"
-        remaining_text = f"{remaining}({remaining_boxes_str})"
-        separator = " | "
-        
-        # Configurar fuente
-        font = QFont()
-        font.setBold(True)
-        font.setPointSize(9)
-        painter.setFont(font)
-        
-        # Calcular anchos de texto
-        fm = painter.fontMetrics()
-        total_width = fm.horizontalAdvance(total_text)
-        sep_width = fm.horizontalAdvance(separator)
-        remaining_width = fm.horizontalAdvance(remaining_text)
-        full_width = total_width + sep_width + remaining_width
-        
+
+        ratio = painter.device().devicePixelRatioF()
+        if ratio != self._ratio or self._separator is None:
+            self._ratio = ratio
+            self._layouts.clear()
+            self._separator = self._static_text(" | ")
+            metrics = QFontMetrics(self._font)
+            self._sep_width = round(self._separator.size().width())
+            self._text_height = metrics.height()
+        layout = self._layouts.get(stock_data)
+        if layout is None:
+            if len(self._layouts) >= self.MAX_CACHED:
+                self._layouts.clear()
+            layout = self._layouts[stock_data] = self._layout(stock_data)
+        total_text, total_width, remaining_text, remaining_width, remaining_pen = layout
+
         # Posición centrada
         rect = option.rect
-        start_x = rect.x() + (rect.width() - full_width) // 2
-        y = rect.y() + (rect.height() + fm.ascent() - fm.descent()) // 2
-        
-        # Dibujar texto del total (azul)
-        painter.setPen(QPen(QColor(self.COLOR_TOTAL)))
-        painter.drawText(start_x, y, total_text)
-        
-        # Dibujar separador (gris)
-        painter.setPen(QPen(QColor(self.COLOR_SEPARATOR)))
-        painter.drawText(start_x + total_width, y, separator)
-        
-        # Dibujar texto restante (color según porcentaje)
-        painter.setPen(QPen(QColor(remaining_color)))
-        painter.drawText(start_x + total_width + sep_width, y, remaining_text)
-        
+        x = rect.x() + (rect.width() - total_width - self._sep_width - remaining_width) // 2
+        y = rect.y() + (rect.height() - self._text_height) // 2
+        painter.save()
+        painter.setFont(self._font)
+        painter.setPen(self._pens[self.COLOR_TOTAL])
+        painter.drawStaticText(x, y, total_text)
+        painter.setPen(self._pens[self.COLOR_SEPARATOR])
+        painter.drawStaticText(x + total_width, y, self._separator)
+        painter.setPen(remaining_pen)
+        painter.drawStaticText(x + total_width + self._sep_width, y, remaining_text)
         painter.restore()
     
     def sizeHint(self, option, index):
@@ -142,6 +187,7 @@ class AutocompleteSearchEdit(QLineEdit):
         super().__init__(parent)
         self.repo = repo
         self.setPlaceholderText('Buscar por código o descripción...')
+        self.setToolTip('Texto: busca en código y descripción\nRango: "CQ 1000-2000" filtra por número dentro del prefijo')
         self.completer_model = QStringListModel()
         self.completer = QCompleter(self.completer_model, self)
         self.completer.setCaseSensitivity(Qt.CaseInsensitive)
@@ -565,7 +611,9 @@ class CodeDialog(QDialog):
 
 
 class ImagePreviewDialog(QDialog):
-    """Diálogo para mostrar imagen en tamaño grande."""
+    """Diálogo para mostrar imagen en tamaño grande, con zoom."""
+    VIEW_SIZE = QSize(800, 560)
+
     def __init__(self, image_path: str, code: str, parent=None):
         super().__init__(parent)
         self.setWindowFlags(Qt.FramelessWindowHint | Qt.Dialog)
@@ -596,6 +644,11 @@ class ImagePreviewDialog(QDialog):
         self.title_label.setObjectName('DialogTitleLabel')
         title_layout.addWidget(self.title_label)
         title_layout.addStretch()
+        self.zoom_label = QLabel('')
+        self.zoom_label.setObjectName('DialogTitleLabel')
+        self.zoom_label.setToolTip('Rueda o +/-: zoom · Arrastrar: mover · Doble clic o 0: ajustar')
+        title_layout.addWidget(self.zoom_label)
+        title_layout.addSpacing(12)
         main_layout.addWidget(self.title_bar)
         
         # Content
@@ -603,28 +656,43 @@ class ImagePreviewDialog(QDialog):
         content.setObjectName('DialogContent')
         content_layout = QVBoxLayout(content)
         content_layout.setContentsMargins(20, 20, 20, 20)
-        content_layout.setAlignment(Qt.AlignCenter)
         
-        # Image
+        # Image: versión reducida al instante y mosaicos en resolución completa al hacer zoom
+        self.image_view = TiledImageView()
+        self.image_view.zoomChanged.connect(lambda percent: self.zoom_label.setText(f'{percent}%'))
         self.image_label = QLabel()
         self.image_label.setAlignment(Qt.AlignCenter)
         if image_path and Path(image_path).exists():
-            pixmap = QPixmap(image_path)
-            if not pixmap.isNull():
-                # Scale to fit max 600x400 while keeping aspect ratio
-                scaled = pixmap.scaled(600, 400, Qt.KeepAspectRatio, Qt.SmoothTransformation)
-                self.image_label.setPixmap(scaled)
-            else:
+            if not self.image_view.open(image_path):
                 self.image_label.setText('Error al cargar imagen')
         else:
             self.image_label.setText('Imagen no disponible')
+        if self.image_label.text():
+            self.image_view.hide()
+            self.zoom_label.hide()
+        else:
+            self.image_label.hide()
+            self.image_view.setMinimumSize(self.VIEW_SIZE)
         
-        content_layout.addWidget(self.image_label)
-        main_layout.addWidget(content)
+        content_layout.addWidget(self.image_view, 1)
+        content_layout.addWidget(self.image_label, 1)
+        main_layout.addWidget(content, 1)
+        self.sizegrip = QSizeGrip(self)
+        self.sizegrip.setFixedSize(16, 16)
         
-        # Adjust dialog size based on image
         self.adjustSize()
         self.setMinimumSize(400, 300)
+        # El tamaño inicial queda como mínimo de la vista solo para adjustSize
+        self.image_view.setMinimumSize(200, 150)
+    
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self.sizegrip.move(self.width() - self.sizegrip.width(), self.height() - self.sizegrip.height())
+    
+    def done(self, result):
+        # Los mosaicos en curso emiten hacia la vista: se esperan antes de destruirla
+        self.image_view.shutdown()
+        super().done(result)
     
     def keyPressEvent(self, event):
         if event.key() == Qt.Key_Escape:
@@ -911,7 +979,87 @@ class DeveloperInfoDialog(QDialog):
         self._old_pos = None
 
 
+class _LoadSignals(QObject):
+    # seq, filas (CodeRow o LazyCodeRows), versión (del registro de cambios o de la instantánea) leída antes de consultar
+    finished = pyqtSignal(int, object, int)
+    failed = pyqtSignal(int, str)
+
+
+class _ListCodesTask(QRunnable):
+    """Ejecuta list_codes en un hilo del pool. Si mientras tanto se pidió otra carga
+    (is_current(seq) pasa a False) la consulta se interrumpe con un progress handler
+    de SQLite y el resultado se descarta."""
+
+    # Instrucciones de la VM de SQLite entre cada verificación de cancelación
+    CANCEL_CHECK_OPS = 10000
+
+    def __init__(self, repo: CodeRepository, seq: int, params: dict, is_current, signals: _LoadSignals) -> None:
+        super().__init__()
+        self.repo = repo
+        self.seq = seq
+        self.params = params
+        self.is_current = is_current
+        self.signals = signals
+
+    def run(self) -> None:
+        if not self.is_current(self.seq):
+            return
+        try:
+            with self.repo.reader() as conn:
+                conn.set_progress_handler(lambda: 0 if self.is_current(self.seq) else 1, self.CANCEL_CHECK_OPS)
+                try:
+                    version = self.repo.change_version()
+                    # Los textos de la tabla también se arman en el hilo del pool
+                    rows = make_rows(self.repo.list_codes(**self.params))
+                finally:
+                    conn.set_progress_handler(None, 0)
+        except sqlite3.Error as e:
+            if self.is_current(self.seq):
+                self.signals.failed.emit(self.seq, str(e))
+            return
+        if self.is_current(self.seq):
+            self.signals.finished.emit(self.seq, rows, version)
+
+
+class _SnapshotQueryTask(QRunnable):
+    """Filtra y ordena la instantánea en un hilo del pool. No la sincroniza: eso se
+    hace en el hilo de la interfaz, que es el que lee sus filas. El resultado va con
+    la versión de la instantánea leída antes de consultar; si al llegar ya no es la
+    vigente, el modelo lo descarta y vuelve a pedir la carga."""
+
+    def __init__(self, snapshot: CodesSnapshot, seq: int, params: dict, is_current, signals: _LoadSignals) -> None:
+        super().__init__()
+        self.snapshot = snapshot
+        self.seq = seq
+        self.params = params
+        self.is_current = is_current
+        self.signals = signals
+
+    def run(self) -> None:
+        if not self.is_current(self.seq):
+            return
+        version = self.snapshot.version
+        try:
+            rows = LazyCodeRows(self.snapshot.rows(self.snapshot.query(sync=False, **self.params)))
+        except Exception as e:
+            # Una excepción sin atrapar en un QRunnable cierra la aplicación
+            if self.is_current(self.seq):
+                self.signals.failed.emit(self.seq, str(e))
+            return
+        if self.is_current(self.seq):
+            self.signals.finished.emit(self.seq, rows, version)
+
+
 class CodesTableModel(QAbstractTableModel):
+    # Emitida cuando load()/load_async() dejan filas nuevas en el modelo
+    loaded = pyqtSignal()
+    # Emitida con el mensaje de error cuando falla una carga en segundo plano
+    load_failed = pyqtSignal(str)
+    # Con más cambios que esto es más barato recargar todo que aplicar deltas
+    MAX_INCREMENTAL_CHANGES = 200
+    # Desde esta cantidad de filas filtrar/ordenar se hace sobre la instantánea en memoria
+    SNAPSHOT_MIN_ROWS = 50000
+
     def __init__(self, repo: CodeRepository) -> None:
         super().__init__()
         self.repo = repo
@@ -922,47 +1070,253 @@ class CodesTableModel(QAbstractTableModel):
         self.status_filter = None
         self.order_by = 'created_at'
         self.order_dir = 'DESC'
+        self.version = 0
+        self.snapshot: Optional[CodesSnapshot] = None
+        self.include_archived = False
+        self.created_from: Optional[int] = None
+        self.created_to: Optional[int] = None
+        # Número de la última carga pedida: solo se aplica el resultado que coincide
+        self._load_seq = 0
+        self._applied_seq = 0
+        self._pool = QThreadPool(self)
+        self._pool.setMaxThreadCount(2)
+        self._signals = _LoadSignals(self)
+        self._signals.finished.connect(self._on_load_finished)
+        self._signals.failed.connect(self._on_load_failed)
+        # id -> posición en rows; las posiciones < _positions_valid son exactas (ver row_of)
+        self._positions: Dict[int, int] = {}
+        self._positions_valid = 0
+        self.modelReset.connect(self._reset_positions)
+        self._archived_font = QFont()
+        self._archived_font.setItalic(True)
+
+    def use_snapshot(self, enabled: bool) -> None:
+        """Activa/desactiva el filtrado y orden sobre CodesSnapshot en lugar de list_codes."""
+        self.snapshot = CodesSnapshot(self.repo) if enabled else None
+
+    def list_params(self) -> dict:
+        """Filtros y orden actuales como parámetros de list_codes/iter_codes."""
+        return dict(annotated=self.annotated_filter, duplicates_only=False, search=self.search_text, status=self.status_filter, order_by=self.order_by, order_dir=self.order_dir, include_archived=self.include_archived, created_from=self.created_from, created_to=self.created_to)
+
+    def _snapshot_params(self) -> dict:
+        """list_params() para CodesSnapshot.query (la instantánea no tiene archivados)."""
+        params = self.list_params()
+        del params['include_archived']
+        return params
+
+    def _is_current(self, seq: int) -> bool:
+        return seq == self._load_seq
 
     def load(self) -> None:
+        # Una carga síncrona invalida cualquier carga en segundo plano en curso
+        self._load_seq += 1
+        self._applied_seq = self._load_seq
         self.beginResetModel()
-        data = self.repo.list_codes(annotated=self.annotated_filter, duplicates_only=False, search=self.search_text, status=self.status_filter, order_by=self.order_by, order_dir=self.order_dir)
-        self.rows = [dict(r) for r in data]
+        if self.snapshot is not None and not self.include_archived:
+            positions = self.snapshot.query(**self._snapshot_params())
+            self.rows = LazyCodeRows(self.snapshot.rows(positions))
+            self.version = self.snapshot.version
+            self.endResetModel()
+            self.loaded.emit()
+            return
+        # Versión leída antes de la consulta: un cambio concurrente se vuelve a aplicar en refresh()
+        self.version = self.repo.change_version()
+        self.rows = make_rows(self.repo.list_codes(**self.list_params()))
         self.endResetModel()
-    
-    def _format_stock(self, row: dict) -> str:
-        """Formatea el stock como '250(5) - 700(1.7)' donde:
-        - 250 = cantidad por caja
-        - (5) = número de cajas
-        - 700 = cantidad restante
-        - (1.7) = cajas restantes calculadas (restante / por_caja)
-        """
-        per_box = row.get('stock_per_box')
-        boxes = row.get('stock_boxes')
-        remaining = row.get('stock_remaining')
-        
-        if per_box is None or boxes is None:
-            return ''
-        
-        # Total inicial: cantidad por caja * número de cajas
-        total = per_box * boxes
-        
-        # Si no hay remaining, mostrar solo total
-        if remaining is None:
-            return f"{per_box}({boxes}) - {total}({boxes})"
-        
-        # Calcular cajas restantes
-        if per_box > 0:
-            remaining_boxes = remaining / per_box
-            # Formatear con 1 decimal si tiene decimales, sino entero
-            if remaining_boxes == int(remaining_boxes):
-                remaining_boxes_str = str(int(remaining_boxes))
+        self.loaded.emit()
+
+    def load_async(self) -> None:
+        """Como load(), pero la consulta corre en un hilo del pool y las filas se
+        reemplazan de una vez al terminar. Cada llamada invalida a las anteriores:
+        siempre gana la última. Con la instantánea en memoria el pool solo filtra y
+        ordena; los cambios pendientes los aplica refresh()."""
+        self._load_seq += 1
+        if self.snapshot is not None and not self.include_archived:
+            self._pool.start(_SnapshotQueryTask(self.snapshot, self._load_seq, self._snapshot_params(), self._is_current, self._signals))
+            return
+        self._pool.start(_ListCodesTask(self.repo, self._load_seq, self.list_params(), self._is_current, self._signals))
+
+    def pending_load(self) -> bool:
+        """True mientras haya una carga en segundo plano sin aplicar."""
+        return self._applied_seq != self._load_seq
+
+    def _on_load_finished(self, seq: int, rows: list, version: int) -> None:
+        if seq != self._load_seq:
+            return  # llegó tarde: ya se pidió otra carga
+        if isinstance(rows, LazyCodeRows) and (rows.source.snapshot is not self.snapshot or version != self.snapshot.version):
+            # La instantánea se sincronizó mientras se consultaba: las posiciones pueden no valer
+            self.load_async()
+            return
+        self._applied_seq = seq
+        self.beginResetModel()
+        self.rows = rows
+        self.version = version
+        self.endResetModel()
+        self.loaded.emit()
+
+    def _on_load_failed(self, seq: int, message: str) -> None:
+        if seq == self._load_seq:
+            self._applied_seq = seq
+            self.load_failed.emit(message)
+
+    def _reset_positions(self) -> None:
+        self._positions = {}
+        self._positions_valid = 0
+
+    def _invalidate_positions(self, pos: int, removed_id: Optional[int] = None) -> None:
+        # Insertar o quitar en pos desplaza solo las filas siguientes
+        if removed_id is not None:
+            self._positions.pop(removed_id, None)
+        self._positions_valid = min(self._positions_valid, pos)
+
+    def row_of(self, code_id: int) -> Optional[int]:
+        """Posición en rows del código con ese id, o None si no está en la tabla.
+        O(1) mientras no cambie el orden; tras inserciones o borrados se reindexa
+        solo desde la primera fila desplazada."""
+        if isinstance(self.rows, LazyCodeRows):
+            return self.rows.index_of(code_id)
+        pos = self._positions.get(code_id)
+        if pos is not None and pos < self._positions_valid:
+            return pos
+        if self._positions_valid < len(self.rows):
+            for i in range(self._positions_valid, len(self.rows)):
+                self._positions[self.rows[i]['id']] = i
+            self._positions_valid = len(self.rows)
+            pos = self._positions.get(code_id)
+        return pos
+
+    def row_by_id(self, code_id: int) -> Optional[CodeRow]:
+        pos = self.row_of(code_id)
+        return self.rows[pos] if pos is not None else None
+
+    def refresh(self) -> bool:
+        """Aplica solo los cambios ocurridos desde la última carga (registro CDC del repositorio)
+        con rowsRemoved/rowsInserted/dataChanged en lugar de reiniciar el modelo. Las filas
+        con cambios aún en la cola de escritura diferida se releen con esos cambios
+        superpuestos, sin esperar el commit. Retorna True si hubo cambios."""
+        if self.include_archived:
+            # El registro de cambios solo cubre la tabla caliente: con archivados se recarga
+            if self.repo.change_version() == self.version:
+                return False
+            self.load()
+            return True
+        if self.snapshot is not None:
+            if self.version != self.snapshot.version or not isinstance(self.rows, LazyCodeRows):
+                # Filas de otra versión de la instantánea: sus deltas no alcanzan
+                self.load()
+                return True
+            changed = self.snapshot.sync(before_apply=self._keep_previous_rows)
+            if changed is None or len(changed) > self.MAX_INCREMENTAL_CHANGES:
+                self.load()
+                return True
+            pending = self.repo.pending_ids()
+            if not changed and not pending:
+                return False
+            for row_id in changed:
+                if row_id not in pending:
+                    self._apply_change(row_id, self.snapshot.get(row_id))
+            if pending:
+                fresh = self.repo.get_codes_by_ids(sorted(pending))
+                for row_id in pending:
+                    self._apply_change(row_id, fresh.get(row_id))
+            self.version = self.snapshot.version
+            return True
+        changes = self.repo.changes_since(self.version)
+        if changes is None or len(changes) > self.MAX_INCREMENTAL_CHANGES:
+            self.load()
+            return True
+        pending = self.repo.pending_ids()
+        if not changes and not pending:
+            return False
+        latest = {}
+        for change in changes:
+            latest[change['row_id']] = change['op']
+        for row_id in pending:
+            latest[row_id] = 'U'
+        fresh = self.repo.get_codes_by_ids([row_id for row_id, op in latest.items() if op != 'D'])
+        for row_id in latest:
+            self._apply_change(row_id, fresh.get(row_id))
+        if changes:
+            self.version = changes[-1]['version']
+        return True
+
+    def _keep_previous_rows(self, row_ids: List[int]) -> None:
+        # Las filas perezosas se leen de la instantánea: las que cambian se materializan
+        # antes del sync() para que _update_row compare con la clave de orden anterior
+        if len(row_ids) <= self.MAX_INCREMENTAL_CHANGES:
+            for row_id in row_ids:
+                pos = self.row_of(row_id)
+                if pos is not None:
+                    self.rows[pos]
+
+    def _apply_change(self, row_id: int, row) -> None:
+        """Quita, actualiza o inserta la fila con ese id según su valor actual (None: ya no está)."""
+        pos = self.row_of(row_id)
+        keep = row is not None and self._matches(row)
+        if pos is not None and not keep:
+            self._remove_row(pos)
+        elif pos is not None:
+            self._update_row(pos, CodeRow.from_record(row))
+        elif keep:
+            self._insert_sorted(CodeRow.from_record(row))
+
+    def _matches(self, row) -> bool:
+        return row_matches_filters(row, annotated=self.annotated_filter, search=self.search_text, status=self.status_filter,
+                                   created_from=self.created_from, created_to=self.created_to)
+
+    def _sort_key(self, row: CodeRow):
+        # Mismo orden que list_codes, que a igual clave desempata por id en la misma dirección
+        if self.order_by == 'code':
+            return (natural_code_key(row['code']), row['id'])
+        # NULL va primero, como en SQLite, sin comparar None con el tipo de la columna
+        value = row.get(self.order_by)
+        return ((value is not None, value), row['id'])
+
+    def _remove_row(self, pos: int) -> None:
+        self.beginRemoveRows(QModelIndex(), pos, pos)
+        removed = self.rows.pop(pos)
+        self._invalidate_positions(pos, removed['id'])
+        self.endRemoveRows()
+
+    def _sorted_position(self, row: CodeRow) -> int:
+        key = self._sort_key(row)
+        descending = self.order_dir == 'DESC'
+        lo, hi = 0, len(self.rows)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            mid_key = self._sort_key(self.rows[mid])
+            if (mid_key > key) if descending else (mid_key < key):
+                lo = mid + 1
             else:
-                remaining_boxes_str = f"{remaining_boxes:.1f}"
-        else:
-            remaining_boxes_str = "0"
-        
-        return f"{per_box}({boxes}) - {remaining}({remaining_boxes_str})"
+                hi = mid
+        return lo
 
+    def _insert_sorted(self, row: CodeRow) -> None:
+        lo = self._sorted_position(row)
+        self.beginInsertRows(QModelIndex(), lo, lo)
+        self.rows.insert(lo, row)
+        self._invalidate_positions(lo)
+        self.endInsertRows()
+
+    def _update_row(self, pos: int, row: CodeRow) -> None:
+        """Reemplaza la fila en pos. Si cambió su clave de orden la mueve con
+        beginMoveRows, así la selección la acompaña."""
+        if self._sort_key(row) != self._sort_key(self.rows[pos]):
+            old = self.rows.pop(pos)
+            target = self._sorted_position(row)
+            self.rows.insert(pos, old)
+            # beginMoveRows recibe el destino en posiciones previas a quitar la fila
+            dest = target if target <= pos else target + 1
+            if dest not in (pos, pos + 1):
+                self.beginMoveRows(QModelIndex(), pos, pos, QModelIndex(), dest)
+                del self.rows[pos]
+                self.rows.insert(target, row)
+                self._invalidate_positions(min(pos, target))
+                self.endMoveRows()
+                pos = target
+        self.rows[pos] = row
+        self.dataChanged.emit(self.index(pos, 0), self.index(pos, self.columnCount() - 1))
+    
     def rowCount(self, parent: QModelIndex=QModelIndex()) -> int:
         return len(self.rows)
 
@@ -978,40 +1332,27 @@ class CodesTableModel(QAbstractTableModel):
             if col == 0:
                 return index.row() + 1
             elif col == 1:
-                return row['code']
+                return row.code
             elif col == 2:
-                return row.get('description') or ''
+                return row.description or ''
             elif col == 3:
                 # El delegate se encarga de renderizar, pero retornamos texto para fallback
-                return self._format_stock(row)
+                return row.stock_text
             elif col == 4:
-                try:
-                    dt = datetime.fromisoformat(row['created_at'])
-                    return dt.strftime('%d/%m/%Y %H:%M')
-                except:
-                    return row['created_at']
+                return row.created_text
             elif col == 5:
                 return ''
         if role == Qt.UserRole and col == 5:
-            return row.get('status', STATUS_DISPONIBLE)
+            return row.status
         # Pasar datos de stock al StockDelegate
         if role == Qt.UserRole + 1 and col == 3:
-            per_box = row.get('stock_per_box')
-            boxes = row.get('stock_boxes')
-            remaining = row.get('stock_remaining')
-            if per_box is not None and boxes is not None:
-                return (per_box, boxes, remaining)
-            return None
-        if role == Qt.TextAlignmentRole and col == 0:
-            return Qt.AlignCenter
-        if role == Qt.TextAlignmentRole and col == 3:
+            return row.stock
+        if role == Qt.TextAlignmentRole and (col == 0 or col == 3):
             return Qt.AlignCenter
+        if role == Qt.FontRole and row.archived:
+            return self._archived_font
         if role == Qt.ToolTipRole:
-            status = row.get('status', STATUS_DISPONIBLE)
-            status_label = STATUS_LABELS.get(status, status)
-            desc = row.get('description') or 'Sin descripción'
-            stock = self._format_stock(row) or 'Sin stock'
-            return f"Código: {row['code']}\nDescripción: {desc}\nStock: {stock}\nEstado: {status_label}"
+            return row.tooltip
         return QVariant()
 
     def flags(self, index: QModelIndex):
@@ -1026,6 +1367,15 @@ class CodesTableModel(QAbstractTableModel):
 
 
 class MainWindow(QMainWindow):
+    # Mantenimiento de la base: segundos sin teclado/ratón para considerar ociosa la app
+    IDLE_SECONDS = 60
+    MAINTENANCE_POLL_MS = 30000
+    # Pausa de tecleo tras la cual se consulta la búsqueda
+    SEARCH_DEBOUNCE_MS = 250
+    # Vista previa: tamaño de la miniatura y filas vecinas que se precargan
+    PREVIEW_SIZE = QSize(280, 135)
+    PREFETCH_ROWS = 3
+
     def __init__(self, repo: CodeRepository, home_path, initial_theme: str='Claro', user_role: str='user', username: str='user') -> None:
         super().__init__()
         self.repo = repo
@@ -1147,7 +1497,13 @@ class MainWindow(QMainWindow):
         self.btn_export_csv = QPushButton('Exportar CSV')
         self.btn_export_csv.setIcon(QIcon(f'{actions_path}/export.png'))
         self.btn_export_csv.setIconSize(icon_size)
-        for btn in [self.btn_add, self.btn_edit, self.btn_delete, self.btn_import, self.btn_export_csv]:
+        self.btn_backup = QPushButton('Respaldo')
+        self.btn_backup.setToolTip('Respaldo en línea de la base de datos')
+        backup_menu = QMenu(self.btn_backup)
+        backup_menu.addAction('Crear respaldo ahora', self.on_backup)
+        self.action_restore = backup_menu.addAction('Restaurar respaldo...', self.on_restore_backup)
+        self.btn_backup.setMenu(backup_menu)
+        for btn in [self.btn_add, self.btn_edit, self.btn_delete, self.btn_import, self.btn_export_csv, self.btn_backup]:
             toolbar.addWidget(btn)
         toolbar.addStretch()
         
@@ -1242,8 +1598,11 @@ class MainWindow(QMainWindow):
         filters.setSpacing(16)
         self.chk_anotados = QCheckBox('Editados')
         self.chk_no_anotados = QCheckBox('No Editados')
+        self.chk_archivados = QCheckBox('Archivados')
+        self.chk_archivados.setToolTip('Incluir códigos archivados (agotados o perdidos antiguos)')
         filters.addWidget(self.chk_anotados)
         filters.addWidget(self.chk_no_anotados)
+        filters.addWidget(self.chk_archivados)
         sep = QFrame()
         sep.setFrameShape(QFrame.VLine)
         sep.setStyleSheet(f"color: {COLORS['border_dark']};")
@@ -1255,6 +1614,13 @@ class MainWindow(QMainWindow):
             self.status_filter.addItem(STATUS_LABELS[st], st)
         self.status_filter.setFixedWidth(140)
         filters.addWidget(self.status_filter)
+        filters.addWidget(QLabel('Fecha:'))
+        self.date_filter = QComboBox()
+        for label, key in (('Todas', None), ('Hoy', 'today'), ('Esta semana', 'week'), ('Rango...', 'range')):
+            self.date_filter.addItem(label, key)
+        self.date_filter.setFixedWidth(120)
+        self._date_range = (date.today(), date.today())
+        filters.addWidget(self.date_filter)
         filters.addStretch()
         filters.addWidget(QLabel('Orden:'))
         self.sort = QComboBox()
@@ -1275,6 +1641,9 @@ class MainWindow(QMainWindow):
         splitter = QSplitter()
         self.table = QTableView()
         self.table_model = CodesTableModel(repo)
+        # Product photos are decoded off the GUI thread, scaled at decode time and cached
+        self.thumbnails = ThumbnailLoader(self.repo.db_path.parent / 'thumbnails', self)
+        self.thumbnails.ready.connect(self._on_thumbnail_ready)
         self.table.setModel(self.table_model)
         self.table.setSelectionBehavior(QTableView.SelectRows)
         self.table.setAlternatingRowColors(True)
@@ -1397,19 +1766,73 @@ class MainWindow(QMainWindow):
         self.theme_toggle.currentTextChanged.connect(self.on_theme_changed)
         self.chk_anotados.stateChanged.connect(self.on_filters_changed)
         self.chk_no_anotados.stateChanged.connect(self.on_filters_changed)
+        self.chk_archivados.stateChanged.connect(self.on_filters_changed)
         self.status_filter.currentIndexChanged.connect(self.on_filters_changed)
-        self.search.textChanged.connect(self.on_filters_changed)
+        self.date_filter.activated.connect(self.on_date_filter_activated)
+        # Búsqueda con debounce: la consulta sale recién cuando se deja de escribir
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(self.SEARCH_DEBOUNCE_MS)
+        self.search_timer.timeout.connect(self.on_filters_changed)
+        self._select_first_on_load = False
+        self.search.textChanged.connect(self.search_timer.start)
+        self.table_model.loaded.connect(self._on_table_loaded)
+        self.table_model.load_failed.connect(self._on_table_load_failed)
+        self.table_model.modelAboutToBeReset.connect(self._remember_view)
+        self.table_model.dataChanged.connect(self._on_rows_changed)
+        # Track selected code for preview
+        self._selected_code_id = None
+        self._reselect_id = None
+        self._reselect_scroll = 0
         self.sort.currentTextChanged.connect(self.on_sort_changed)
         self.table.doubleClicked.connect(self.on_edit)
         self.table.selectionModel().selectionChanged.connect(self.on_selection_changed)
+        if HAS_NUMPY and self.repo.stats()['total'] >= CodesTableModel.SNAPSHOT_MIN_ROWS:
+            self.table_model.use_snapshot(True)
         self.table_model.load()
         self._update_column_widths()
         self._update_stats()
         self.theme_toggle.setCurrentText('Claro' if initial_theme == 'Claro' else 'Oscuro')
         # Apply role-based access control
         self._apply_role_permissions()
-        # Track selected code for preview
-        self._selected_code_id = None
+        # Poll the change log so edits made from other stations show up without a full reload
+        self._dropped_rows_seen = 0
+        self.sync_timer = QTimer(self)
+        self.sync_timer.timeout.connect(self._sync_external_changes)
+        self.sync_timer.start(3000)
+        # Archivado periódico de códigos fríos, en pocos lotes por vez y en un hilo aparte
+        self.archiver = ArchiveJob(self.repo, max_batches=10)
+        self.archive_poll_timer = QTimer(self)
+        self.archive_poll_timer.timeout.connect(self._poll_archive)
+        self.archive_timer = QTimer(self)
+        self.archive_timer.timeout.connect(self._archive_cold_codes)
+        self.archive_timer.start(30 * 60 * 1000)
+        QTimer.singleShot(60 * 1000, self._archive_cold_codes)
+        # Respaldos: uno automático si el último tiene más de BackupPolicy.interval_hours
+        self.backups = self.repo.backup_service()
+        # Importación de archivos en segundo plano; el avance se muestra en el botón
+        self.importer = ImportJob(self.repo)
+        self.import_progress_timer = QTimer(self)
+        self.import_progress_timer.timeout.connect(self._poll_import)
+        # Exportación a CSV leyendo la base por lotes, también con el avance en el botón
+        self.exporter = ExportJob(self.repo, STATUS_LABELS)
+        self.export_progress_timer = QTimer(self)
+        self.export_progress_timer.timeout.connect(self._poll_export)
+        self._backup_notify = False
+        self.backup_progress_timer = QTimer(self)
+        self.backup_progress_timer.timeout.connect(self._poll_backup)
+        self.backup_check_timer = QTimer(self)
+        self.backup_check_timer.timeout.connect(self._backup_if_due)
+        self.backup_check_timer.start(60 * 60 * 1000)
+        QTimer.singleShot(2 * 60 * 1000, self._backup_if_due)
+        # Mantenimiento por pasos cortos mientras el usuario no interactúa
+        self.maintenance = self.repo.maintenance_scheduler()
+        self._last_input = time.monotonic()
+        self._maintenance_error: Optional[str] = None
+        QApplication.instance().installEventFilter(self)
+        self.maintenance_timer = QTimer(self)
+        self.maintenance_timer.timeout.connect(self._idle_maintenance)
+        self.maintenance_timer.start(self.MAINTENANCE_POLL_MS)
 
     def _toggle_max_restore(self):
         if self.isMaximized():
@@ -1455,6 +1878,133 @@ class MainWindow(QMainWindow):
         # Columna 4 (Fecha) se ajusta al contenido
         self.table.setColumnWidth(5, 110)        # Estado
 
+    def _save(self, write: Callable[[], Any]) -> bool:
+        """Ejecuta una escritura del repositorio. Si falla (base bloqueada, la cola de
+        escritura diferida no confirmó a tiempo) avisa en lugar de cerrar la aplicación."""
+        try:
+            write()
+        except sqlite3.Error as e:
+            QMessageBox.warning(self, 'Error al guardar', f'No se guardó el cambio:\n{e}')
+            return False
+        return True
+
+    def _report_dropped_writes(self) -> None:
+        """Avisa si la cola de escritura diferida descartó cambios tras varios fallos."""
+        metrics = self.repo.write_metrics()
+        dropped = metrics.get('dropped_rows', 0)
+        if dropped <= self._dropped_rows_seen:
+            return
+        lost, self._dropped_rows_seen = dropped - self._dropped_rows_seen, dropped
+        # La tabla los mostraba como hechos: se vuelve a lo confirmado
+        self.table_model.load()
+        QMessageBox.warning(self, 'Error al guardar',
+                            f'No se pudieron guardar {lost} cambios:\n{metrics.get("last_error")}')
+
+    def _sync_external_changes(self):
+        """Aplica los cambios confirmados por otras conexiones desde el último refresco."""
+        self._report_dropped_writes()
+        if self.repo.change_version() == self.table_model.version:
+            return
+        if self.table_model.refresh():
+            self._update_column_widths()
+            self._update_stats()
+
+    def _archive_cold_codes(self):
+        """Mueve a codes_archive los códigos agotados/perdidos antiguos (ver ArchivePolicy)."""
+        if self.archiver.start():
+            self.archive_poll_timer.start(500)
+
+    def _poll_archive(self):
+        if self.archiver.running():
+            return
+        self.archive_poll_timer.stop()
+        if self.archiver.last_error:
+            QMessageBox.warning(self, 'Archivo', f'No se pudieron archivar los códigos antiguos:\n{self.archiver.last_error}')
+            return
+        result = self.archiver.last_result
+        if result is not None and result.moved:
+            self._sync_external_changes()
+
+    def closeEvent(self, event):
+        # El lote de archivado en curso termina antes de que main.py cierre el repositorio
+        self.archiver.cancel()
+        self.archiver.wait()
+        super().closeEvent(event)
+
+    def _backup_if_due(self):
+        if self.backups.due():
+            self._start_backup(notify=False)
+
+    def _start_backup(self, notify: bool) -> None:
+        if not self.backups.start():
+            return
+        self._backup_notify = notify
+        self.backup_progress_timer.start(250)
+
+    def _poll_backup(self):
+        """Muestra el avance del respaldo en curso en el botón y avisa al terminar."""
+        done, total = self.backups.progress()
+        if self.backups.running():
+            percent = int(done * 100 / total) if total else 0
+            self.btn_backup.setText(f'Respaldo {percent}%')
+            return
+        self.backup_progress_timer.stop()
+        self.btn_backup.setText('Respaldo')
+        error, result = self.backups.last_error, self.backups.last_result
+        if error:
+            QMessageBox.warning(self, 'Respaldo', f'No se pudo crear el respaldo:\n{error}')
+        elif self._backup_notify and result is not None:
+            QMessageBox.information(self, 'Respaldo',
+                                    f'Respaldo creado: {result.path.name}\n'
+                                    f'{result.size_bytes / 1024 / 1024:.1f} MB en {result.duration_ms / 1000:.1f} s')
+
+    def on_backup(self) -> None:
+        self._start_backup(notify=True)
+
+    def on_restore_backup(self) -> None:
+        """Reemplaza la base por un respaldo verificado (solo admin)."""
+        path, _ = QFileDialog.getOpenFileName(self, 'Restaurar respaldo', str(self.backups.directory),
+                                              'Respaldos (*.db *.db.gz)')
+        if not path:
+            return
+        answer = QMessageBox.question(self, 'Restaurar respaldo',
+                                      f'Se reemplazarán todos los datos actuales por los de {Path(path).name}.\n¿Continuar?')
+        if answer != QMessageBox.Yes:
+            return
+        QApplication.setOverrideCursor(Qt.WaitCursor)
+        try:
+            result = self.repo.restore_backup(Path(path))
+        except (sqlite3.Error, OSError) as e:
+            QApplication.restoreOverrideCursor()
+            QMessageBox.critical(self, 'Restaurar respaldo', f'No se restauró el respaldo:\n{e}')
+            return
+        self._sync_external_changes()
+        QApplication.restoreOverrideCursor()
+        QMessageBox.information(self, 'Restaurar respaldo',
+                                f'Respaldo restaurado en {result.duration_ms / 1000:.1f} s')
+
+    def eventFilter(self, obj, event):
+        if event.type() in (QEvent.KeyPress, QEvent.MouseButtonPress, QEvent.Wheel):
+            self._last_input = time.monotonic()
+        return super().eventFilter(obj, event)
+
+    def _idle_maintenance(self):
+        """Un paso acotado de MaintenanceScheduler si la app está ociosa; mientras quede
+        trabajo se reprograma enseguida, cualquier tecla o clic lo posterga."""
+        if time.monotonic() - self._last_input < self.IDLE_SECONDS or self.backups.running():
+            self.maintenance_timer.setInterval(self.MAINTENANCE_POLL_MS)
+            return
+        try:
+            more = self.maintenance.step()
+            self._maintenance_error = None
+        except sqlite3.Error as e:
+            # Se reintenta en cada pausa: el mismo error (p. ej. base bloqueada) se avisa una vez
+            if str(e) != self._maintenance_error:
+                self._maintenance_error = str(e)
+                QMessageBox.warning(self, 'Mantenimiento', f'Error en el mantenimiento de la base:\n{e}')
+            more = False
+        self.maintenance_timer.setInterval(200 if more else self.MAINTENANCE_POLL_MS)
+
     def _update_stats(self):
         """Actualiza las estadísticas en el panel lateral."""
         stats = self.repo.stats()
@@ -1492,17 +2042,36 @@ class MainWindow(QMainWindow):
         # Update code label
         self.preview_code_label.setText(f'{self._selected_code} - {status_label}')
         
-        # Try to load image
-        if self._selected_image_path and Path(self._selected_image_path).exists():
-            pixmap = QPixmap(self._selected_image_path)
-            if not pixmap.isNull():
-                scaled = pixmap.scaled(280, 135, Qt.KeepAspectRatio, Qt.SmoothTransformation)
-                self.preview_image.setPixmap(scaled)
-                self.preview_image.setStyleSheet('')
-                # Has image: show "Ver Imagen" button for everyone
-                self.btn_set_image.setText('Ver Imagen')
-                self.btn_set_image.setEnabled(True)
-                return
+        # Load the thumbnail: cached previews show up at once, the rest arrive via _on_thumbnail_ready
+        if self._selected_image_path:
+            pixmap = self.thumbnails.request(self._selected_image_path, self.PREVIEW_SIZE, self.preview_image.devicePixelRatioF())
+            if pixmap is None:
+                self._show_preview_loading()
+            else:
+                self._show_preview_pixmap(pixmap)
+        else:
+            self._show_preview_pixmap(QPixmap())
+        self._prefetch_previews()
+
+    def _show_preview_loading(self):
+        self.preview_image.clear()
+        self.preview_image.setText('Cargando imagen...')
+        self.preview_image.setStyleSheet(f'''
+            color: {COLORS['text_muted']};
+            font-size: 12px;
+            font-style: italic;
+        ''')
+        self.btn_set_image.setText('Ver Imagen')
+        self.btn_set_image.setEnabled(False)
+
+    def _show_preview_pixmap(self, pixmap: QPixmap):
+        if not pixmap.isNull():
+            self.preview_image.setPixmap(pixmap)
+            self.preview_image.setStyleSheet('')
+            # Has image: show "Ver Imagen" button for everyone
+            self.btn_set_image.setText('Ver Imagen')
+            self.btn_set_image.setEnabled(True)
+            return
         
         # No image available
         self.preview_image.clear()
@@ -1515,6 +2084,21 @@ class MainWindow(QMainWindow):
         # No image: only admin can assign
         self.btn_set_image.setText('Asignar Imagen')
         self.btn_set_image.setEnabled(self.user_role == 'admin')
+
+    def _on_thumbnail_ready(self, path: str, pixmap: QPixmap):
+        # A slow decode may finish after the selection moved on
+        if path == getattr(self, '_selected_image_path', None) and self._selected_code_id is not None:
+            self._show_preview_pixmap(pixmap)
+
+    def _prefetch_previews(self):
+        """Queue the thumbnails of the rows around the selection, for arrow-key browsing."""
+        pos = self.table_model.row_of(self._selected_code_id) if self._selected_code_id is not None else None
+        if pos is None:
+            return
+        rows = self.table_model.rows
+        first, last = max(0, pos - self.PREFETCH_ROWS), min(len(rows), pos + self.PREFETCH_ROWS + 1)
+        paths = [rows[i].get('image_path') for i in range(first, last) if i != pos]
+        self.thumbnails.prefetch([p for p in paths if p], self.PREVIEW_SIZE, self.preview_image.devicePixelRatioF())
     
     def on_selection_changed(self, selected, deselected):
         """Maneja el cambio de selección en la tabla."""
@@ -1552,217 +2136,154 @@ class MainWindow(QMainWindow):
             return
         
         # Update database
-        self.repo.update_image_path(self._selected_code_id, path)
-        
-        # Reload table and update preview
-        self.table_model.load()
+        if not self._save(lambda: self.repo.update_image_path(self._selected_code_id, path)):
+            return
+        # The file may have been replaced under the same name
+        self.thumbnails.forget(path, self.PREVIEW_SIZE, self.preview_image.devicePixelRatioF())
         
-        # Find and select the same row again
-        for i, row in enumerate(self.table_model.rows):
-            if row['id'] == self._selected_code_id:
-                self._update_preview(row)
-                break
+        # Apply the change to the table; the preview follows through dataChanged
+        self.table_model.refresh()
 
     def on_import_file(self) -> None:
-        """Importa códigos desde archivo TXT o CSV."""
+        """Importa códigos desde archivo TXT o CSV, en segundo plano (ver modules/import_utils.py).
+        Primero se calcula el resumen (nuevos, stock actualizado, sin cambios) y el usuario
+        elige si solo agregar los nuevos o también actualizar el stock. Mientras corre, el
+        botón muestra el avance y permite cancelarla."""
+        if self.importer.running():
+            if self.importer.cancelled():
+                return
+            reply = QMessageBox.question(self, 'Importación', '¿Cancelar la importación? No se importará ningún código.',
+                                         QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
+            if reply == QMessageBox.Yes:
+                self.importer.cancel()
+                self.btn_import.setText('Cancelando...')
+            return None
         path, _ = QFileDialog.getOpenFileName(self, 'Seleccionar archivo', '', 'Archivos soportados (*.txt *.csv);;Text Files (*.txt);;CSV Files (*.csv)')
         if not path:
             return None
-        p = Path(path)
-        ext = p.suffix.lower()
-        items = []
-        if ext == '.csv':
-            items = self._import_csv(p)
+        self._start_import(Path(path), MODE_PREVIEW)
+
+    def _start_import(self, path: Path, mode: str) -> None:
+        if self.importer.start(path, mode):
+            self.btn_import.setText('Analizando 0%' if mode == MODE_PREVIEW else 'Importando 0%')
+            self.import_progress_timer.start(250)
+
+    def _poll_import(self):
+        """Muestra el avance de la importación en el botón y el resultado al terminar."""
+        mode = self.importer.mode
+        if self.importer.running():
+            if not self.importer.cancelled():
+                progress = self.importer.progress()
+                self.btn_import.setText(f"{'Analizando' if mode == MODE_PREVIEW else 'Importando'} {progress.percent}%")
+                imported = f', {progress.imported} importadas' if mode == MODE_INSERT else ''
+                self.btn_import.setToolTip(f'{progress.rows} filas leídas{imported} '
+                                           f'({progress.rows_per_second:.0f} filas/s). Clic para cancelar.')
+            return
+        self.import_progress_timer.stop()
+        self.btn_import.setText('Importar')
+        self.btn_import.setToolTip('')
+        error, result = self.importer.last_error, self.importer.last_result
+        if error:
+            QMessageBox.warning(self, 'Error de importación', f'Error al importar {self.importer.path.name}: {error}\n\nNo se importó ningún código.')
+            return
+        if result is None or result.cancelled:
+            QMessageBox.information(self, 'Importación', 'Importación cancelada. No se importó ningún código.')
+            return
+        if mode == MODE_PREVIEW:
+            self._confirm_import(result.plan)
+        elif mode == MODE_UPSERT:
+            self._import_finished(result.plan.inserts, result.plan.missing_images, result.duration_ms,
+                                  f'\nStock actualizado en {result.plan.updates} códigos '
+                                  f'({result.plan.status_changes} cambios de estado).' if result.plan.updates else '')
+        elif not result.imported:
+            message = 'Todos los códigos ya existían.' if result.existing_count else 'No se encontraron códigos válidos.'
+            QMessageBox.information(self, 'Importación', message)
         else:
-            items = self._import_txt(p)
-        if not items:
+            self._import_finished(result.imported, result.missing_images, result.duration_ms,
+                                  f'\n{result.existing_count} códigos ya existían y no se importaron.' if result.existing_count else '')
+
+    def _confirm_import(self, plan) -> None:
+        """Muestra el resumen de la simulación y lanza la importación elegida."""
+        if not plan.staged:
             QMessageBox.information(self, 'Importación', 'No se encontraron códigos válidos.')
-            return None
-        codes_to_import = [item[0] for item in items]
-        existing = self.repo.codes_exist(codes_to_import)
-        if existing:
-            items = [item for item in items if item[0] not in existing]
-            dup_list = ', '.join(existing[:10])
-            if len(existing) > 10:
-                dup_list += f'... y {len(existing) - 10} más'
-            QMessageBox.warning(self, 'Códigos duplicados', f'Los siguientes códigos ya existen y no se importarán:\n\n{dup_list}')
-        if not items:
-            QMessageBox.information(self, 'Importación', 'Todos los códigos ya existían.')
-            return None
-        self.repo.add_codes(items)
-        self.table_model.load()
+            return
+        if not plan.inserts and not plan.updates:
+            QMessageBox.information(self, 'Importación', f'Sin cambios: los {plan.staged} códigos ya existen con el mismo stock.')
+            return
+        lines = [f'Códigos en el archivo: {plan.staged}',
+                 f'Nuevos: {plan.inserts}',
+                 f'Con stock distinto: {plan.updates} ({plan.status_changes} cambios de estado)',
+                 f'Sin cambios: {plan.unchanged}']
+        if plan.sample:
+            lines.append('')
+            for change in plan.sample:
+                old_status = STATUS_LABELS.get(change.old_status, change.old_status)
+                new_status = STATUS_LABELS.get(change.new_status, change.new_status)
+                status = f', {old_status} → {new_status}' if change.old_status != change.new_status else ''
+                lines.append(f'{change.code}: {format_stock(*change.old_stock) or "sin stock"} → {format_stock(*change.new_stock)}{status}')
+            if plan.updates > len(plan.sample):
+                lines.append(f'... y {plan.updates - len(plan.sample)} más')
+        box = QMessageBox(QMessageBox.Question, 'Importación', '\n'.join(lines), parent=self)
+        btn_upsert = box.addButton('Agregar y actualizar stock', QMessageBox.AcceptRole) if plan.updates else None
+        btn_insert = box.addButton('Solo agregar nuevos', QMessageBox.AcceptRole) if plan.inserts else None
+        box.addButton('Cancelar', QMessageBox.RejectRole)
+        box.exec_()
+        if box.clickedButton() is btn_upsert and btn_upsert is not None:
+            self._start_import(self.importer.path, MODE_UPSERT)
+        elif box.clickedButton() is btn_insert and btn_insert is not None:
+            self._start_import(self.importer.path, MODE_INSERT)
+
+    def _import_finished(self, imported: int, missing_images: int, duration_ms: float, details: str) -> None:
+        self.table_model.refresh()
         self._update_column_widths()
         self._update_stats()
-        QMessageBox.information(self, 'Importación exitosa', f'Importados {len(items)} códigos.')
-
-    def _import_txt(self, path: Path) -> list:
-        """Importa códigos desde un archivo TXT (un código por línea)."""
-        lines = path.read_text(encoding='utf-8', errors='ignore').splitlines()
-        items = []
-        for ln in lines:
-            s = ln.strip().upper()
-            if not s:
-                continue
-            if not CODE_REGEX.match(s):
-                continue
-            items.append((s, False, datetime.utcnow(), STATUS_DISPONIBLE))
-        return items
-
-    def _import_csv(self, path: Path) -> list:
-        """Importa códigos desde un archivo CSV exportado por CodeTrace.
-        Detecta automáticamente el delimitador (coma o punto y coma).
-        Soporta columnas: Código, Descripción, Stock_Caja, Stock_Cajas, Stock_Restante, Estado, Usado, Imagen, Fecha
-        """
-        import csv
-        items = []
-        label_to_status = {
-            'disponible': STATUS_DISPONIBLE,
-            'pendiente': STATUS_PENDIENTE,
-            'pedido': STATUS_PEDIDO,
-            'perdido': STATUS_PERDIDO,
-            'no hay más': STATUS_NO_HAY_MAS,
-            'no hay mas': STATUS_NO_HAY_MAS,
-            'último': STATUS_ULTIMO,
-            'ultimo': STATUS_ULTIMO
-        }
-        try:
-            with open(path, 'r', encoding='utf-8-sig') as f:
-                sample = f.read(1024)
-                f.seek(0)
-                # Auto-detect delimiter
-                if sample.count(',') > sample.count(';'):
-                    delimiter = ','
-                else:
-                    delimiter = ';'
-                reader = csv.reader(f, delimiter=delimiter)
-                header = next(reader, None)
-                if not header:
-                    return []
-                header_lower = [h.strip().lower() for h in header]
-                
-                # Find column indices
-                code_idx = None
-                for i, h in enumerate(header_lower):
-                    if 'código' in h or 'codigo' in h or 'code' in h:
-                        code_idx = i
-                        break
-                if code_idx is None:
-                    code_idx = 0
-                
-                # Description column
-                desc_idx = None
-                for i, h in enumerate(header_lower):
-                    if 'descripción' in h or 'descripcion' in h or 'description' in h:
-                        desc_idx = i
-                        break
-                
-                # Stock columns
-                stock_per_box_idx = None
-                for i, h in enumerate(header_lower):
-                    if 'stock_caja' in h or 'stock_per_box' in h or 'cantidad_caja' in h:
-                        stock_per_box_idx = i
-                        break
-                
-                stock_boxes_idx = None
-                for i, h in enumerate(header_lower):
-                    if 'stock_cajas' in h or 'stock_boxes' in h or 'cajas' in h:
-                        stock_boxes_idx = i
-                        break
-                
-                stock_remaining_idx = None
-                for i, h in enumerate(header_lower):
-                    if 'stock_restante' in h or 'stock_remaining' in h or 'restante' in h:
-                        stock_remaining_idx = i
-                        break
-                
-                status_idx = None
-                for i, h in enumerate(header_lower):
-                    if 'estado' in h or 'status' in h:
-                        status_idx = i
-                        break
-                
-                usado_idx = None
-                for i, h in enumerate(header_lower):
-                    if 'usado' in h or 'editado' in h:
-                        usado_idx = i
-                        break
-                
-                # Image column
-                imagen_idx = None
-                for i, h in enumerate(header_lower):
-                    if 'imagen' in h or 'image' in h or 'img' in h or 'image_path' in h:
-                        imagen_idx = i
-                        break
-                
-                for row in reader:
-                    if not row or len(row) <= code_idx:
-                        continue
-                    code = row[code_idx].strip().upper()
-                    if not code or not CODE_REGEX.match(code):
-                        continue
-                    
-                    # Get description
-                    description = None
-                    if desc_idx is not None and len(row) > desc_idx:
-                        desc_text = row[desc_idx].strip()
-                        if desc_text:
-                            description = desc_text
-                    
-                    # Get stock data
-                    stock_per_box = None
-                    if stock_per_box_idx is not None and len(row) > stock_per_box_idx:
-                        try:
-                            val = row[stock_per_box_idx].strip()
-                            if val:
-                                stock_per_box = int(val)
-                        except ValueError:
-                            pass
-                    
-                    stock_boxes = None
-                    if stock_boxes_idx is not None and len(row) > stock_boxes_idx:
-                        try:
-                            val = row[stock_boxes_idx].strip()
-                            if val:
-                                stock_boxes = int(val)
-                        except ValueError:
-                            pass
-                    
-                    stock_remaining = None
-                    if stock_remaining_idx is not None and len(row) > stock_remaining_idx:
-                        try:
-                            val = row[stock_remaining_idx].strip()
-                            if val:
-                                stock_remaining = int(val)
-                        except ValueError:
-                            pass
-                    
-                    # Get status
-                    status_text = row[status_idx].strip().lower() if status_idx is not None and len(row) > status_idx else ''
-                    status = label_to_status.get(status_text, STATUS_DISPONIBLE)
-                    
-                    # Get editado
-                    editado = False
-                    if usado_idx is not None and len(row) > usado_idx:
-                        usado_text = row[usado_idx].strip().lower()
-                        editado = usado_text in ['sí', 'si', 'yes', '1', 'true']
-                    
-                    # Get image_path
-                    image_path = None
-                    if imagen_idx is not None and len(row) > imagen_idx:
-                        img_text = row[imagen_idx].strip()
-                        if img_text and Path(img_text).exists():
-                            image_path = img_text
-                    
-                    # Tuple: (code, annotated, created_at, status, image_path, description, stock_per_box, stock_boxes, stock_remaining)
-                    items.append((code, editado, datetime.utcnow(), status, image_path, description, stock_per_box, stock_boxes, stock_remaining))
-        except Exception as e:
-            QMessageBox.warning(self, 'Error CSV', f'Error al leer CSV: {e}')
-            return []
-        return items
+        message = f'Importados {imported} códigos en {duration_ms / 1000:.1f} s.{details}'
+        if missing_images:
+            message += f'\n{missing_images} imágenes no se encontraron y se importaron sin imagen.'
+        QMessageBox.information(self, 'Importación exitosa', message)
 
     def on_export_csv(self) -> None:
-        """Exporta los datos actuales de la tabla a CSV."""
-        export_to_csv(self, self.table_model.rows, STATUS_LABELS)
+        """Exporta a CSV los códigos que muestra la tabla (mismos filtros y orden), en
+        segundo plano (ver modules/export_utils.py). Mientras corre, el botón muestra
+        el avance y permite cancelarla."""
+        if self.exporter.running():
+            if self.exporter.cancelled():
+                return
+            reply = QMessageBox.question(self, 'Exportar CSV', '¿Cancelar la exportación?',
+                                         QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
+            if reply == QMessageBox.Yes:
+                self.exporter.cancel()
+                self.btn_export_csv.setText('Cancelando...')
+            return
+        total = len(self.table_model.rows)
+        if not total:
+            QMessageBox.warning(self, 'Exportar CSV', 'No hay datos para exportar.')
+            return
+        path = ask_export_path(self)
+        if path is None:
+            return
+        if self.exporter.start(path, self.table_model.list_params(), total):
+            self.btn_export_csv.setText('Exportando 0%')
+            self.export_progress_timer.start(250)
+
+    def _poll_export(self) -> None:
+        """Muestra el avance de la exportación en el botón y el resultado al terminar."""
+        if self.exporter.running():
+            if not self.exporter.cancelled():
+                progress = self.exporter.progress()
+                self.btn_export_csv.setText(f'Exportando {progress.percent}%')
+                self.btn_export_csv.setToolTip(f'{progress.rows} de {progress.total} códigos. Clic para cancelar.')
+            return
+        self.export_progress_timer.stop()
+        self.btn_export_csv.setText('Exportar CSV')
+        self.btn_export_csv.setToolTip('')
+        error, result = self.exporter.last_error, self.exporter.last_result
+        if error:
+            QMessageBox.critical(self, 'Error', f'No se pudo exportar:\n{error}')
+        elif result is None or result.cancelled:
+            QMessageBox.information(self, 'Exportar CSV', 'Exportación cancelada. No se creó el archivo.')
+        else:
+            QMessageBox.information(self, 'Exportación exitosa', f'Exportados {result.rows} códigos a:\n{result.path}')
 
     def on_help(self) -> None:
         """Muestra el diálogo de ayuda e información de la app."""
@@ -1783,6 +2304,7 @@ class MainWindow(QMainWindow):
             self.btn_delete.setEnabled(False)
             self.btn_import.setEnabled(False)
             self.btn_export_csv.setEnabled(False)
+            self.action_restore.setEnabled(False)
             # Disable double-click edit for user
             try:
                 self.table.doubleClicked.disconnect(self.on_edit)
@@ -1795,6 +2317,7 @@ class MainWindow(QMainWindow):
             self.btn_delete.setEnabled(True)
             self.btn_import.setEnabled(True)
             self.btn_export_csv.setEnabled(True)
+            self.action_restore.setEnabled(True)
             # Enable double-click edit for admin
             try:
                 self.table.doubleClicked.connect(self.on_edit)
@@ -1823,8 +2346,11 @@ class MainWindow(QMainWindow):
         self.btn_logout.setToolTip(f'Cambiar a {other_user.capitalize()}')
 
     def on_theme_changed(self, text: str) -> None:
+        theme = 'Oscuro' if 'Oscuro' in text else 'Claro'
+        # Pre-rendered badges and stock layouts belong to the previous theme
+        self.status_delegate.set_theme(theme)
+        self.stock_delegate.set_theme(theme)
         if callable(self.theme_change_callback):
-            theme = 'Oscuro' if 'Oscuro' in text else 'Claro'
             self.theme_change_callback(theme)
 
     def _selected_row(self) -> Optional[int]:
@@ -1885,8 +2411,9 @@ class MainWindow(QMainWindow):
                     self._edit_status_only(existing_data)
                 return None
             status = status_combo.currentData()
-            self.repo.add_codes([(s, cb.isChecked(), datetime.utcnow(), status)])
-            self.table_model.load()
+            if not self._save(lambda: self.repo.add_codes([(s, cb.isChecked(), datetime.utcnow(), status)])):
+                return
+            self.table_model.refresh()
             self._update_column_widths()
             self._update_stats()
     
@@ -1985,8 +2512,9 @@ class MainWindow(QMainWindow):
             if not self._validate_status_change(row_data, new_status):
                 return
             
-            self.repo.update_status(row_data['id'], new_status)
-            self.table_model.load()
+            if not self._save(lambda: self.repo.update_status(row_data['id'], new_status)):
+                return
+            self.table_model.refresh()
             self._update_column_widths()
             self._update_stats()
 
@@ -1996,6 +2524,16 @@ class MainWindow(QMainWindow):
             QMessageBox.information(self, 'Edición', 'Selecciona una fila para editar.')
             return None
         row = self.table_model.rows[r]
+        if row.get('archived'):
+            # Los códigos archivados no se editan: primero se restauran a la tabla activa
+            answer = QMessageBox.question(self, 'Código archivado',
+                                          f"{row['code']} está archivado. ¿Restaurarlo a la lista activa?")
+            if answer == QMessageBox.Yes:
+                if not self._save(lambda: self.repo.restore_archived([row['id']])):
+                    return None
+                self.table_model.refresh()
+                self._update_stats()
+            return None
         dlg = CodeDialog('Editar código', self)
         dlg.setMinimumWidth(380)
         fl = QFormLayout()
@@ -2035,8 +2573,9 @@ class MainWindow(QMainWindow):
                 if not self._validate_status_change(row, new_status):
                     return
             
-            self.repo.update_code(row['id'], s, cb.isChecked(), new_status)
-            self.table_model.load()
+            if not self._save(lambda: self.repo.update_code(row['id'], s, cb.isChecked(), new_status)):
+                return
+            self.table_model.refresh()
             self._update_column_widths()
             self._update_stats()
 
@@ -2048,16 +2587,18 @@ class MainWindow(QMainWindow):
         row = self.table_model.rows[r]
         ok = QMessageBox.question(self, 'Confirmar', f"¿Eliminar código {row['code']}?")
         if ok == QMessageBox.Yes:
-            self.repo.delete_code(row['id'])
-            self.table_model.load()
+            if not self._save(lambda: self.repo.delete_code(row['id'])):
+                return
+            self.table_model.refresh()
             self._update_column_widths()
             self._update_stats()
     # Dev Borrar todos los códigos - Ctrl+E
     def on_deleteAll(self) -> None:
         ok = QMessageBox.question(self, 'Confirmar', f"¿Eliminar TODOS los códigos?")
         if ok == QMessageBox.Yes:
-            self.repo.remove_all()
-            self.table_model.load()
+            if not self._save(lambda: self.repo.remove_all()):
+                return
+            self.table_model.refresh()
             self._update_column_widths()
             self._update_stats()
     
@@ -2079,16 +2620,91 @@ class MainWindow(QMainWindow):
         else:
             self.table_model.annotated_filter = None
         self.table_model.status_filter = self.status_filter.currentData()
+        self.table_model.include_archived = self.chk_archivados.isChecked()
+        self.table_model.created_from, self.table_model.created_to = self._created_range()
         search_text = self.search.get_clean_text() if hasattr(self.search, 'get_clean_text') else self.search.text().strip().upper()
         self.table_model.search_text = search_text or None
-        self.table_model.load()
+        self.search_timer.stop()
+        # The query runs on a worker; _on_table_loaded finishes the job when the rows arrive
+        self._select_first_on_load = bool(search_text)
+        self.table_model.load_async()
+
+    def _remember_view(self) -> None:
+        # A model reset drops the selection: keep the selected id and scroll offset to restore them
+        self._reselect_id = self._selected_code_id if self._selected_row() is not None else None
+        self._reselect_scroll = self.table.verticalScrollBar().value()
+
+    def _on_table_loaded(self) -> None:
         self._update_column_widths()
+        select_first, self._select_first_on_load = self._select_first_on_load, False
+        reselect = self.table_model.row_of(self._reselect_id) if self._reselect_id is not None else None
+        self._reselect_id = None
         # Auto-select first row if search is active and results exist
-        if search_text and self.table_model.rows:
+        if select_first and self.table_model.rows:
             self.table.selectRow(0)
+        elif reselect is not None:
+            self.table.verticalScrollBar().setValue(self._reselect_scroll)
+            self.table.selectRow(reselect)
+            self.table.scrollTo(self.table_model.index(reselect, 0))
         elif not self.table_model.rows:
             self._set_preview_placeholder()
 
+    def _on_table_load_failed(self, message: str) -> None:
+        QMessageBox.warning(self, 'Error', f'No se pudieron cargar los códigos:\n{message}')
+
+    def _on_rows_changed(self, top, bottom, roles=None) -> None:
+        # Keep the preview in sync when the selected row is edited in place
+        pos = self.table_model.row_of(self._selected_code_id) if self._selected_code_id is not None else None
+        if pos is not None and top.row() <= pos <= bottom.row():
+            self._update_preview(self.table_model.rows[pos])
+
+    def _created_range(self):
+        """Rango [desde, hasta) en epoch ms del filtro de fecha (días locales)."""
+        key = self.date_filter.currentData()
+        today = date.today()
+        if key == 'today':
+            return local_days_ms(today, today)
+        if key == 'week':
+            return local_days_ms(today - timedelta(days=today.weekday()), today)
+        if key == 'range':
+            return local_days_ms(*self._date_range)
+        return None, None
+
+    def on_date_filter_activated(self, index: int) -> None:
+        if self.date_filter.itemData(index) == 'range' and not self._ask_date_range():
+            self.date_filter.setCurrentIndex(0)
+        self.on_filters_changed()
+
+    def _ask_date_range(self) -> bool:
+        dlg = CodeDialog('Rango de fechas', self)
+        dlg.setMinimumWidth(320)
+        fl = QFormLayout()
+        fl.setSpacing(12)
+        first, last = QDateEdit(), QDateEdit()
+        for edit, value in ((first, self._date_range[0]), (last, self._date_range[1])):
+            edit.setCalendarPopup(True)
+            edit.setDisplayFormat('dd/MM/yyyy')
+            edit.setDate(QDate(value.year, value.month, value.day))
+        fl.addRow('Desde:', first)
+        fl.addRow('Hasta:', last)
+        dlg.content_layout.addLayout(fl)
+        btns = QHBoxLayout()
+        btns.setSpacing(10)
+        b_ok = QPushButton('Aplicar')
+        b_cancel = QPushButton('Cancelar')
+        b_cancel.setProperty('secondary', True)
+        btns.addWidget(b_ok)
+        btns.addWidget(b_cancel)
+        dlg.content_layout.addLayout(btns)
+        b_ok.clicked.connect(dlg.accept)
+        b_cancel.clicked.connect(dlg.reject)
+        if dlg.exec_() != QDialog.Accepted:
+            return False
+        start, end = sorted((first.date().toPyDate(), last.date().toPyDate()))
+        self._date_range = (start, end)
+        self.date_filter.setItemText(self.date_filter.findData('range'), f"{start:%d/%m} - {end:%d/%m}")
+        return True
+
     def on_sort_changed(self, text: str) -> None:
         if 'Fecha ↓' in text:
             self.table_model.order_by = 'created_at'
@@ -2105,5 +2721,4 @@ class MainWindow(QMainWindow):
         elif 'Estado' in text:
             self.table_model.order_by = 'status'
             self.table_model.order_dir = 'ASC'
-        self.table_model.load()
-        self._update_column_widths()
+        self.table_model.load_async()